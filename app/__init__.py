@@ -1 +1,93 @@
-# App package
+"""
+GCDM Auto application package
+"""
+
+from typing import Any, Mapping, Optional, Union
+from flask import Flask
+
+from app.config import Config
+
+
+def create_app(config: Optional[Union[Mapping[str, Any], type]] = None) -> Flask:
+    """
+    Application factory.
+    Settings are layered: Config defaults, then GCDM_* environment variables,
+    then the explicit config mapping or object passed in.
+    """
+    app = Flask(__name__, template_folder='templates', static_folder='static')
+
+    # Configuration
+    app.config.from_object(Config)
+    app.config.from_prefixed_env('GCDM')
+    if isinstance(config, Mapping):
+        app.config.from_mapping(config)
+    elif config is not None:
+        app.config.from_object(config)
+
+    # JSON serialization
+    from app.json_provider import init_json
+    init_json(app)
+
+    # Initialize database
+    from app.database import build_engine_options, init_database
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = build_engine_options(app.config)
+    init_database(app)
+
+    # Per-market shard databases (DB_SHARDING)
+    from app.sharding import init_sharding
+    init_sharding(app)
+
+    # Read-only engines for reporting queries (DB_READ_ONLY_ENABLED)
+    from app.read_only import init_read_only
+    init_read_only(app)
+
+    # Group-commit writer for uploaded batches (INGEST_WRITER_ENABLED)
+    from app.services.ingest_writer import init_ingest_writer
+    init_ingest_writer(app)
+
+    # Initialize upload storage
+    from app.services.upload_store import init_upload_store
+    init_upload_store(app)
+
+    # Initialize parsed-workbook result cache
+    from app.services.parse_cache import init_parse_cache
+    init_parse_cache(app)
+
+    # Initialize template workbook generation
+    from app.services.report_builder import init_report_builder
+    init_report_builder(app)
+
+    # Initialize template fragment cache
+    from app.services.fragment_cache import init_fragment_cache
+    init_fragment_cache(app)
+
+    # Initialize security
+    from app.security import init_security
+    init_security(app)
+
+    # Static asset URLs
+    from app.assets import init_assets
+    init_assets(app)
+
+    # Initialize response compression
+    from app.compression import init_compression
+    init_compression(app)
+
+    # Register blueprints
+    from app.controllers import excel_bp, admin_bp, config_bp, api_bp
+    app.register_blueprint(excel_bp, url_prefix='/excel')
+    app.register_blueprint(admin_bp, url_prefix='/admin')
+    app.register_blueprint(config_bp, url_prefix='/config')
+    app.register_blueprint(api_bp, url_prefix='/api')
+
+    # Register maintenance commands
+    from app.commands import init_commands
+    init_commands(app)
+
+    @app.route('/')
+    def index():
+        """Home page redirects to Excel upload"""
+        from flask import redirect, url_for
+        return redirect(url_for('excel.upload'))
+
+    return app
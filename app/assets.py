@@ -0,0 +1,119 @@
+"""
+Static asset pipeline for GCDM Auto application
+
+`flask build-assets` (also run by the production server on startup) copies
+every file under static/css and static/js to static/dist with the content
+hash in its name, e.g. css/base.css -> dist/css/base.3f2a9c1b7e4d.css, and
+writes dist/manifest.json. Templates reference assets through
+asset_url('css/base.css'), which resolves to the hashed file when a
+manifest exists and to the plain file otherwise (development).
+
+Hashed files never change, so they are served with a one-year immutable
+Cache-Control; a new build produces new names.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from typing import Dict
+from flask import current_app, url_for
+
+logger = logging.getLogger(__name__)
+
+ASSET_FOLDERS = ('css', 'js')
+DIST_FOLDER = 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+
+def hashed_name(relative_path: str, content: bytes) -> str:
+    """File name with the first 12 hex digits of the content hash before the extension"""
+    stem, extension = os.path.splitext(relative_path)
+    return f"{stem}.{hashlib.sha256(content).hexdigest()[:12]}{extension}"
+
+
+def build_assets(static_folder: str) -> Dict[str, str]:
+    """Write content-hashed copies of the static assets and their manifest; returns the manifest"""
+    dist_folder = os.path.join(static_folder, DIST_FOLDER)
+    manifest: Dict[str, str] = {}
+
+    for folder in ASSET_FOLDERS:
+        source_root = os.path.join(static_folder, folder)
+        for root, _, files in os.walk(source_root):
+            for name in sorted(files):
+                source = os.path.join(root, name)
+                relative_path = os.path.relpath(source, static_folder).replace(os.sep, '/')
+                with open(source, 'rb') as f:
+                    content = f.read()
+
+                target_name = hashed_name(relative_path, content)
+                target = os.path.join(dist_folder, *target_name.split('/'))
+                if not os.path.exists(target):
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    with open(target, 'wb') as f:
+                        f.write(content)
+                manifest[relative_path] = f"{DIST_FOLDER}/{target_name}"
+
+    _remove_stale(dist_folder, {path.split('/', 1)[1] for path in manifest.values()})
+
+    os.makedirs(dist_folder, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=dist_folder, suffix='.part')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(temp_path, os.path.join(dist_folder, MANIFEST_NAME))
+
+    logger.info(f"Built {len(manifest)} static assets into {dist_folder}")
+    return manifest
+
+
+def _remove_stale(dist_folder: str, current: set) -> None:
+    """Drop hashed files left over from earlier builds"""
+    for root, _, files in os.walk(dist_folder):
+        for name in files:
+            path = os.path.join(root, name)
+            relative_path = os.path.relpath(path, dist_folder).replace(os.sep, '/')
+            if relative_path != MANIFEST_NAME and relative_path not in current:
+                os.unlink(path)
+
+
+class AssetManifest:
+    """Lookup of hashed asset names, reloaded when the manifest file changes"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.mtime = None
+        self.entries: Dict[str, str] = {}
+
+    def get(self, filename: str) -> str:
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = None
+        if mtime != self.mtime:
+            self.entries = self._load() if mtime is not None else {}
+            self.mtime = mtime
+        return self.entries.get(filename, filename)
+
+    def _load(self) -> Dict[str, str]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable asset manifest {self.path}: {e}")
+            return {}
+
+
+def init_assets(app) -> None:
+    """Expose asset_url() to templates"""
+    manifest = AssetManifest(os.path.join(app.static_folder, DIST_FOLDER, MANIFEST_NAME))
+    app.extensions['asset_manifest'] = manifest
+
+    def asset_url(filename: str) -> str:
+        """URL of a static asset, using its content-hashed name once assets are built"""
+        # The debug server serves the editable sources, so CSS/JS changes show up without a rebuild
+        if current_app.debug or not current_app.config.get('ASSET_FINGERPRINTING', True):
+            return url_for('static', filename=filename)
+        return url_for('static', filename=manifest.get(filename))
+
+    app.jinja_env.globals['asset_url'] = asset_url
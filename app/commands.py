@@ -0,0 +1,74 @@
+"""
+Command line maintenance commands for GCDM Auto application
+
+Run with: flask --app app <command>
+"""
+
+import click
+from flask import current_app
+
+
+def init_commands(app) -> None:
+    """Register maintenance commands on the app"""
+
+    @app.cli.command('migrate-uploads')
+    def migrate_uploads():
+        """Move flat uploads (including the legacy static folder) into the sharded storage layout"""
+        from app.services.upload_migrator import UploadMigrator
+
+        migrator = UploadMigrator(
+            current_app,
+            current_app.extensions['upload_store'],
+            [current_app.config['LEGACY_UPLOAD_FOLDER'], current_app.config['UPLOAD_FOLDER']]
+        )
+        count = migrator.run()
+        click.echo(f"Migrated {count} uploads")
+
+    @app.cli.command('archive-uploads')
+    @click.option('--days', type=int, default=None, help='Archive uploads older than this many days')
+    def archive_uploads(days):
+        """Recompress old uploads with xz and report the space saved"""
+        from app.services.upload_archiver import UploadArchiver
+
+        archiver = UploadArchiver(
+            current_app,
+            current_app.extensions['upload_store'],
+            days if days is not None else current_app.config['ARCHIVE_AFTER_DAYS'],
+            current_app.config['ARCHIVE_COMPRESSION_PRESET']
+        )
+        report = archiver.run()
+        click.echo(report if report else "Archiving already running elsewhere")
+
+    @app.cli.command('build-assets')
+    def build_assets_command():
+        """Write content-hashed copies of the static CSS/JS and their manifest"""
+        from app.assets import build_assets
+
+        manifest = build_assets(current_app.static_folder)
+        for source, target in sorted(manifest.items()):
+            click.echo(f"{source} -> {target}")
+
+    @app.cli.command('rebuild-rollups')
+    def rebuild_rollups():
+        """Recompute the market/metric rollup tables from the stored Excel data"""
+        from app.services.rollup_service import rollup_service
+
+        total = rollup_service.rebuild(current_app.config.get('EXPORT_BATCH_SIZE', 1000))
+        click.echo(f"Rebuilt rollups from {total} rows")
+
+    @app.cli.command('shard-data')
+    def shard_data():
+        """Move Excel data and batch manifests of sharded markets from the main database into their shards"""
+        from app.sharding import get_shard_router
+
+        router = get_shard_router()
+        if router is None:
+            click.echo("Sharding is off (set DB_SHARDING)")
+            return
+        from app.services.rollup_service import rollup_service
+
+        router.create_tables()
+        batch_size = current_app.config.get('EXPORT_BATCH_SIZE', 1000)
+        for market, count in router.move_to_shards(batch_size).items():
+            click.echo(f"{market}: moved {count} rows")
+        click.echo(f"Rebuilt rollups from {rollup_service.rebuild(batch_size)} rows")
@@ -0,0 +1,124 @@
+"""
+Response compression for GCDM Auto application
+
+Compresses text responses (HTML, JSON, CSV, ...) with Brotli when the
+`brotli` package is installed and the client accepts it, otherwise gzip.
+Small responses, non-text content types (xlsx, parquet, images) and
+responses that are already encoded are left alone. File responses from
+send_file are never touched, so sendfile and Range requests keep working.
+Streamed responses are compressed chunk by chunk as they are generated.
+"""
+
+import gzip
+import logging
+import zlib
+from typing import Iterable, Iterator, Optional
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIMETYPES = (
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/xml',
+    'application/json', 'application/javascript', 'image/svg+xml',
+)
+
+
+class StreamCompressor:
+    """Incremental compressor for one response body"""
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=level)
+        else:
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress a chunk and flush it, so every generated chunk reaches the client promptly"""
+        if self.encoding == 'br':
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+def choose_encoding(accept_encodings) -> Optional[str]:
+    """Best content coding the client accepts: br if available, else gzip"""
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress_stream(chunks: Iterable[bytes], encoding: str, level: int) -> Iterator[bytes]:
+    """Compress a generated body chunk by chunk"""
+    compressor = StreamCompressor(encoding, level)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+def compress_body(data: bytes, encoding: str, level: int) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def init_compression(app) -> None:
+    """Compress eligible responses of the app"""
+
+    @app.after_request
+    def compress_response(response):
+        """Compress text responses the client can decode"""
+        config = app.config
+        if not config.get('COMPRESS_ENABLED', True):
+            return response
+
+        if (request.method == 'HEAD'
+                or response.status_code < 200 or response.status_code in (204, 206, 304)
+                or response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in config.get('COMPRESS_MIMETYPES', DEFAULT_MIMETYPES)):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = choose_encoding(request.accept_encodings)
+        if not encoding:
+            return response
+        level = config.get('COMPRESS_BR_LEVEL', 4) if encoding == 'br' else config.get('COMPRESS_LEVEL', 6)
+
+        if response.is_streamed:
+            response.response = compress_stream(response.response, encoding, level)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < config.get('COMPRESS_MIN_SIZE', 1024):
+                return response
+            compressed = compress_body(data, encoding, level)
+            if len(compressed) >= len(data):
+                return response
+            response.set_data(compressed)
+
+        response.headers['Content-Encoding'] = encoding
+        # The encoded body is a different representation; a weak ETag keeps revalidation working
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
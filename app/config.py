@@ -0,0 +1,130 @@
+"""
+Application configuration for GCDM Auto application
+"""
+
+
+class Config:
+    """Default configuration, overridable through create_app(config) or GCDM_* environment variables"""
+
+    SECRET_KEY = 'gcdmauto-secret-key-change-in-production'
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///gcdmauto.db'
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    UPLOAD_FOLDER = 'storage/uploads'  # sharded as {market}/{yyyy-mm}/, outside the static folder
+    LEGACY_UPLOAD_FOLDER = 'app/static/uploads'  # flat layout used before sharding; migrated on startup
+    UPLOAD_MIGRATION_ON_STARTUP = True
+    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+    DOWNLOAD_PAGE_SIZE = 50  # files per page on the admin download page
+
+    # Hand raw downloads over to a reverse proxy: 'x-accel-redirect' (nginx, with an
+    # internal location at DOWNLOAD_OFFLOAD_PREFIX aliasing UPLOAD_FOLDER) or
+    # 'x-sendfile' (Apache mod_xsendfile, lighttpd). None = the app sends the file.
+    DOWNLOAD_OFFLOAD = None
+    DOWNLOAD_OFFLOAD_PREFIX = '/protected-uploads'
+
+    EXPORT_BATCH_SIZE = 1000  # rows fetched per database round trip when streaming exports
+
+    # Response compression (Brotli when the brotli package is installed, else gzip)
+    COMPRESS_ENABLED = True
+    COMPRESS_MIN_SIZE = 1024  # bytes; smaller bodies are sent as they are
+    COMPRESS_LEVEL = 6  # gzip level
+    COMPRESS_BR_LEVEL = 4  # Brotli quality; higher levels cost far more CPU per request
+    COMPRESS_MIMETYPES = ['text/html', 'text/css', 'text/plain', 'text/csv', 'text/xml',
+                          'application/json', 'application/javascript', 'image/svg+xml']
+
+    # Static assets: templates use asset_url(), which points at content-hashed copies
+    # under static/dist once `flask build-assets` has run (the production server builds on startup)
+    ASSET_FINGERPRINTING = True
+    ASSET_BUILD_ON_STARTUP = True
+
+    # Cache-Control by URL path prefix (longest match wins); checked before CACHE_CONTROL
+    CACHE_CONTROL_PATHS = {
+        '/static/dist/': 'public, max-age=31536000, immutable',  # content-hashed names never change
+        '/static/css/': 'public, no-cache',
+        '/static/js/': 'public, no-cache',
+    }
+
+    # Cache-Control per endpoint or blueprint; every other response is sent no-store
+    # (HTML pages carry flash messages and form state, so they stay uncached)
+    CACHE_CONTROL = {
+        # A batch's file never changes and is revalidated by its content hash ETag
+        'admin.download_file': 'private, max-age=31536000, immutable',
+        # JSON API responses may be stored but are revalidated by their data version ETag
+        'api': 'private, no-cache',
+    }
+
+    # Uploads not re-uploaded for this many days are recompressed with xz by a
+    # background task and decompressed on the fly when downloaded (0 = never)
+    ARCHIVE_AFTER_DAYS = 90
+    ARCHIVE_INTERVAL_HOURS = 24
+    ARCHIVE_COMPRESSION_PRESET = 6  # xz preset 0-9
+
+    # Connection pool (ignored for in-memory SQLite, which uses a single static connection)
+    DB_POOL_SIZE = 10
+    DB_MAX_OVERFLOW = 20
+    DB_POOL_TIMEOUT = 30  # seconds to wait for a pooled connection
+    DB_POOL_RECYCLE = 3600  # seconds before a pooled connection is replaced
+    DB_POOL_PRE_PING = True
+
+    # Per-market shard databases for excel_data, batch and metric_rollup (see app/sharding.py).
+    # DB_SHARD_MARKETS defaults to the configured markets; DB_SHARD_URI to gcdmauto_<market>.db
+    # next to the main database (placeholders: {market}, {market_lower})
+    DB_SHARDING = False
+    DB_SHARD_MARKETS = None
+    DB_SHARD_URI = None
+    DB_SHARD_WORKERS = None  # fan-out read threads (default: one per database)
+
+    # Read-only engines for routes marked @read_only (see app/read_only.py): SQLite mode=ro
+    # connections with their own pool, to the primary files or to replicas (DB_READ_ONLY_URI,
+    # DB_READ_ONLY_SHARD_URI with {market}/{market_lower}); ignored for in-memory SQLite
+    DB_READ_ONLY_ENABLED = True
+    DB_READ_ONLY_URI = None
+    DB_READ_ONLY_SHARD_URI = None
+    DB_READ_ONLY_POOL_SIZE = 10
+    DB_READ_ONLY_MAX_OVERFLOW = 20
+
+    # Uploads hand their rows to one writer thread per database, which commits
+    # the batches arriving within INGEST_MAX_DELAY_MS as one transaction
+    # (see app/services/ingest_writer.py); ignored for in-memory SQLite
+    INGEST_WRITER_ENABLED = True
+    INGEST_MAX_DELAY_MS = 20
+    INGEST_MAX_ROWS = 2000  # rows per group transaction; larger groups delay every upload in them
+    INGEST_TIMEOUT = 300  # seconds an upload request waits for its batch to commit
+
+    # SQLite pragmas applied to every new connection. WAL lets dashboard reads
+    # run while an upload is committing; busy_timeout makes writers wait for
+    # the lock instead of failing immediately with "database is locked".
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -64000,  # negative value = KiB, i.e. 64MB page cache
+        'mmap_size': 268435456,  # 256MB
+        'busy_timeout': 5000,  # milliseconds
+    }
+
+    # Cache of parsed workbook results, keyed by file hash, market and config version
+    PARSE_CACHE_ENABLED = True
+    PARSE_CACHE_FOLDER = 'cache/parsed'
+    PARSE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+    # Cache of workbooks regenerated from stored batches, keyed by batch and market config version
+    REPORT_CACHE_FOLDER = 'cache/reports'
+    REPORT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+    # Rendered per-batch table fragments: in-memory LRU per process, plus an
+    # optional disk tier shared by all workers (None = memory only)
+    FRAGMENT_CACHE_ENABLED = True
+    FRAGMENT_CACHE_MAX_ENTRIES = 512
+    FRAGMENT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+    FRAGMENT_CACHE_FOLDER = None
+
+    # Production WSGI server (python -m app.server). The bind address is always
+    # localhost; only the port is configurable.
+    SERVER_PORT = 8080
+    SERVER_WORKERS = 0  # 0 = auto: 2 x CPU cores + 1, capped at 8
+    SERVER_THREADS = 4  # threads per worker
+    SERVER_TIMEOUT = 120  # seconds; large workbook uploads parse inside the request
+    SERVER_GRACEFUL_TIMEOUT = 30
+    SERVER_KEEPALIVE = 5
+    SERVER_PRELOAD = True  # import the app once in the master and fork workers from it
+    SERVER_MAX_REQUESTS = 1000  # recycle a worker after this many requests (0 = never)
+    SERVER_MAX_REQUESTS_JITTER = 100
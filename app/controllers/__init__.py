@@ -5,5 +5,6 @@ Controllers for GCDM Auto application
 from .excel_controller import excel_bp
 from .admin_controller import admin_bp
 from .config_controller import config_bp
+from .api_controller import api_bp
 
-__all__ = ['excel_bp', 'admin_bp', 'config_bp']
+__all__ = ['excel_bp', 'admin_bp', 'config_bp', 'api_bp']
@@ -3,13 +3,14 @@ Admin Controller - Python equivalent of Java AdminController
 """
 
 import logging
-import os
-import glob
-from datetime import datetime
-from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
+from werkzeug.exceptions import HTTPException
 from app.services.data_period_service import data_period_service
 from app.services.market_config_loader import market_config_loader
 from app.services.user_service import user_service
+from app.services.uploaded_file_service import uploaded_file_service
+from app.services.upload_store import get_upload_store
+from app.services.file_delivery import send_stored_file
 from app.services.security_audit_service import security_audit_service
 from app.models import DataPeriod
 from app.security import security_required
@@ -136,20 +137,11 @@ def download():
     if request.method == 'GET':
         # Get available markets and data periods
         markets = market_config_loader.get_available_markets()
-        all_data_periods = data_period_service.get_all_active_data_periods()
-
-        # Convert DataPeriod objects to dictionaries
-        data_periods_dict = []
-        for period in all_data_periods:
-            data_periods_dict.append({
-                'market_name': period.market_name,
-                'data_month': period.data_month,
-                'active_idc': period.active_idc
-            })
+        active_periods = data_period_service.get_active_periods()
 
         return render_template('admin/download.html',
                              markets=markets,
-                             allDataPeriods=data_periods_dict,
+                             allDataPeriods=active_periods.periods,
                              files=[])
 
     elif request.method == 'POST':
@@ -160,72 +152,32 @@ def download():
 
         # Get available markets and data periods for the form
         markets = market_config_loader.get_available_markets()
-        all_data_periods = data_period_service.get_all_active_data_periods()
-
-        # Convert DataPeriod objects to dictionaries
-        data_periods_dict = []
-        for period in all_data_periods:
-            data_periods_dict.append({
-                'market_name': period.market_name,
-                'data_month': period.data_month,
-                'active_idc': period.active_idc
-            })
+        active_periods = data_period_service.get_active_periods()
 
-        # Search for files based on filters
-        upload_folder = current_app.config['UPLOAD_FOLDER']
+        # Search the upload catalog based on filters
+        page = request.form.get('page', 1, type=int)
+        per_page = current_app.config.get('DOWNLOAD_PAGE_SIZE', 50)
         files = []
+        total_files = 0
 
         try:
-            # Build search pattern
-            pattern_parts = []
-            if market:
-                pattern_parts.append(market)
-            else:
-                pattern_parts.append('*')
-
-            if data_month:
-                pattern_parts.append(data_month)
-            else:
-                pattern_parts.append('*')
-
-            # Add wildcard for timestamp and uuid parts
-            pattern_parts.extend(['*', '*'])
-
-            if batch_id:
-                # If specific batch_id is provided, search for it
-                search_pattern = os.path.join(upload_folder, f"*{batch_id}*")
-            else:
-                # Build pattern from market and data_month
-                search_pattern = os.path.join(upload_folder, f"{'_'.join(pattern_parts)}*")
-
-            # Find matching files
-            matching_files = glob.glob(search_pattern)
-
-            for file_path in matching_files:
-                filename = os.path.basename(file_path)
-                # Extract batch_id from filename (everything before the original filename)
-                if '_' in filename:
-                    parts = filename.split('_')
-                    if len(parts) >= 4:  # market_datamonth_timestamp_uuid_originalfile
-                        file_batch_id = '_'.join(parts[:4])
-                        original_filename = '_'.join(parts[4:])
-
-                        # Get file info
-                        file_stat = os.stat(file_path)
-                        file_size = file_stat.st_size
-                        upload_time = datetime.fromtimestamp(file_stat.st_mtime)
-
-                        files.append({
-                            'filename': filename,
-                            'original_filename': original_filename,
-                            'batch_id': file_batch_id,
-                            'file_size': file_size,
-                            'upload_time': upload_time,
-                            'download_url': url_for('admin.download_file', filename=filename)
-                        })
+            records, total_files = uploaded_file_service.search(
+                market_name=market or None,
+                data_month=data_month or None,
+                batch_id=batch_id or None,
+                page=page,
+                per_page=per_page
+            )
 
-            # Sort files by upload time (newest first)
-            files.sort(key=lambda x: x['upload_time'], reverse=True)
+            for record in records:
+                files.append({
+                    'filename': record.stored_path,
+                    'original_filename': record.original_filename,
+                    'batch_id': record.batch_id,
+                    'file_size': record.file_size,
+                    'upload_time': record.upload_time,
+                    'download_url': url_for('admin.download_file', batch_id=record.batch_id)
+                })
 
         except Exception as e:
             logger.error(f"Error searching for files: {e}", exc_info=True)
@@ -233,42 +185,41 @@ def download():
 
         return render_template('admin/download.html',
                              markets=markets,
-                             allDataPeriods=data_periods_dict,
+                             allDataPeriods=active_periods.periods,
                              files=files,
+                             total_files=total_files,
+                             page=page,
+                             total_pages=max(1, -(-total_files // per_page)),
                              selected_market=market,
                              selected_data_month=data_month,
                              selected_batch_id=batch_id)
 
-@admin_bp.route('/download/file/<filename>')
+@admin_bp.route('/download/file/<batch_id>')
 @security_required
-def download_file(filename):
-    """Download a specific file"""
+def download_file(batch_id):
+    """Download the uploaded file of a batch"""
     try:
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        file_path = os.path.join(upload_folder, filename)
+        record = uploaded_file_service.get_by_batch_id(batch_id)
+        upload_store = get_upload_store()
 
-        # Security check: ensure file exists and is in upload folder
-        if not os.path.exists(file_path) or not os.path.commonpath([upload_folder, file_path]) == upload_folder:
+        # Security check: the file must be cataloged and resolve inside the upload storage
+        if not record or not upload_store.is_available(record.stored_path, record.content_hash):
             flash('File not found or access denied.', 'error')
             return redirect(url_for('admin.download'))
 
-        # Extract original filename for download
-        if '_' in filename:
-            parts = filename.split('_')
-            if len(parts) >= 5:  # market_datamonth_timestamp_uuid_originalfile
-                original_filename = '_'.join(parts[4:])
-            else:
-                original_filename = filename
-        else:
-            original_filename = filename
+        response = send_stored_file(upload_store, record)
 
-        # Log download activity
-        user_id = user_service.get_user_id()
-        security_audit_service.log_file_download(user_id, filename, request)
+        # Log download activity, only when file content is sent (not for 304 or 416 answers)
+        if response.status_code in (200, 206):
+            user_id = user_service.get_user_id()
+            security_audit_service.log_file_download(user_id, record.stored_path, request)
 
-        return send_file(file_path, as_attachment=True, download_name=original_filename)
+        return response
 
+    except HTTPException:
+        # e.g. 416 for a Range outside the file: answered as it is
+        raise
     except Exception as e:
-        logger.error(f"Error downloading file {filename}: {e}", exc_info=True)
+        logger.error(f"Error downloading file for batch {batch_id}: {e}", exc_info=True)
         flash(f'Error downloading file: {str(e)}', 'error')
         return redirect(url_for('admin.download'))
@@ -0,0 +1,179 @@
+"""
+API Controller - read-only JSON API for dashboard data
+
+Queries run on the read-only engines (see app/read_only.py).
+
+Every response carries a strong ETag derived from the Excel data commit
+counter and the request URL, so a client polling unchanged data gets
+304 Not Modified without the data being queried or serialized again.
+"""
+
+import hashlib
+import logging
+from functools import wraps
+from flask import Blueprint, abort, current_app, jsonify, request
+from app.models import period_key
+from app.services.analytics_service import analytics_service
+from app.services.batch_service import batch_service
+from app.services.excel_data_service import excel_data_service
+from app.services.rollup_service import rollup_service
+from app.read_only import read_only
+from app.security import security_required
+
+logger = logging.getLogger(__name__)
+
+# Create blueprint
+api_bp = Blueprint('api', __name__)
+
+def data_etag() -> str:
+    """ETag of the current request's representation at the current data version"""
+    version = excel_data_service.get_data_version()
+    return hashlib.sha256(f"{version}:{request.full_path}".encode('utf-8')).hexdigest()[:32]
+
+def conditional_on_data(f):
+    """Answer 304 when the client's ETag still matches the data version, otherwise tag the response"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        etag = data_etag()
+        # Weak comparison, as If-None-Match requires: compressed responses carry the ETag as W/"..."
+        if request.if_none_match.contains_weak(etag):
+            response = current_app.response_class(status=304)
+            response.set_etag(etag)
+            return response
+
+        response = jsonify(f(*args, **kwargs))
+        response.set_etag(etag)
+        return response
+    return decorated_function
+
+def period_arg(name):
+    """Period bound from the query string, as 202504 or 2025-Apr (-1 if malformed, matching nothing)"""
+    value = request.args.get(name, '').strip()
+    if not value:
+        return None
+    if value.isdigit():
+        return int(value)
+    key = period_key(value)
+    return key if key is not None else -1
+
+def filters_from_args():
+    """Data filters from the query string"""
+    return {
+        'market_name': request.args.get('market') or None,
+        'data_month': request.args.get('dataMonth') or None,
+        'batch_id': request.args.get('batchId') or None,
+        'user_id': request.args.get('userId') or None,
+        'period_from': period_arg('periodFrom'),
+        'period_to': period_arg('periodTo'),
+    }
+
+def statistics(filters, records=None):
+    """Dashboard statistics from the rollups, or from the matching records for batch/user filters"""
+    if rollup_service.covers(filters['batch_id'], filters['user_id']):
+        return rollup_service.get_statistics(filters['market_name'], filters['data_month'],
+                                             filters['period_from'], filters['period_to'])
+    if records is None:
+        records = excel_data_service.get_aggregated_data_by_filters(**filters)
+    return excel_data_service.get_statistics(records)
+
+@api_bp.route('/markets')
+@security_required
+@read_only
+@conditional_on_data
+def markets():
+    """Markets and data months that have data"""
+    return {
+        'markets': excel_data_service.get_available_markets(),
+        'dataMonths': excel_data_service.get_available_data_months(request.args.get('market') or None),
+    }
+
+@api_bp.route('/batches')
+@security_required
+@read_only
+@conditional_on_data
+def batches():
+    """Available batch IDs and users, with the manifests of the batches matching market/dataMonth"""
+    manifests = batch_service.get_batches(request.args.get('market') or None,
+                                          request.args.get('dataMonth') or None)
+    return {
+        'batchIds': excel_data_service.get_available_batch_ids(),
+        'userIds': excel_data_service.get_available_user_ids(),
+        'batches': [{
+            'batchId': batch.batch_id,
+            'market': batch.market_name,
+            'dataMonth': batch.data_month,
+            'userId': batch.user_id,
+            'worksheetName': batch.worksheet_name,
+            'uploadTime': batch.upload_time,
+            'rowCount': batch.row_count,
+            'contentHash': batch.content_hash,
+            'parseSeconds': batch.parse_seconds,
+            'insertSeconds': batch.insert_seconds,
+            'status': batch.status,
+        } for batch in manifests],
+    }
+
+@api_bp.route('/data')
+@security_required
+@read_only
+@conditional_on_data
+def data():
+    """Records matching the filters, with the dashboard statistics"""
+    filters = filters_from_args()
+    records = excel_data_service.get_aggregated_data_by_filters(**filters)
+    return {
+        'stats': statistics(filters, records),
+        'records': records,
+    }
+
+@api_bp.route('/stats')
+@security_required
+@read_only
+@conditional_on_data
+def stats():
+    """Dashboard statistics for the filters"""
+    return statistics(filters_from_args())
+
+@api_bp.route('/rollups')
+@security_required
+@read_only
+@conditional_on_data
+def rollups():
+    """Monthly LYA/CYA/CYT totals per market, data month and metric"""
+    filters = filters_from_args()
+    return {
+        'totals': rollup_service.get_totals(
+            market_name=filters['market_name'],
+            data_month=filters['data_month'],
+            metric_name=request.args.get('metric') or None,
+            period_from=filters['period_from'],
+            period_to=filters['period_to']
+        ),
+    }
+
+@api_bp.route('/kpis')
+@security_required
+@read_only
+@conditional_on_data
+def kpis():
+    """YoY, attainment, YTD and funnel KPIs of the latest batch per market and data month"""
+    filters = filters_from_args()
+    return {
+        'kpis': analytics_service.get_market_kpis(
+            market_name=filters['market_name'],
+            data_month=filters['data_month'],
+            period_from=filters['period_from'],
+            period_to=filters['period_to']
+        ),
+    }
+
+@api_bp.route('/kpis/<batch_id>')
+@security_required
+@read_only
+@conditional_on_data
+def batch_kpis(batch_id):
+    """KPIs of one batch"""
+    results = analytics_service.get_batch_kpis([batch_id])
+    if not results:
+        abort(404)
+    return results[0]
@@ -3,18 +3,29 @@ Excel Controller - Python equivalent of Java ExcelController
 """
 
 import os
+import time
 import uuid
 import logging
 from datetime import datetime
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app
+from itertools import groupby
+from flask import Blueprint, Response, render_template, request, redirect, url_for, flash, jsonify, current_app, send_file, stream_with_context
 from werkzeug.utils import secure_filename
 
 from app.services.market_config_loader import market_config_loader
 from app.services.excel_service import ExcelService
 from app.services.excel_data_service import excel_data_service
+from app.services.batch_diff_service import batch_diff_service
+from app.services.batch_service import batch_service
 from app.services.data_period_service import data_period_service
+from app.services.export_service import export_service
+from app.services.ingest_writer import get_ingest_writer
+from app.services.rollup_service import rollup_service
+from app.services.upload_store import get_upload_store
+from app.services.uploaded_file_service import uploaded_file_service
 from app.services.user_service import user_service
 from app.services.security_audit_service import security_audit_service
+from app.models import UploadedFile
+from app.read_only import read_only
 from app.security import security_required
 
 logger = logging.getLogger(__name__)
@@ -35,22 +46,15 @@ def upload():
     elif request.method == 'GET':
         # Get available markets and data periods
         markets = market_config_loader.get_available_markets()
-        all_data_periods = data_period_service.get_all_active_data_periods()
-
-        # Convert DataPeriod objects to dictionaries for JSON serialization
-        data_periods_dict = []
-        for period in all_data_periods:
-            data_periods_dict.append({
-                'market_name': period.market_name,
-                'data_month': period.data_month,
-                'active_idc': period.active_idc
-            })
+        active_periods = data_period_service.get_active_periods()
 
         return render_template('excel/upload.html',
                              markets=markets,
-                             allDataPeriods=data_periods_dict)
+                             allDataPeriods=active_periods.periods,
+                             allDataPeriodsJson=active_periods.json)
     
     elif request.method == 'POST':
+        batch_id = None
         try:
             # Get form data
             market = request.form.get('market')
@@ -68,28 +72,59 @@ def upload():
             
             # Get user info
             user_id = user_service.get_user_id()
-            
-            # Generate batch ID
-            batch_id = f"{market}_{data_month}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{str(uuid.uuid4())[:8]}"
 
-            # Save the uploaded file with batch_id prefix for later download
-            saved_filename = f"{batch_id}_{secure_filename(file.filename)}"
-            saved_file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], saved_filename)
-            file.save(saved_file_path)
-            file.seek(0)  # Reset file pointer for processing
+            # Store the upload once per distinct content
+            upload_store = get_upload_store()
+            blob = upload_store.put(file.stream)
 
             # Log file upload
             security_audit_service.log_file_upload(
-                user_id, file.filename, len(file.read()), market, request
+                user_id, file.filename, blob.size, market, request
+            )
+
+            # Identical workbook already processed for this market and month: reuse its batch
+            duplicate = uploaded_file_service.find_duplicate(market, data_month, blob.content_hash)
+            if duplicate:
+                logger.info(f"Duplicate upload for {market} {data_month}, reusing batch {duplicate.batch_id}")
+                flash(f'This file was already uploaded as batch {duplicate.batch_id}; '
+                      f'showing the existing results.', 'info')
+                return redirect(url_for('excel.result',
+                                      market=market,
+                                      dataMonth=data_month,
+                                      batchId=duplicate.batch_id))
+
+            # Generate batch ID
+            batch_id = f"{market}_{data_month}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{str(uuid.uuid4())[:8]}"
+
+            # Expose the file under its market/month storage path and catalog it for later download
+            original_filename = secure_filename(file.filename)
+            stored_path = upload_store.batch_path(market, data_month, batch_id, original_filename)
+            upload_store.link(blob, stored_path)
+            uploaded_file_service.record_upload(
+                batch_id=batch_id,
+                market_name=market,
+                data_month=data_month,
+                original_filename=original_filename,
+                stored_path=stored_path,
+                content_hash=blob.content_hash,
+                file_size=blob.size,
+                user_id=user_id
             )
-            file.seek(0)  # Reset file pointer
 
             # Process Excel file
-            result = excel_service.process_excel_file(file, market)
+            parse_started = time.perf_counter()
+            result = excel_service.process_excel_path(
+                blob.path, market,
+                content_hash=blob.content_hash,
+                result_cache=current_app.extensions.get('parse_cache')
+            )
+            parse_seconds = time.perf_counter() - parse_started
             data = result.get('data', {})
             
-            # Save data to database
-            excel_data_service.save_excel_data(
+            # Save data to database, through the group-commit writer when it is enabled
+            ingest_writer = get_ingest_writer()
+            save_excel_data = ingest_writer.save_excel_data if ingest_writer else excel_data_service.save_excel_data
+            save_excel_data(
                 market=market,
                 units=data.get('units', []),
                 metrics=data.get('metrics', []),
@@ -100,8 +135,12 @@ def upload():
                 batch_id=batch_id,
                 user_id=user_id,
                 worksheet_name=data.get('worksheetName', ''),
-                upload_timestamp=datetime.now()
+                upload_timestamp=datetime.now(),
+                content_hash=blob.content_hash,
+                parse_seconds=parse_seconds
             )
+
+            uploaded_file_service.update_status(batch_id, UploadedFile.STATUS_PROCESSED)
             
             flash('File uploaded and processed successfully!', 'success')
             return redirect(url_for('excel.result', 
@@ -111,9 +150,17 @@ def upload():
             
         except Exception as e:
             logger.error(f"Error processing file upload: {e}", exc_info=True)
+            if batch_id:
+                uploaded_file_service.update_status(batch_id, UploadedFile.STATUS_FAILED)
             flash(f'Error processing file: {str(e)}', 'error')
             return redirect(url_for('excel.upload'))
 
+def batch_fragment_key(data_list, batch_id):
+    """Fragment cache key for a page showing exactly one whole batch, else None"""
+    if data_list and batch_id and all(d.batch_id == batch_id for d in data_list):
+        return batch_id
+    return None
+
 @excel_bp.route('/result')
 def result():
     """Display upload results"""
@@ -126,30 +173,30 @@ def result():
         return redirect(url_for('excel.upload'))
     
     # Get data for display
-    data_list = excel_data_service.get_data_by_filters(
+    data_list = excel_data_service.get_projected_data_by_filters(
+        'listing',
         market_name=market,
         data_month=data_month,
         batch_id=batch_id
     )
     
-    # Prepare data for template
-    if data_list:
-        sample_data = data_list[0]
-        data = {
-            'worksheetName': sample_data.worksheet_name,
-            'units': [d.unit_name for d in data_list],
-            'metrics': [d.metric_name for d in data_list]
-        }
-    else:
-        data = {'worksheetName': '', 'units': [], 'metrics': []}
+    # Prepare data for template; batch details come from its manifest
+    manifest = batch_service.get_batch(batch_id) if batch_id else None
+    data = {
+        'worksheetName': manifest.worksheet_name if manifest else (data_list[0].worksheet_name if data_list else ''),
+        'units': [d.unit_name for d in data_list],
+        'metrics': [d.metric_name for d in data_list]
+    }
     
     return render_template('excel/result.html', 
                          market=market,
                          dataMonth=data_month,
                          batchId=batch_id,
-                         data=data)
+                         data=data,
+                         fragmentKey=batch_fragment_key(data_list, batch_id))
 
 @excel_bp.route('/view')
+@read_only
 def view():
     """View Excel data"""
     market = request.args.get('market')
@@ -157,31 +204,31 @@ def view():
     batch_id = request.args.get('batchId')
     
     # Get data for display
-    data_list = excel_data_service.get_data_by_filters(
+    data_list = excel_data_service.get_projected_data_by_filters(
+        'listing',
         market_name=market,
         data_month=data_month,
         batch_id=batch_id
     )
     
-    # Prepare data for template
-    if data_list:
-        sample_data = data_list[0]
-        data = {
-            'worksheetName': sample_data.worksheet_name,
-            'units': [d.unit_name for d in data_list],
-            'metrics': [d.metric_name for d in data_list]
-        }
-    else:
-        data = {'worksheetName': '', 'units': [], 'metrics': []}
+    # Prepare data for template; batch details come from its manifest
+    manifest = batch_service.get_batch(batch_id) if batch_id else None
+    data = {
+        'worksheetName': manifest.worksheet_name if manifest else (data_list[0].worksheet_name if data_list else ''),
+        'units': [d.unit_name for d in data_list],
+        'metrics': [d.metric_name for d in data_list]
+    }
     
     return render_template('excel/view.html', 
                          market=market,
                          dataMonth=data_month,
                          batchId=batch_id,
-                         data=data)
+                         data=data,
+                         fragmentKey=batch_fragment_key(data_list, batch_id))
 
 @excel_bp.route('/viewallmarketresults')
 @security_required
+@read_only
 def view_all_market_results():
     """View all market results with filtering"""
     # Get filter parameters
@@ -204,30 +251,17 @@ def view_all_market_results():
         user_id=selected_user_id
     )
     
-    # Calculate statistics
-    total_records = len(aggregated_data)
-    unique_batches = len(set(item['batchId'] for item in aggregated_data))
-    unique_users = len(set(item['userId'] for item in aggregated_data))
-    unique_markets = len(set(item['market'] for item in aggregated_data))
-
-    # Calculate monthly data statistics for 3 categories
-    monthly_stats = {
-        'lastYearActual': {},
-        'currentYearActual': {},
-        'currentYearTarget': {}
-    }
-
+    # Calculate statistics, from the rollups unless filtering by batch or user
+    if rollup_service.covers(selected_batch_id, selected_user_id):
+        stats = rollup_service.get_statistics(selected_market, selected_data_month)
+    else:
+        stats = excel_data_service.get_statistics(aggregated_data)
     months = ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
              "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
 
-    for item in aggregated_data:
-        for category in ['lastYearActual', 'currentYearActual', 'currentYearTarget']:
-            if category in item and item[category]:
-                for month in months:
-                    if month in item[category] and item[category][month]:
-                        if month not in monthly_stats[category]:
-                            monthly_stats[category][month] = 0
-                        monthly_stats[category][month] += 1
+    # Table rows are rendered (and cached) per batch; rows are ordered by batch already
+    batch_groups = [(batch, list(items)) for batch, items in
+                    groupby(aggregated_data[:100], key=lambda item: item['batchId'])]
 
     return render_template('excel/viewallmarketresults.html',
                          markets=markets,
@@ -239,9 +273,101 @@ def view_all_market_results():
                          selectedBatchId=selected_batch_id,
                          selectedUserId=selected_user_id,
                          aggregatedData=aggregated_data,
-                         totalRecords=total_records,
-                         uniqueBatches=unique_batches,
-                         uniqueUsers=unique_users,
-                         uniqueMarkets=unique_markets,
-                         monthlyStats=monthly_stats,
-                         months=months)
+                         batchGroups=batch_groups,
+                         totalRecords=stats['totalRecords'],
+                         uniqueBatches=stats['uniqueBatches'],
+                         uniqueUsers=stats['uniqueUsers'],
+                         uniqueMarkets=stats['uniqueMarkets'],
+                         monthlyStats=stats['monthlyStats'],
+                         months=months,
+                         exportFormats=export_service.available_formats())
+
+@excel_bp.route('/export')
+@security_required
+@read_only
+def export():
+    """Stream the rows matching the View All Market Results filters as CSV, XLSX or Parquet"""
+    format_name = request.args.get('format', 'csv').lower()
+    export_format = export_service.get_format(format_name)
+    if not export_format:
+        flash(f'Export format not available: {format_name}', 'error')
+        return redirect(url_for('excel.view_all_market_results'))
+
+    filters = {
+        'market_name': request.args.get('selectedMarket') or None,
+        'data_month': request.args.get('selectedDataMonth') or None,
+        'batch_id': request.args.get('selectedBatchId') or None,
+        'user_id': request.args.get('selectedUserId') or None,
+    }
+
+    user_id = user_service.get_user_id()
+    logger.info(f"User {user_id} exporting {format_name} with filters {filters}")
+
+    filename = f"gcdm_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{export_format.extension}"
+    content = export_service.stream(export_format, current_app.config.get('EXPORT_BATCH_SIZE', 1000), **filters)
+    return Response(stream_with_context(content), mimetype=export_format.mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+@excel_bp.route('/compare')
+@security_required
+@read_only
+def compare():
+    """Stream the differences between two batches (batchA = old, batchB = new) as JSON or CSV"""
+    batch_a = request.args.get('batchA', '').strip()
+    batch_b = request.args.get('batchB', '').strip()
+    format_name = request.args.get('format', 'json').lower()
+    if not batch_a or not batch_b or format_name not in ('json', 'csv'):
+        return jsonify({'error': 'batchA, batchB and format (json or csv) are required'}), 400
+
+    diff = batch_diff_service.compare(batch_a, batch_b)
+    if diff is None:
+        return jsonify({'error': 'Batch not found'}), 404
+
+    user_id = user_service.get_user_id()
+    logger.info(f"User {user_id} comparing batches {batch_a} and {batch_b} as {format_name}")
+
+    if format_name == 'csv':
+        return Response(stream_with_context(batch_diff_service.stream_csv(diff)), mimetype='text/csv',
+                        headers={'Content-Disposition': f'attachment; filename=batch_diff_{batch_b}.csv'})
+    return Response(stream_with_context(batch_diff_service.stream_json(diff)), mimetype='application/json')
+
+@excel_bp.route('/report/<batch_id>')
+@security_required
+@read_only
+def batch_report(batch_id):
+    """Download a batch regenerated as its market's template workbook"""
+    try:
+        path = current_app.extensions['report_builder'].batch_workbook(batch_id)
+        if not path:
+            flash('No data found for this batch.', 'error')
+            return redirect(url_for('excel.view_all_market_results'))
+        return send_file(os.path.abspath(path), as_attachment=True, download_name=f"{batch_id}.xlsx")
+
+    except Exception as e:
+        logger.error(f"Error generating workbook for batch {batch_id}: {e}", exc_info=True)
+        flash(f'Error generating workbook: {str(e)}', 'error')
+        return redirect(url_for('excel.view_all_market_results'))
+
+@excel_bp.route('/report/consolidated')
+@security_required
+@read_only
+def consolidated_report():
+    """Download one workbook with the latest batch of every market for a data month"""
+    data_month = request.args.get('dataMonth')
+    if not data_month or not excel_data_service._is_valid_data_month(data_month):
+        flash('Please select a valid data month.', 'error')
+        return redirect(url_for('excel.view_all_market_results'))
+
+    try:
+        path = current_app.extensions['report_builder'].consolidated_workbook(
+            data_month, market_config_loader.get_available_markets())
+        if not path:
+            flash(f'No data found for {data_month}.', 'error')
+            return redirect(url_for('excel.view_all_market_results', selectedDataMonth=data_month))
+        return send_file(os.path.abspath(path), as_attachment=True,
+                         download_name=f"Customer_Metrics_{data_month}_all_markets.xlsx")
+
+    except Exception as e:
+        logger.error(f"Error generating consolidated workbook for {data_month}: {e}", exc_info=True)
+        flash(f'Error generating workbook: {str(e)}', 'error')
+        return redirect(url_for('excel.view_all_market_results'))
@@ -0,0 +1,118 @@
+"""
+Database engine setup for GCDM Auto application
+"""
+
+import logging
+from typing import Any, Dict, List, Mapping
+from sqlalchemy import event, inspect
+from sqlalchemy.engine import Engine, make_url
+
+logger = logging.getLogger(__name__)
+
+
+def is_memory_sqlite(uri: str) -> bool:
+    """Check if a database URI points at an in-memory SQLite database"""
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def build_engine_options(config: Mapping[str, Any]) -> Dict[str, Any]:
+    """Build SQLALCHEMY_ENGINE_OPTIONS from the DB_POOL_* settings"""
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+
+    # In-memory SQLite runs on a single static connection; QueuePool arguments
+    # are rejected by create_engine() for that pool class
+    if is_memory_sqlite(config['SQLALCHEMY_DATABASE_URI']):
+        return options
+
+    options.setdefault('pool_size', config.get('DB_POOL_SIZE', 10))
+    options.setdefault('max_overflow', config.get('DB_MAX_OVERFLOW', 20))
+    options.setdefault('pool_timeout', config.get('DB_POOL_TIMEOUT', 30))
+    options.setdefault('pool_recycle', config.get('DB_POOL_RECYCLE', 3600))
+    options.setdefault('pool_pre_ping', config.get('DB_POOL_PRE_PING', True))
+    return options
+
+
+# Execution options of a SQLite connection whose transactions take the write lock up front (the
+# ingest writer's): pysqlite's own transaction handling is off (isolation level AUTOCOMMIT), and the
+# begin listener of register_sqlite_pragmas opens every transaction with BEGIN IMMEDIATE instead.
+# pysqlite emits no BEGIN before a SAVEPOINT, so without this a savepoint would commit on RELEASE;
+# this is SQLAlchemy's documented pysqlite transaction recipe, limited to these connections.
+IMMEDIATE_TRANSACTION = {'isolation_level': 'AUTOCOMMIT', 'sqlite_begin': 'BEGIN IMMEDIATE'}
+
+
+def register_sqlite_pragmas(engine: Engine, pragmas: Mapping[str, Any]) -> None:
+    """
+    Apply PRAGMA statements to every new connection of a SQLite engine, and open the
+    transactions of connections with a 'sqlite_begin' execution option (IMMEDIATE_TRANSACTION)
+    with that statement
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    statements = [f"PRAGMA {name}={value}" for name, value in pragmas.items()]
+
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+    @event.listens_for(engine, 'begin')
+    def _begin_transaction(connection):
+        begin = connection.get_execution_options().get('sqlite_begin')
+        if begin:
+            connection.exec_driver_sql(begin)
+
+    if statements:
+        logger.info(f"Registered SQLite pragmas on {engine.url}: {', '.join(statements)}")
+
+
+def init_database(app) -> None:
+    """Initialize the database extension and connection settings for an app"""
+    from app.models import db
+
+    db.init_app(app)
+
+    with app.app_context():
+        for engine in db.engines.values():
+            register_sqlite_pragmas(engine, app.config.get('SQLITE_PRAGMAS', {}))
+
+
+def all_engines(db) -> List[Engine]:
+    """Engines of the main database and binds, plus the market shards when sharding is on"""
+    from app.sharding import get_shard_router
+
+    router = get_shard_router()
+    return list(db.engines.values()) + (list(router.engines.values()) if router else [])
+
+
+def add_missing_columns(db) -> None:
+    """
+    Add nullable columns and indexes introduced after a table was first created.
+    create_all() only creates missing tables, so existing databases would
+    otherwise lack newly added model columns and their indexes.
+    """
+    for engine in all_engines(db):
+        inspector = inspect(engine)
+        existing_tables = set(inspector.get_table_names())
+        with engine.begin() as connection:
+            for table in db.metadata.sorted_tables:
+                if table.name not in existing_tables:
+                    continue
+                existing = {column['name'] for column in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name in existing or not column.nullable:
+                        continue
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    connection.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}')
+                    logger.info(f"Added column {table.name}.{column.name}")
+
+                existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+                for index in table.indexes:
+                    if index.name not in existing_indexes:
+                        index.create(connection)
+                        logger.info(f"Added index {index.name} on {table.name}")
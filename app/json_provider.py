@@ -0,0 +1,55 @@
+"""
+JSON serialization for GCDM Auto application
+
+Uses orjson when it is installed (several times faster than the standard
+library on the large row lists the API returns) and falls back to Flask's
+default provider otherwise. Objects with a __json__() method (e.g. the
+compact aggregated records) serialize as what it returns.
+"""
+
+from typing import Any
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    to_json = getattr(obj, '__json__', None)
+    if to_json is not None:
+        return to_json()
+    return DefaultJSONProvider.default(obj)
+
+
+class JSONProvider(DefaultJSONProvider):
+    """Flask's default provider, with __json__ support"""
+
+    default = staticmethod(_default)
+
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson"""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return orjson.dumps(obj, default=self.default, option=self._options()).decode('utf-8')
+
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj, default=self.default, option=self._options()),
+                                        mimetype=self.mimetype)
+
+    def _options(self) -> int:
+        options = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        return options
+
+
+def init_json(app) -> None:
+    """Install the fastest available JSON provider on the app"""
+    app.json = OrjsonProvider(app) if orjson is not None else JSONProvider(app)
@@ -3,11 +3,18 @@ Database models for GCDM Auto application
 """
 
 from flask_sqlalchemy import SQLAlchemy
+from app.sharding import ShardedSession
 
-# This will be initialized in app.py
-db = SQLAlchemy()
+# This will be initialized in app.py; the session routes market-sharded tables (app/sharding.py)
+db = SQLAlchemy(session_options={'class_': ShardedSession})
 
 from .excel_data import ExcelData
 from .data_period import DataPeriod
+from .uploaded_file import UploadedFile
+from .data_version import DataVersion
+from .rollup import MetricRollup
+from .batch import Batch
+from .period import period_key, is_period_key, backfill_period_keys
 
-__all__ = ['db', 'ExcelData', 'DataPeriod']
+__all__ = ['db', 'ExcelData', 'DataPeriod', 'UploadedFile', 'DataVersion', 'MetricRollup', 'Batch',
+           'period_key', 'is_period_key', 'backfill_period_keys']
@@ -0,0 +1,52 @@
+"""
+Batch model - manifest of one processed upload, written once in the same transaction as its rows
+"""
+
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, Float, Index
+from . import db
+from .period import period_key as to_period_key
+
+class Batch(db.Model):
+    __tablename__ = 'batch'
+    __table_args__ = (
+        Index('ix_batch_market_period', 'market_name', 'period_key'),
+        Index('ix_batch_user', 'user_id'),
+    )
+
+    # Load status
+    STATUS_LOADED = 'LOADED'  # rows committed together with this manifest
+    STATUS_BACKFILLED = 'BACKFILLED'  # rebuilt from rows stored before manifests existed
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    batch_id = Column(String(255), nullable=False, unique=True)
+    market_name = Column(String(255), nullable=False)
+    data_month = Column(String(255), nullable=False)  # Format: 2025-Apr
+    period_key = Column(Integer)  # data_month as yyyymm, e.g. 202504
+    user_id = Column(String(255), nullable=False)
+    worksheet_name = Column(String(255))
+    upload_time = Column(DateTime, nullable=False)
+    row_count = Column(Integer, nullable=False, default=0)
+    content_hash = Column(String(64))  # SHA-256 of the uploaded file, when known
+    parse_seconds = Column(Float)
+    insert_seconds = Column(Float)
+    status = Column(String(20), nullable=False)
+
+    def __init__(self, batch_id, market_name, data_month, user_id, worksheet_name=None,
+                 upload_time=None, row_count=0, content_hash=None, parse_seconds=None,
+                 insert_seconds=None, status=STATUS_LOADED):
+        self.batch_id = batch_id
+        self.market_name = market_name
+        self.data_month = data_month
+        self.period_key = to_period_key(data_month)
+        self.user_id = user_id
+        self.worksheet_name = worksheet_name
+        self.upload_time = upload_time or datetime.now()
+        self.row_count = row_count
+        self.content_hash = content_hash
+        self.parse_seconds = parse_seconds
+        self.insert_seconds = insert_seconds
+        self.status = status
+
+    def __repr__(self):
+        return f'<Batch {self.batch_id} ({self.row_count} rows, {self.status})>'
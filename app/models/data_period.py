@@ -3,15 +3,20 @@ DataPeriod model - equivalent to Java DataPeriod entity
 """
 
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Index
 from . import db
+from .period import period_key as to_period_key
 
 class DataPeriod(db.Model):
     __tablename__ = 'data_period'
+    __table_args__ = (
+        Index('ix_data_period_market_period', 'market_name', 'period_key'),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     market_name = Column(String(255), nullable=False)
     data_month = Column(String(255), nullable=False)  # Format: 2025-Apr
+    period_key = Column(Integer)  # data_month as yyyymm, e.g. 202504
     active_idc = Column(String(1), nullable=False)  # 'Y' or 'N'
     update_by = Column(String(255), nullable=False)
     update_time = Column(DateTime, nullable=False)
@@ -19,6 +24,7 @@ class DataPeriod(db.Model):
     def __init__(self, market_name, data_month, active_idc='Y', update_by='admin'):
         self.market_name = market_name
         self.data_month = data_month
+        self.period_key = to_period_key(data_month)
         self.active_idc = active_idc
         self.update_by = update_by
         self.update_time = datetime.now()
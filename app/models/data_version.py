@@ -0,0 +1,44 @@
+"""
+DataVersion model - change counters shared by all worker processes
+"""
+
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, update
+from sqlalchemy.exc import IntegrityError
+from . import db
+
+class DataVersion(db.Model):
+    __tablename__ = 'data_version'
+
+    EXCEL_DATA = 'excel_data'
+    DATA_PERIOD = 'data_period'
+
+    name = Column(String(64), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    update_time = Column(DateTime, nullable=False)
+
+    def __init__(self, name, version=0):
+        self.name = name
+        self.version = version
+        self.update_time = datetime.now()
+
+    @classmethod
+    def bump(cls, name):
+        """Increment a counter inside the current transaction; committed together with the data change"""
+        values = {'version': cls.version + 1, 'update_time': datetime.now()}
+        if db.session.execute(update(cls).where(cls.name == name).values(**values)).rowcount:
+            return
+        try:
+            with db.session.begin_nested():
+                db.session.add(cls(name, version=1))
+        except IntegrityError:
+            # Created concurrently by another process
+            db.session.execute(update(cls).where(cls.name == name).values(**values))
+
+    @classmethod
+    def current(cls, name):
+        """Current value of a counter (0 if it was never bumped)"""
+        return db.session.query(cls.version).filter(cls.name == name).scalar() or 0
+
+    def __repr__(self):
+        return f'<DataVersion {self.name}={self.version}>'
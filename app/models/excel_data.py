@@ -3,17 +3,24 @@ ExcelData model - equivalent to Java ExcelData entity
 """
 
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, Text
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index, ForeignKey
 from . import db
+from .period import period_key as to_period_key
 
 class ExcelData(db.Model):
     __tablename__ = 'excel_data'
+    __table_args__ = (
+        Index('ix_excel_data_period_key', 'period_key'),
+        Index('ix_excel_data_market_period', 'market_name', 'period_key'),
+        Index('ix_excel_data_batch_ref', 'batch_ref'),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     market_name = Column(String(255), nullable=False)
     unit_name = Column(String(255), nullable=False)
     metric_name = Column(String(255), nullable=False)
     data_month = Column(String(255), nullable=False)  # Format: 2025-Apr
+    period_key = Column(Integer)  # data_month as yyyymm, e.g. 202504
     
     # Last Year Actual (12 months)
     jan_lya = Column(String(255))
@@ -60,17 +67,20 @@ class ExcelData(db.Model):
     upload_timestamp = Column(DateTime, nullable=False)
     worksheet_name = Column(String(255))
     batch_id = Column(String(255), nullable=False)
+    batch_ref = Column(Integer, ForeignKey('batch.id'))  # manifest row of the batch
     user_id = Column(String(255), nullable=False)
     created_time = Column(DateTime, nullable=False)
     updated_time = Column(DateTime, nullable=False)
     
     def __init__(self, market_name, unit_name, metric_name, data_month, 
-                 batch_id, user_id, worksheet_name=None, upload_timestamp=None):
+                 batch_id, user_id, worksheet_name=None, upload_timestamp=None, batch_ref=None):
         self.market_name = market_name
         self.unit_name = unit_name
         self.metric_name = metric_name
         self.data_month = data_month
+        self.period_key = to_period_key(data_month)
         self.batch_id = batch_id
+        self.batch_ref = batch_ref
         self.user_id = user_id
         self.worksheet_name = worksheet_name
         self.upload_timestamp = upload_timestamp or datetime.now()
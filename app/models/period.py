@@ -0,0 +1,46 @@
+"""
+Integer period keys - sortable yyyymm form of the text data month (2025-Apr -> 202504)
+"""
+
+import logging
+from typing import Optional
+from sqlalchemy import select, update
+from . import db
+
+logger = logging.getLogger(__name__)
+
+MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun",
+          "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+def period_key(data_month: Optional[str]) -> Optional[int]:
+    """yyyymm key of a data month such as 2025-Apr, or None if it is not in that format"""
+    if not data_month:
+        return None
+    year, _, month = data_month.strip().partition('-')
+    if len(year) != 4 or not year.isdigit() or month not in MONTHS:
+        return None
+    return int(year) * 100 + MONTHS.index(month) + 1
+
+def is_period_key(value) -> bool:
+    """Check a value is a valid yyyymm period key (e.g., 202504)"""
+    return isinstance(value, int) and 100001 <= value <= 999912 and 1 <= value % 100 <= 12
+
+def backfill_period_keys(model) -> int:
+    """Fill period_key on rows stored before the column existed; returns the number of rows updated"""
+    months = db.session.execute(
+        select(model.data_month).where(model.period_key.is_(None)).distinct()
+    ).scalars().all()
+
+    updated = 0
+    for data_month in months:
+        key = period_key(data_month)
+        if key is None:
+            continue
+        updated += db.session.execute(
+            update(model).where(model.data_month == data_month, model.period_key.is_(None)).values(period_key=key)
+        ).rowcount
+    db.session.commit()
+
+    if updated:
+        logger.info(f"Backfilled period_key on {updated} {model.__tablename__} rows")
+    return updated
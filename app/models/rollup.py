@@ -0,0 +1,58 @@
+"""
+MetricRollup model - per-market/month totals maintained when Excel data is saved
+"""
+
+from sqlalchemy import Column, Integer, String, Float, Index
+from . import db
+
+class MetricRollup(db.Model):
+    """Monthly sums and filled-value counts of one unit/metric/category in one market and data month"""
+    __tablename__ = 'metric_rollup'
+    __table_args__ = (
+        Index('ix_metric_rollup_period', 'period_key', 'market_name'),
+    )
+
+    # Categories, matching the Excel column suffixes
+    LYA = 'LYA'  # Last Year Actual
+    CYA = 'CYA'  # Current Year Actual
+    CYT = 'CYT'  # Current Year Target
+    CATEGORIES = (LYA, CYA, CYT)
+
+    market_name = Column(String(255), primary_key=True)
+    data_month = Column(String(255), primary_key=True)  # Format: 2025-Apr
+    unit_name = Column(String(255), primary_key=True)
+    metric_name = Column(String(255), primary_key=True)
+    category = Column(String(3), primary_key=True)
+    period_key = Column(Integer)  # data_month as yyyymm, e.g. 202504
+    row_count = Column(Integer, nullable=False, default=0)
+
+    # Sum of the numeric values per month
+    jan = Column(Float, nullable=False, default=0)
+    feb = Column(Float, nullable=False, default=0)
+    mar = Column(Float, nullable=False, default=0)
+    apr = Column(Float, nullable=False, default=0)
+    may = Column(Float, nullable=False, default=0)
+    jun = Column(Float, nullable=False, default=0)
+    jul = Column(Float, nullable=False, default=0)
+    aug = Column(Float, nullable=False, default=0)
+    sep = Column(Float, nullable=False, default=0)
+    oct = Column(Float, nullable=False, default=0)
+    nov = Column(Float, nullable=False, default=0)
+    dec = Column(Float, nullable=False, default=0)
+
+    # Number of non-blank values per month
+    jan_count = Column(Integer, nullable=False, default=0)
+    feb_count = Column(Integer, nullable=False, default=0)
+    mar_count = Column(Integer, nullable=False, default=0)
+    apr_count = Column(Integer, nullable=False, default=0)
+    may_count = Column(Integer, nullable=False, default=0)
+    jun_count = Column(Integer, nullable=False, default=0)
+    jul_count = Column(Integer, nullable=False, default=0)
+    aug_count = Column(Integer, nullable=False, default=0)
+    sep_count = Column(Integer, nullable=False, default=0)
+    oct_count = Column(Integer, nullable=False, default=0)
+    nov_count = Column(Integer, nullable=False, default=0)
+    dec_count = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<MetricRollup {self.market_name}-{self.data_month}-{self.unit_name}-{self.metric_name} {self.category}>'
@@ -0,0 +1,53 @@
+"""
+UploadedFile model - catalog of stored uploads, one record per batch, pointing at its content blob
+"""
+
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, Index
+from . import db
+
+class UploadedFile(db.Model):
+    __tablename__ = 'uploaded_file'
+    __table_args__ = (
+        Index('ix_uploaded_file_hash_market_month', 'content_hash', 'market_name', 'data_month'),
+        Index('ix_uploaded_file_market_month_time', 'market_name', 'data_month', 'upload_time'),
+        Index('ix_uploaded_file_upload_time', 'upload_time'),
+    )
+
+    # Archive compression of the stored content (None = stored raw, not yet archived)
+    COMPRESSION_XZ = 'xz'
+    COMPRESSION_NONE = 'none'  # archived raw: compressing would not save space
+
+    # Processing status
+    STATUS_UPLOADED = 'UPLOADED'  # stored, not (yet) processed
+    STATUS_PROCESSED = 'PROCESSED'
+    STATUS_FAILED = 'FAILED'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    batch_id = Column(String(255), nullable=False, unique=True)
+    market_name = Column(String(255), nullable=False)
+    data_month = Column(String(255), nullable=False)  # Format: 2025-Apr
+    original_filename = Column(String(255), nullable=False)
+    stored_path = Column(String(512), nullable=False)  # relative to UPLOAD_FOLDER
+    content_hash = Column(String(64), nullable=False)  # SHA-256 hex digest of the file content
+    file_size = Column(Integer, nullable=False)
+    user_id = Column(String(255), nullable=False)
+    status = Column(String(20), nullable=False)
+    compression = Column(String(10))
+    upload_time = Column(DateTime, nullable=False)
+
+    def __init__(self, batch_id, market_name, data_month, original_filename, stored_path,
+                 content_hash, file_size, user_id, status=STATUS_UPLOADED, upload_time=None):
+        self.batch_id = batch_id
+        self.market_name = market_name
+        self.data_month = data_month
+        self.original_filename = original_filename
+        self.stored_path = stored_path
+        self.content_hash = content_hash
+        self.file_size = file_size
+        self.user_id = user_id
+        self.status = status
+        self.upload_time = upload_time or datetime.now()
+
+    def __repr__(self):
+        return f'<UploadedFile {self.batch_id} ({self.content_hash[:12]}, {self.status})>'
@@ -0,0 +1,118 @@
+"""
+Read-only database engines for reporting queries
+
+Dashboard and API reads run on engines of their own, separate from the
+engines uploads write through: SQLite `mode=ro` connections to the same
+files (or to a replica, DB_READ_ONLY_URI), with their own connection pool
+(DB_READ_ONLY_POOL_SIZE, DB_READ_ONLY_MAX_OVERFLOW). With WAL, a reader
+never waits for a writer, so long dashboard queries no longer queue behind
+upload commits for a pooled connection. Market shards get a read-only
+engine each (DB_READ_ONLY_SHARD_URI places shard replicas).
+
+Routes opt in with the @read_only decorator (or `with using_read_only():`).
+ShardedSession.get_bind then sends their SELECT statements to the read-only
+engine of the database they would otherwise use; anything they write still
+goes to the primary engine. Requests that must see their own writes right
+away (e.g. the upload result page) stay on the primary.
+"""
+
+import logging
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Dict, Iterator, Mapping, Optional
+import sqlalchemy as sa
+from flask import current_app
+from sqlalchemy.engine import URL, make_url
+
+logger = logging.getLogger(__name__)
+
+# Pragmas that change the database file, which a read-only connection may not run
+WRITE_PRAGMAS = ('journal_mode', 'synchronous')
+
+_read_only: ContextVar[bool] = ContextVar('read_only', default=False)
+
+
+def read_only_url(url: URL) -> URL:
+    """URL opening a SQLite database file with mode=ro; other URLs are returned as they are"""
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        return url
+    if url.query.get('uri') == 'true':
+        return url.update_query_dict({'mode': 'ro'})
+    return url.set(database=f"file:{os.path.abspath(url.database)}",
+                   query={**url.query, 'mode': 'ro', 'uri': 'true'})
+
+
+def is_read_only() -> bool:
+    """Check whether the current request or block reads through the read-only engines"""
+    return _read_only.get()
+
+
+@contextmanager
+def using_read_only() -> Iterator[None]:
+    """Send the SELECT statements of the block to the read-only engines"""
+    token = _read_only.set(True)
+    try:
+        yield
+    finally:
+        _read_only.reset(token)
+
+
+def read_only(f):
+    """Route decorator: the view's queries read through the read-only engines"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        with using_read_only():
+            return f(*args, **kwargs)
+    return decorated_function
+
+
+def get_read_only_engine(shard: Optional[str]) -> Optional[sa.engine.Engine]:
+    """Read-only engine of a database (shard key, None for the main one), or None when there is none"""
+    engines = current_app.extensions.get('read_only_engines')
+    return engines.get(shard) if engines else None
+
+
+def _create_engine(url: URL, config: Mapping[str, Any]) -> sa.engine.Engine:
+    from app.database import build_engine_options, register_sqlite_pragmas
+
+    options = build_engine_options({**config, 'SQLALCHEMY_DATABASE_URI': url,
+                                    'SQLALCHEMY_ENGINE_OPTIONS': None,
+                                    'DB_POOL_SIZE': config.get('DB_READ_ONLY_POOL_SIZE', 10),
+                                    'DB_MAX_OVERFLOW': config.get('DB_READ_ONLY_MAX_OVERFLOW', 20)})
+    engine = sa.create_engine(url, **options)
+    pragmas = {name: value for name, value in config.get('SQLITE_PRAGMAS', {}).items()
+               if name not in WRITE_PRAGMAS}
+    register_sqlite_pragmas(engine, {**pragmas, 'query_only': 1} if engine.dialect.name == 'sqlite' else pragmas)
+    return engine
+
+
+def init_read_only(app) -> None:
+    """Create the read-only engines of the main database and the market shards when DB_READ_ONLY_ENABLED is on"""
+    if not app.config.get('DB_READ_ONLY_ENABLED'):
+        return
+
+    from app.models import db
+    from app.sharding import MAIN, get_shard_router
+
+    with app.app_context():
+        primary = db.engine.url
+        router = get_shard_router()
+        shards = {market: engine.url for market, engine in router.engines.items()} if router else {}
+
+    if app.config.get('DB_READ_ONLY_URI'):
+        primary = make_url(app.config['DB_READ_ONLY_URI'])
+    elif primary.get_backend_name() != 'sqlite' or primary.database in (None, '', ':memory:'):
+        # No replica and no database file to open read-only: reads stay on the primary engine
+        return
+
+    template = app.config.get('DB_READ_ONLY_SHARD_URI')
+    engines: Dict[Optional[str], sa.engine.Engine] = {MAIN: _create_engine(read_only_url(primary), app.config)}
+    for market, url in shards.items():
+        if template:
+            url = make_url(template.format(market=market, market_lower=market.lower()))
+        engines[market] = _create_engine(read_only_url(url), app.config)
+
+    app.extensions['read_only_engines'] = engines
+    logger.info(f"Read-only engines for {len(engines)} databases, main: {engines[MAIN].url}")
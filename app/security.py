@@ -2,7 +2,7 @@
 Security configuration and middleware for Flask application
 """
 
-from flask import request, g, abort, jsonify
+from flask import current_app, request, g, abort, jsonify
 import logging
 import re
 import time
@@ -91,6 +91,7 @@ REQUEST_COUNTS = {}
 BLOCKED_IPS = set()
 
 # Security configuration
+LOCALHOST = '127.0.0.1'  # the application only ever binds to the loopback interface
 MAX_REQUESTS_PER_MINUTE = 60
 MAX_REQUESTS_PER_HOUR = 1000
 BLOCK_DURATION = 3600  # 1 hour in seconds
@@ -223,6 +224,18 @@ def security_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def cache_policy():
+    """
+    Cache-Control for the current request: the longest matching CACHE_CONTROL_PATHS
+    prefix, else the CACHE_CONTROL entry for its endpoint or blueprint, else None
+    """
+    config = current_app.config
+    for prefix, policy in sorted(config.get('CACHE_CONTROL_PATHS', {}).items(), key=lambda item: -len(item[0])):
+        if request.path.startswith(prefix):
+            return policy
+    policies = config.get('CACHE_CONTROL', {})
+    return policies.get(request.endpoint) or policies.get(request.blueprint)
+
 def add_security_headers(response):
     """Add comprehensive security headers to response"""
     # Basic security headers
@@ -231,10 +244,17 @@ def add_security_headers(response):
     response.headers['X-XSS-Protection'] = '1; mode=block'
     response.headers['Referrer-Policy'] = 'strict-origin-when-cross-origin'
 
-    # Cache control
-    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate, private'
-    response.headers['Pragma'] = 'no-cache'
-    response.headers['Expires'] = '0'
+    # Cache control: no-store unless a policy applies (only to successful responses,
+    # never to error redirects)
+    cache_control = cache_policy()
+    if cache_control and response.status_code in (200, 206, 304):
+        response.headers['Cache-Control'] = cache_control
+        response.headers.pop('Pragma', None)
+        response.headers.pop('Expires', None)
+    else:
+        response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate, private'
+        response.headers['Pragma'] = 'no-cache'
+        response.headers['Expires'] = '0'
 
     # HSTS (HTTP Strict Transport Security) - uncomment for HTTPS
     # response.headers['Strict-Transport-Security'] = 'max-age=31536000; includeSubDomains'
@@ -273,7 +293,7 @@ def init_security(app):
         original_run = app.run
         def secure_run(*args, **kwargs):
             # Force localhost binding
-            kwargs['host'] = '127.0.0.1'
+            kwargs['host'] = LOCALHOST
             if 'port' not in kwargs:
                 kwargs['port'] = 8080
             return original_run(*args, **kwargs)
@@ -0,0 +1,171 @@
+"""
+Production WSGI server for GCDM Auto application
+
+Runs the app under gunicorn (Linux/macOS) or waitress (Windows) with worker,
+thread, timeout, preload and recycling settings taken from the SERVER_*
+configuration. The server always binds to localhost.
+
+Usage:
+    python -m app.server
+"""
+
+import logging
+import multiprocessing
+import os
+import sys
+from typing import Any, Dict, Mapping
+
+from app.security import LOCALHOST
+
+logger = logging.getLogger(__name__)
+
+
+def prepare_app(app) -> None:
+    """Create the upload directory, database (and shard) tables/columns, period keys, batch manifests, rollups and hashed static assets before serving"""
+    from app.assets import build_assets
+    from app.database import add_missing_columns
+    from app.models import db, ExcelData, DataPeriod, backfill_period_keys
+    from app.services.batch_service import batch_service
+    from app.services.rollup_service import rollup_service
+    from app.sharding import get_shard_router, shard_keys, using_shard
+
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    if app.config.get('ASSET_BUILD_ON_STARTUP', True):
+        build_assets(app.static_folder)
+    with app.app_context():
+        db.create_all()
+        router = get_shard_router()
+        if router:
+            router.create_tables()
+        add_missing_columns(db)
+        for shard in shard_keys():
+            with using_shard(shard):
+                backfill_period_keys(ExcelData)
+        backfill_period_keys(DataPeriod)
+        # Databases with data saved before the batch manifest and rollup tables existed
+        if batch_service.needs_backfill():
+            batch_service.backfill()
+        if rollup_service.is_missing():
+            rollup_service.rebuild()
+
+
+def warm_caches(app) -> None:
+    """
+    Warm per-process caches so the first request does not pay for them.
+    Engines inherited from a preloading master are reset first: SQLite
+    connections must not be shared across a fork.
+    """
+    from app.database import all_engines
+    from app.models import db
+    from app.services.market_config_loader import market_config_loader
+
+    for market in market_config_loader.get_available_markets():
+        market_config_loader.get_config(market)
+
+    with app.app_context():
+        for engine in all_engines(db):
+            engine.dispose(close=False)
+            with engine.connect():
+                pass
+
+    logger.info(f"Warmed caches in process {os.getpid()}")
+
+
+def start_background_tasks(app) -> None:
+    """Start per-process background maintenance (each task guards against running twice)"""
+    if app.config.get('UPLOAD_MIGRATION_ON_STARTUP', True):
+        from app.services.upload_migrator import start_upload_migration
+        start_upload_migration(app)
+
+    from app.services.upload_archiver import start_upload_archiving
+    start_upload_archiving(app)
+
+
+def default_worker_count() -> int:
+    """2 x CPU cores + 1, capped so SQLite is not flooded with writers"""
+    return min(multiprocessing.cpu_count() * 2 + 1, 8)
+
+
+def gunicorn_options(config: Mapping[str, Any]) -> Dict[str, Any]:
+    """Translate SERVER_* settings into gunicorn settings"""
+    return {
+        'bind': f"{LOCALHOST}:{config.get('SERVER_PORT', 8080)}",
+        'workers': config.get('SERVER_WORKERS') or default_worker_count(),
+        'threads': config.get('SERVER_THREADS', 4),
+        'worker_class': 'gthread',
+        'timeout': config.get('SERVER_TIMEOUT', 120),
+        'graceful_timeout': config.get('SERVER_GRACEFUL_TIMEOUT', 30),
+        'keepalive': config.get('SERVER_KEEPALIVE', 5),
+        'preload_app': config.get('SERVER_PRELOAD', True),
+        'max_requests': config.get('SERVER_MAX_REQUESTS', 1000),
+        'max_requests_jitter': config.get('SERVER_MAX_REQUESTS_JITTER', 100),
+        'post_worker_init': lambda worker: (warm_caches(worker.wsgi), start_background_tasks(worker.wsgi)),
+    }
+
+
+def waitress_options(config: Mapping[str, Any]) -> Dict[str, Any]:
+    """Translate SERVER_* settings into waitress settings"""
+    workers = config.get('SERVER_WORKERS') or default_worker_count()
+    return {
+        'host': LOCALHOST,
+        'port': config.get('SERVER_PORT', 8080),
+        # waitress is single-process, so the thread pool absorbs the worker count
+        'threads': workers * config.get('SERVER_THREADS', 4),
+        'channel_timeout': config.get('SERVER_TIMEOUT', 120),
+    }
+
+
+def run_gunicorn(app, config: Mapping[str, Any]) -> None:
+    """
+    Serve with gunicorn. With preload on, workers fork from the app built in
+    the master; otherwise each worker builds its own through create_app().
+    """
+    from gunicorn.app.base import BaseApplication
+    from app import create_app
+
+    class GunicornServer(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app if self.options['preload_app'] else create_app()
+
+    GunicornServer(gunicorn_options(config)).run()
+
+
+def run_waitress(app, config: Mapping[str, Any]) -> None:
+    """Serve with waitress (Windows, or when gunicorn is unavailable)"""
+    from waitress import serve
+
+    warm_caches(app)
+    start_background_tasks(app)
+    serve(app, **waitress_options(config))
+
+
+def main():
+    from app import create_app
+
+    app = create_app()
+    prepare_app(app)
+    config = dict(app.config)
+
+    try:
+        import gunicorn  # noqa: F401
+        use_gunicorn = sys.platform != 'win32'
+    except ImportError:
+        use_gunicorn = False
+
+    print(f"Starting GCDM Auto production server on http://{LOCALHOST}:{config['SERVER_PORT']}")
+    if use_gunicorn:
+        run_gunicorn(app, config)
+    else:
+        run_waitress(app, config)
+
+
+if __name__ == '__main__':
+    main()
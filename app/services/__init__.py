@@ -8,6 +8,8 @@ from .excel_data_service import ExcelDataService
 from .data_period_service import DataPeriodService
 from .user_service import UserService
 from .security_audit_service import SecurityAuditService
+from .upload_store import UploadStore
+from .uploaded_file_service import UploadedFileService
 
 __all__ = [
     'MarketConfigLoader',
@@ -15,5 +17,7 @@ __all__ = [
     'ExcelDataService',
     'DataPeriodService',
     'UserService',
-    'SecurityAuditService'
+    'SecurityAuditService',
+    'UploadStore',
+    'UploadedFileService'
 ]
@@ -0,0 +1,214 @@
+"""
+Analytics Service - KPIs over the market funnel, computed with NumPy
+
+A batch is loaded into a metric x month x category array (categories LYA,
+CYA, CYT; units summed), and the KPIs of many batches are computed in one
+vectorized pass over their stacked arrays:
+
+- yoy: CYA / LYA - 1 per month
+- attainment: CYA / CYT per month
+- ytd: cumulative sums per category, and ytdAttainment = YTD CYA / YTD CYT
+- funnel: CYA conversion of each funnel step from the previous one, the
+  overall Leads -> Conversion rate, and ANP/VONB per mature lead
+
+Ratios with a zero or missing denominator are null. A batch's rows never
+change after upload, so results are cached per batch ID.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+from sqlalchemy import func, select
+from app.models import db, Batch, ExcelData, is_period_key
+from app.services.rollup_service import to_number
+from app.sharding import fan_out, read_shards
+
+logger = logging.getLogger(__name__)
+
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
+          "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+CATEGORIES = ('LYA', 'CYA', 'CYT')
+
+# Funnel steps in order, then the value metrics measured against mature leads
+FUNNEL = ("# of Leads", "# of Mature Leads", "# of Leads Assigned",
+          "# of Leads Act on", "# of Leads Conversion")
+VALUE_METRICS = ("ANP from mature leads", "VONB from mature leads")
+METRICS = FUNNEL + VALUE_METRICS
+METRIC_INDEX = {metric: index for index, metric in enumerate(METRICS)}
+MATURE_LEADS = METRIC_INDEX["# of Mature Leads"]
+
+# ExcelData columns in array order: category-major, then month
+VALUE_COLUMNS = [getattr(ExcelData, f"{month.lower()}_{category.lower()}")
+                 for category in CATEGORIES for month in MONTHS]
+
+def compute_kpis(values: np.ndarray) -> Dict[str, np.ndarray]:
+    """KPIs of stacked batch arrays shaped (batches, metrics, 12, 3); NaN marks missing values"""
+    lya, cya, cyt = values[..., 0], values[..., 1], values[..., 2]
+    ytd = np.nancumsum(values, axis=2)
+    # A month with no value at all stays missing in the running total
+    ytd[np.isnan(values)] = np.nan
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        kpis = {
+            'yoy': cya / lya - 1,
+            'attainment': cya / cyt,
+            'ytd': ytd,
+            'ytdAttainment': ytd[..., 1] / ytd[..., 2],
+            'funnel': cya[:, 1:len(FUNNEL)] / cya[:, :len(FUNNEL) - 1],
+            'overallConversion': cya[:, len(FUNNEL) - 1] / cya[:, 0],
+            'valuePerMatureLead': cya[:, len(FUNNEL):] / cya[:, MATURE_LEADS:MATURE_LEADS + 1],
+        }
+    for array in kpis.values():
+        array[~np.isfinite(array)] = np.nan
+    return kpis
+
+def _series(array: np.ndarray) -> List[Optional[float]]:
+    """Month values as a JSON-friendly list, with None for missing"""
+    return [None if np.isnan(value) else round(float(value), 6) for value in array]
+
+class AnalyticsService:
+    """Vectorized KPI computation with a per-batch result cache"""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load_batches(self, batch_ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """Array (metrics x 12 x 3, units summed) and identity of each batch"""
+        batches: Dict[str, Dict[str, Any]] = {}
+        if not batch_ids:
+            return batches
+
+        statement = (select(ExcelData.batch_id, ExcelData.market_name, ExcelData.data_month,
+                            ExcelData.metric_name, *VALUE_COLUMNS)
+                     .where(ExcelData.batch_id.in_(batch_ids)))
+        parts = fan_out(lambda: db.session.execute(statement).all())
+
+        for batch_id, market_name, data_month, metric_name, *cells in (row for part in parts for row in part):
+            batch = batches.get(batch_id)
+            if batch is None:
+                batch = batches[batch_id] = {
+                    'batchId': batch_id, 'market': market_name, 'dataMonth': data_month,
+                    'values': np.full((len(METRICS), len(CATEGORIES) * 12), np.nan)
+                }
+            index = METRIC_INDEX.get(metric_name)
+            if index is None:
+                continue
+            numbers = np.array([to_number(cell) for cell in cells], dtype=float)
+            target = batch['values'][index]
+            # Sum over units; a month stays missing only when no unit has a value for it
+            batch['values'][index] = np.where(np.isnan(target), numbers, target + np.nan_to_num(numbers))
+
+        for batch in batches.values():
+            batch['values'] = batch['values'].reshape(len(METRICS), len(CATEGORIES), 12).transpose(0, 2, 1)
+        return batches
+
+    def get_batch_kpis(self, batch_ids: Sequence[str]) -> List[Dict[str, Any]]:
+        """KPIs of the given batches, in order; unknown batches are left out"""
+        results: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            for batch_id in batch_ids:
+                if batch_id in self._cache:
+                    self._cache.move_to_end(batch_id)
+                    results[batch_id] = self._cache[batch_id]
+
+        missing = [batch_id for batch_id in dict.fromkeys(batch_ids) if batch_id not in results]
+        if missing:
+            try:
+                results.update(self._compute(missing))
+            except Exception as e:
+                logger.error(f"Failed to compute KPIs for {len(missing)} batches: {e}", exc_info=True)
+
+        return [results[batch_id] for batch_id in batch_ids if batch_id in results]
+
+    def get_market_kpis(self, market_name: Optional[str] = None, data_month: Optional[str] = None,
+                        period_from: Optional[int] = None, period_to: Optional[int] = None) -> List[Dict[str, Any]]:
+        """KPIs of the latest batch of every market and data month matching the filters"""
+        for bound in (period_from, period_to):
+            if bound is not None and not is_period_key(bound):
+                logger.warning(f"Invalid period key parameter: {bound}")
+                return []
+
+        # Batches of each market and data month, newest upload first (the later ID breaks a tie)
+        ranked = select(Batch.batch_id, Batch.market_name, Batch.period_key, func.row_number().over(
+            partition_by=(Batch.market_name, Batch.period_key, Batch.data_month),
+            order_by=(Batch.upload_time.desc(), Batch.id.desc())
+        ).label('position'))
+        if market_name:
+            ranked = ranked.where(Batch.market_name == market_name)
+        if data_month:
+            ranked = ranked.where(Batch.data_month == data_month)
+        if period_from is not None:
+            ranked = ranked.where(Batch.period_key >= period_from)
+        if period_to is not None:
+            ranked = ranked.where(Batch.period_key <= period_to)
+        ranked = ranked.subquery()
+        query = select(ranked.c.market_name, ranked.c.batch_id).where(ranked.c.position == 1) \
+            .order_by(ranked.c.market_name, ranked.c.period_key.desc())
+
+        try:
+            parts = read_shards(market_name, lambda: db.session.execute(query).all())
+            # A stable sort on the market keeps each shard's period order
+            batch_ids = [batch_id for _, batch_id in sorted((row for part in parts for row in part),
+                                                            key=lambda row: row.market_name)]
+        except Exception as e:
+            logger.error(f"Failed to find batches for KPIs: {e}", exc_info=True)
+            return []
+        return self.get_batch_kpis(batch_ids)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def _compute(self, batch_ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """Load the batches and compute their KPIs in one vectorized pass"""
+        batches = list(self.load_batches(batch_ids).values())
+        if not batches:
+            return {}
+
+        kpis = compute_kpis(np.stack([batch['values'] for batch in batches]))
+        results = {batch['batchId']: self._serialize(batch, {name: array[position] for name, array in kpis.items()})
+                   for position, batch in enumerate(batches)}
+
+        with self._lock:
+            for batch_id, result in results.items():
+                self._cache[batch_id] = result
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        logger.info(f"Computed KPIs for {len(results)} batches")
+        return results
+
+    def _serialize(self, batch: Dict[str, Any], kpis: Dict[str, np.ndarray]) -> Dict[str, Any]:
+        """JSON-friendly KPIs of one batch"""
+        metrics = {}
+        for index, metric in enumerate(METRICS):
+            metrics[metric] = {
+                'yoy': _series(kpis['yoy'][index]),
+                'attainment': _series(kpis['attainment'][index]),
+                'ytd': {category: _series(kpis['ytd'][index, :, position])
+                        for position, category in enumerate(CATEGORIES)},
+                'ytdAttainment': _series(kpis['ytdAttainment'][index]),
+            }
+
+        return {
+            'batchId': batch['batchId'],
+            'market': batch['market'],
+            'dataMonth': batch['dataMonth'],
+            'months': MONTHS,
+            'metrics': metrics,
+            'funnel': {
+                'stepConversion': {step: _series(kpis['funnel'][position])
+                                   for position, step in enumerate(FUNNEL[1:])},
+                'overallConversion': _series(kpis['overallConversion']),
+                'valuePerMatureLead': {metric: _series(kpis['valuePerMatureLead'][position])
+                                       for position, metric in enumerate(VALUE_METRICS)},
+            },
+        }
+
+
+# Global instance
+analytics_service = AnalyticsService()
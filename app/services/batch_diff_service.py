@@ -0,0 +1,244 @@
+"""
+Batch Diff Service - what changed between two uploads
+
+Rows of the two batches are aligned on (unit, metric); a repeated
+(unit, metric) pair is matched by its position among the repeats. All 36
+month values (LYA, CYA, CYT x 12) of the aligned rows are compared at once
+as NumPy arrays: a cell has changed when its text differs, and its delta is
+new - old when both values are numeric. Per-metric deltas compare the
+batch totals of each metric, including added and removed rows.
+
+The result is streamed as JSON or CSV, so large diffs are never built as
+one document in memory.
+"""
+
+import csv
+import io
+import logging
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from flask import current_app
+from sqlalchemy import select
+from app.models import db, ExcelData
+from app.services.rollup_service import to_number
+from app.sharding import using_batch_shard
+
+logger = logging.getLogger(__name__)
+
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
+          "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+CATEGORIES = ('LYA', 'CYA', 'CYT')
+
+# Value columns in array order, with the names used in the uploaded workbooks (e.g. Jan_LYA)
+COLUMN_NAMES = [f"{month}_{category}" for category in CATEGORIES for month in MONTHS]
+VALUE_COLUMNS = [getattr(ExcelData, name.lower()) for name in COLUMN_NAMES]
+
+CSV_HEADERS = ['change', 'unit', 'metric', 'column', 'old_value', 'new_value', 'delta']
+
+def _numbers(text: np.ndarray) -> np.ndarray:
+    """Numeric values of an array of cell strings, NaN where blank or not a number"""
+    try:
+        # Stored cells are plain numbers almost always; convert them in one step
+        return np.where(text == '', 'nan', text).astype(float)
+    except ValueError:
+        pass
+
+    # Thousands separators, N/A, ...: vectorized string cleanup, then per-cell parsing of the leftovers
+    # np.char rather than np.strings (NumPy 2 only): pandas 2.1 pins NumPy below 2
+    cleaned = np.char.strip(np.char.replace(text.astype(str), ',', ''))
+    digits = np.char.replace(np.char.lstrip(cleaned, '+-'), '.', '', 1)
+    plain = np.char.isdecimal(digits)
+    numbers = np.full(text.shape, np.nan)
+    numbers[plain] = cleaned[plain].astype(object).astype(float)
+
+    other = (cleaned != '') & ~plain
+    if other.any():
+        numbers[other] = [np.nan if number is None else number
+                          for number in map(to_number, cleaned[other].tolist())]
+    return numbers
+
+class BatchSlice:
+    """Rows of one batch as aligned key list, cell string array and numeric array"""
+
+    def __init__(self, batch_id: str, market_name: Optional[str], data_month: Optional[str],
+                 keys: List[Tuple[str, str, int]], text: np.ndarray):
+        self.batch_id = batch_id
+        self.market_name = market_name
+        self.data_month = data_month
+        self.keys = keys
+        self.text = text
+        self.numbers = _numbers(text)
+
+class BatchDiff:
+    """Comparison of batch A (old) with batch B (new)"""
+
+    def __init__(self, old: BatchSlice, new: BatchSlice):
+        self.old = old
+        self.new = new
+
+        new_index = {key: position for position, key in enumerate(new.keys)}
+        old_positions, new_positions, removed = [], [], []
+        for position, key in enumerate(old.keys):
+            match = new_index.pop(key, None)
+            if match is None:
+                removed.append(position)
+            else:
+                old_positions.append(position)
+                new_positions.append(match)
+        self.removed = removed
+        self.added = sorted(new_index.values())
+        self.old_positions = np.array(old_positions, dtype=np.intp)
+        self.new_positions = np.array(new_positions, dtype=np.intp)
+
+        # Vectorized cell comparison over all aligned rows and 36 value columns
+        self.changed = old.text[self.old_positions] != new.text[self.new_positions]
+        self.deltas = new.numbers[self.new_positions] - old.numbers[self.old_positions]
+
+    def summary(self) -> Dict[str, Any]:
+        changed_rows = int(self.changed.any(axis=1).sum()) if self.changed.size else 0
+        return {
+            'batchA': self.old.batch_id,
+            'batchB': self.new.batch_id,
+            'market': self.new.market_name or self.old.market_name,
+            'dataMonthA': self.old.data_month,
+            'dataMonthB': self.new.data_month,
+            'rowsA': len(self.old.keys),
+            'rowsB': len(self.new.keys),
+            'matchedRows': len(self.old_positions),
+            'changedRows': changed_rows,
+            'changedCells': int(self.changed.sum()),
+            'addedRows': len(self.added),
+            'removedRows': len(self.removed),
+        }
+
+    def metric_deltas(self) -> List[Dict[str, Any]]:
+        """Per metric and value column: batch A total, batch B total and their difference"""
+        metrics = sorted({key[1] for key in self.old.keys} | {key[1] for key in self.new.keys})
+        index = {metric: position for position, metric in enumerate(metrics)}
+        totals_old = self._metric_totals(self.old, index)
+        totals_new = self._metric_totals(self.new, index)
+        deltas = totals_new - totals_old
+
+        return [{
+            'metric': metric,
+            'columns': {name: {'old': float(totals_old[position, column]),
+                               'new': float(totals_new[position, column]),
+                               'delta': float(deltas[position, column])}
+                        for column, name in enumerate(COLUMN_NAMES)
+                        if deltas[position, column] != 0}
+        } for metric, position in index.items()]
+
+    def _metric_totals(self, batch: BatchSlice, index: Dict[str, int]) -> np.ndarray:
+        totals = np.zeros((len(index), len(COLUMN_NAMES)))
+        if batch.keys:
+            rows = np.array([index[key[1]] for key in batch.keys], dtype=np.intp)
+            np.add.at(totals, rows, np.nan_to_num(batch.numbers))
+        return totals
+
+    def iter_changes(self) -> Iterator[Dict[str, Any]]:
+        """Changed cells of matched rows, row by row"""
+        for chunk in self.iter_change_chunks():
+            yield from chunk
+
+    def iter_change_chunks(self, chunk_size: int = 1000) -> Iterator[List[Dict[str, Any]]]:
+        """Changed cells of matched rows in lists of up to chunk_size, gathered with array indexing"""
+        rows, columns = np.nonzero(self.changed)
+        for start in range(0, len(rows), chunk_size):
+            row, column = rows[start:start + chunk_size], columns[start:start + chunk_size]
+            old_rows, new_rows = self.old_positions[row], self.new_positions[row]
+            deltas = self.deltas[row, column]
+            keys = [self.old.keys[position] for position in old_rows.tolist()]
+            yield [{
+                'unit': key[0],
+                'metric': key[1],
+                'column': COLUMN_NAMES[index],
+                'old': str(old),
+                'new': str(new),
+                'delta': None if delta != delta else delta,  # NaN: not both numeric
+            } for key, index, old, new, delta in zip(
+                keys, column.tolist(), self.old.text[old_rows, column].tolist(),
+                self.new.text[new_rows, column].tolist(), deltas.tolist())]
+
+    def added_rows(self) -> List[Dict[str, str]]:
+        return [{'unit': self.new.keys[position][0], 'metric': self.new.keys[position][1]}
+                for position in self.added]
+
+    def removed_rows(self) -> List[Dict[str, str]]:
+        return [{'unit': self.old.keys[position][0], 'metric': self.old.keys[position][1]}
+                for position in self.removed]
+
+class BatchDiffService:
+    """Load two batches and stream their differences"""
+
+    def load_batch(self, batch_id: str) -> Optional[BatchSlice]:
+        """Rows of a batch, or None if it has no rows"""
+        # Core execution: plain tuples, without ORM row processing
+        with using_batch_shard(batch_id):
+            statement = (select(ExcelData.market_name, ExcelData.data_month, ExcelData.unit_name,
+                                ExcelData.metric_name, *VALUE_COLUMNS)
+                         .where(ExcelData.batch_id == batch_id)
+                         .order_by(ExcelData.id))
+            rows = db.session.connection(bind_arguments={'clause': statement}).execute(statement).all()
+        if not rows:
+            return None
+
+        keys = []
+        occurrences: Dict[Tuple[str, str], int] = {}
+        for row in rows:
+            pair = (row[2], row[3])
+            occurrences[pair] = occurrences.get(pair, -1) + 1
+            keys.append((row[2], row[3], occurrences[pair]))
+
+        # Building from tuples is several times faster than from Row objects
+        text = np.array([row[4:] for row in rows], dtype=object)
+        text[text == None] = ''  # noqa: E711 - elementwise comparison
+        return BatchSlice(batch_id, rows[0][0], rows[0][1], keys, text)
+
+    def compare(self, batch_a: str, batch_b: str) -> Optional[BatchDiff]:
+        """Diff of batch_a (old) against batch_b (new), or None if either batch does not exist"""
+        old = self.load_batch(batch_a)
+        new = self.load_batch(batch_b)
+        if old is None or new is None:
+            return None
+        if (old.market_name, old.data_month) != (new.market_name, new.data_month):
+            logger.warning(f"Comparing batches of different market/month: {batch_a} vs {batch_b}")
+        return BatchDiff(old, new)
+
+    def stream_json(self, diff: BatchDiff, chunk_size: int = 1000) -> Iterator[bytes]:
+        """The diff as one JSON document, generated in chunks"""
+        dumps = current_app.json.dumps
+        yield (f'{{"summary":{dumps(diff.summary())},'
+               f'"metricDeltas":{dumps(diff.metric_deltas())},'
+               f'"added":{dumps(diff.added_rows())},'
+               f'"removed":{dumps(diff.removed_rows())},'
+               f'"changes":[').encode('utf-8')
+
+        first = True
+        for chunk in diff.iter_change_chunks(chunk_size):
+            # One dumps() per chunk: the list's brackets are dropped to splice it into "changes"
+            yield (('' if first else ',') + dumps(chunk)[1:-1]).encode('utf-8')
+            first = False
+        yield b']}'
+
+    def stream_csv(self, diff: BatchDiff, chunk_size: int = 1000) -> Iterator[bytes]:
+        """Added and removed rows, then changed cells, as CSV"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(CSV_HEADERS)
+        for row in diff.added_rows():
+            writer.writerow(['added', row['unit'], row['metric'], '', '', '', ''])
+        for row in diff.removed_rows():
+            writer.writerow(['removed', row['unit'], row['metric'], '', '', '', ''])
+
+        for chunk in diff.iter_change_chunks(chunk_size):
+            writer.writerows(['changed', change['unit'], change['metric'], change['column'], change['old'],
+                              change['new'], '' if change['delta'] is None else change['delta']]
+                             for change in chunk)
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue().encode('utf-8')
+
+
+# Global instance
+batch_diff_service = BatchDiffService()
@@ -0,0 +1,102 @@
+"""
+Batch Service - batch manifest lookups and backfill
+
+Every upload writes one `batch` row (market, month, user, worksheet, row
+count, file hash, parse/insert timings, status) in the same transaction as
+its excel_data rows, which reference it through batch_ref. Batch listings
+and filter dropdowns read this small table instead of DISTINCT scans over
+the fact rows.
+"""
+
+import logging
+from typing import List, Optional
+from sqlalchemy import func, select, update
+from app.models import db, Batch, ExcelData, UploadedFile
+from app.sharding import each_shard, read_shards, shard_keys, using_batch_shard, using_shard
+
+logger = logging.getLogger(__name__)
+
+class BatchService:
+    """Batch manifest service"""
+
+    def get_batch(self, batch_id: str) -> Optional[Batch]:
+        """Manifest of a batch"""
+        try:
+            with using_batch_shard(batch_id):
+                return Batch.query.filter(Batch.batch_id == batch_id).first()
+        except Exception as e:
+            logger.warning(f"Failed to get batch {batch_id}: {e}")
+            return None
+
+    def get_batches(self, market_name: Optional[str] = None, data_month: Optional[str] = None) -> List[Batch]:
+        """Manifests, newest first"""
+        try:
+            statement = select(Batch)
+            if market_name:
+                statement = statement.where(Batch.market_name == market_name)
+            if data_month:
+                statement = statement.where(Batch.data_month == data_month)
+            statement = statement.order_by(Batch.upload_time.desc())
+            parts = read_shards(market_name, lambda: db.session.execute(statement).scalars().all())
+            return sorted((batch for part in parts for batch in part),
+                          key=lambda batch: batch.upload_time, reverse=True)
+        except Exception as e:
+            logger.warning(f"Failed to list batches, returning empty list: {e}")
+            return []
+
+    def needs_backfill(self) -> bool:
+        """Check whether rows stored before the manifest existed are waiting for one"""
+        for shard in shard_keys():
+            with using_shard(shard):
+                if db.session.query(ExcelData.id).filter(ExcelData.batch_ref.is_(None)).first() is not None:
+                    return True
+        return False
+
+    def backfill(self) -> int:
+        """Create manifests for rows without one and link the rows, shard by shard; returns the number created"""
+        created = sum(each_shard(self._backfill))
+        if created:
+            logger.info(f"Backfilled {created} batch manifests")
+        return created
+
+    def _backfill(self) -> int:
+        try:
+            batches = db.session.execute(
+                select(ExcelData.batch_id, ExcelData.market_name, ExcelData.data_month,
+                       func.min(ExcelData.user_id), func.min(ExcelData.worksheet_name),
+                       func.min(ExcelData.upload_timestamp), func.count(ExcelData.id))
+                .where(ExcelData.batch_ref.is_(None))
+                .group_by(ExcelData.batch_id, ExcelData.market_name, ExcelData.data_month)
+            ).all()
+
+            created = 0
+            for batch_id, market_name, data_month, user_id, worksheet_name, upload_time, row_count in batches:
+                manifest = Batch.query.filter(Batch.batch_id == batch_id).first()
+                if manifest is None:
+                    uploaded_file = UploadedFile.query.filter(UploadedFile.batch_id == batch_id).first()
+                    manifest = Batch(batch_id, market_name, data_month, user_id,
+                                     worksheet_name=worksheet_name, upload_time=upload_time,
+                                     content_hash=uploaded_file.content_hash if uploaded_file else None,
+                                     status=Batch.STATUS_BACKFILLED)
+                    db.session.add(manifest)
+                    db.session.flush()
+                    created += 1
+                manifest.row_count += row_count
+                db.session.execute(
+                    update(ExcelData)
+                    .where(ExcelData.batch_id == batch_id, ExcelData.batch_ref.is_(None))
+                    .values(batch_ref=manifest.id)
+                    .execution_options(synchronize_session=False)
+                )
+
+            db.session.commit()
+            return created
+
+        except Exception as e:
+            logger.error(f"Failed to backfill batch manifests: {e}", exc_info=True)
+            db.session.rollback()
+            raise
+
+
+# Global instance
+batch_service = BatchService()
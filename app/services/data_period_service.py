@@ -1,23 +1,93 @@
 """
 Data Period Service - Python equivalent of Java DataPeriodService
+
+The active periods shown on the upload and download pages are served from
+an in-memory snapshot: grouped by market, with the list pre-serialized to
+JSON for templates. Every write bumps the 'data_period' DataVersion stamp
+in the same transaction; each process compares the stamp (one primary key
+lookup) before using its snapshot and rebuilds it when another worker has
+changed the periods.
 """
 
 import logging
-from typing import List, Optional
-from app.models import db, DataPeriod
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from flask import current_app
+from jinja2.utils import htmlsafe_json_dumps
+from markupsafe import Markup
+from app.models import db, DataPeriod, DataVersion
 
 logger = logging.getLogger(__name__)
 
+class ActivePeriods(NamedTuple):
+    """Immutable snapshot of the active data periods at one version stamp"""
+    version: int
+    periods: Tuple[Dict[str, str], ...]
+    by_market: Dict[str, Tuple[Dict[str, str], ...]]
+    json: Markup
+
 class DataPeriodService:
     """Data period management service"""
+
+    _snapshot_lock = threading.Lock()
+
+    def get_active_periods(self) -> ActivePeriods:
+        """Cached snapshot of the active data periods, rebuilt when the version stamp moves"""
+        try:
+            version = DataVersion.current(DataVersion.DATA_PERIOD)
+        except Exception as e:
+            logger.warning(f"Failed to read data period version: {e}")
+            version = None
+
+        snapshot = current_app.extensions.get('active_periods')
+        if snapshot is not None and version is not None and snapshot.version == version:
+            return snapshot
+        return self._rebuild_active_periods(version)
+
+    def _rebuild_active_periods(self, version: Optional[int]) -> ActivePeriods:
+        """Load the active periods and swap in a new snapshot"""
+        periods = tuple({
+            'market_name': period.market_name,
+            'data_month': period.data_month,
+            'active_idc': period.active_idc
+        } for period in self.get_all_active_data_periods())
+
+        grouped: Dict[str, List[Dict[str, str]]] = {}
+        for period in periods:
+            grouped.setdefault(period['market_name'], []).append(period)
+
+        snapshot = ActivePeriods(
+            version=-1 if version is None else version,
+            periods=periods,
+            by_market={market: tuple(items) for market, items in grouped.items()},
+            json=htmlsafe_json_dumps(list(periods), dumps=current_app.json.dumps)
+        )
+        # Readers hold a reference to a whole snapshot, so replacing it is atomic for them
+        with self._snapshot_lock:
+            current_app.extensions['active_periods'] = snapshot
+        return snapshot
+
+    def _refresh_active_periods(self) -> None:
+        """Rebuild this process's snapshot right after a committed write"""
+        try:
+            self._rebuild_active_periods(DataVersion.current(DataVersion.DATA_PERIOD))
+        except Exception as e:
+            logger.warning(f"Failed to refresh active data periods: {e}")
+            current_app.extensions.pop('active_periods', None)
     
-    def get_active_data_periods_by_market(self, market_name: str) -> List[DataPeriod]:
-        """Get active data periods for a specific market"""
+    def get_active_data_periods_by_market(self, market_name: str, period_from: Optional[int] = None,
+                                          period_to: Optional[int] = None) -> List[DataPeriod]:
+        """Get active data periods for a specific market, optionally within a yyyymm period range"""
         try:
-            return DataPeriod.query.filter(
+            query = DataPeriod.query.filter(
                 DataPeriod.market_name == market_name,
                 DataPeriod.active_idc == 'Y'
-            ).order_by(DataPeriod.data_month.desc()).all()
+            )
+            if period_from is not None:
+                query = query.filter(DataPeriod.period_key >= period_from)
+            if period_to is not None:
+                query = query.filter(DataPeriod.period_key <= period_to)
+            return query.order_by(DataPeriod.period_key.desc(), DataPeriod.data_month.desc()).all()
         except Exception as e:
             logger.warning(f"Failed to get active data periods for market {market_name}, "
                           f"returning empty list: {e}")
@@ -28,7 +98,8 @@ class DataPeriodService:
         try:
             return DataPeriod.query.filter(
                 DataPeriod.active_idc == 'Y'
-            ).order_by(DataPeriod.market_name, DataPeriod.data_month.desc()).all()
+            ).order_by(DataPeriod.market_name, DataPeriod.period_key.desc(),
+                       DataPeriod.data_month.desc()).all()
         except Exception as e:
             logger.warning(f"Failed to get all active data periods, returning empty list: {e}")
             return []
@@ -38,6 +109,7 @@ class DataPeriodService:
         try:
             return DataPeriod.query.order_by(
                 DataPeriod.market_name, 
+                DataPeriod.period_key.desc(),
                 DataPeriod.data_month.desc()
             ).all()
         except Exception as e:
@@ -73,7 +145,9 @@ class DataPeriodService:
             )
             
             db.session.add(data_period)
+            DataVersion.bump(DataVersion.DATA_PERIOD)
             db.session.commit()
+            self._refresh_active_periods()
             
             logger.info(f"Created data period: {market_name} - {data_month}")
             return data_period
@@ -94,8 +168,10 @@ class DataPeriodService:
             data_period.active_idc = active_idc
             data_period.update_by = update_by
             data_period.update_time = db.func.now()
+            DataVersion.bump(DataVersion.DATA_PERIOD)
             
             db.session.commit()
+            self._refresh_active_periods()
             
             logger.info(f"Updated data period {period_id}: {active_idc}")
             return data_period
@@ -113,7 +189,9 @@ class DataPeriodService:
                 return False
             
             db.session.delete(data_period)
+            DataVersion.bump(DataVersion.DATA_PERIOD)
             db.session.commit()
+            self._refresh_active_periods()
             
             logger.info(f"Deleted data period {period_id}")
             return True
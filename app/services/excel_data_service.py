@@ -3,13 +3,152 @@ Excel Data Service - Python equivalent of Java ExcelDataService
 """
 
 import logging
+import time
+from collections.abc import Mapping
+from operator import attrgetter, itemgetter
 import uuid
 from datetime import datetime
-from typing import List, Dict, Any, Optional
-from app.models import db, ExcelData
+from typing import List, Dict, Any, Callable, Iterator, Optional, Sequence, Tuple, Type, Union
+from sqlalchemy import select
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Query
+from app.models import db, Batch, ExcelData, DataVersion, is_period_key
+from app.services.rollup_service import rollup_service
+from app.sharding import fan_out, in_market_shard, read_shards, shard_keys, using_shard
 
 logger = logging.getLogger(__name__)
 
+class ProjectionRecord:
+    """Lightweight read-only row of a projection; subclasses set __slots__ to the column names"""
+    __slots__ = ()
+
+    def __init__(self, *values: Any):
+        for name, value in zip(self.__slots__, values):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __eq__(self, other: Any) -> bool:
+        return type(self) is type(other) and self.astuple() == other.astuple()
+
+    def __hash__(self) -> int:
+        return hash(self.astuple())
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)})"
+
+    def astuple(self) -> Tuple[Any, ...]:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def asdict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+class Projection:
+    """Named set of ExcelData columns and the record class its rows are returned as"""
+
+    def __init__(self, name: str, fields: Sequence[str]):
+        self.name = name
+        self.fields = tuple(fields)
+        self.columns = [getattr(ExcelData, field) for field in self.fields]
+        class_name = ''.join(part.title() for part in name.split('_')) + 'Record'
+        self.record: Type[ProjectionRecord] = type(class_name, (ProjectionRecord,), {'__slots__': self.fields})
+
+# Named shapes: 'listing' is what the result and view pages show of each row
+PROJECTIONS = {
+    projection.name: projection for projection in (
+        Projection('listing', ('batch_id', 'worksheet_name', 'unit_name', 'metric_name')),
+    )
+}
+
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
+          "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+MONTH_INDEX = {month: index for index, month in enumerate(MONTHS)}
+
+# Display category -> offset of its 12 months in AggregatedRecord.values
+CATEGORY_OFFSETS = {'lastYearActual': 0, 'currentYearActual': 12, 'currentYearTarget': 24}
+AGGREGATED_VALUE_COLUMNS = [getattr(ExcelData, f"{month.lower()}_{suffix}")
+                            for suffix in ('lya', 'cya', 'cyt') for month in MONTHS]
+
+class MonthValues(Mapping):
+    """Read-only month -> value view over 12 slots of a record's values; blank months are absent"""
+    __slots__ = ('_values', '_offset')
+
+    def __init__(self, values: Tuple[Optional[str], ...], offset: int):
+        self._values = values
+        self._offset = offset
+
+    def __getitem__(self, month: str) -> str:
+        index = MONTH_INDEX.get(month)
+        value = None if index is None else self._values[self._offset + index]
+        if not value or not value.strip():
+            raise KeyError(month)
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        return (month for month, value in zip(MONTHS, self._values[self._offset:self._offset + 12])
+                if value and value.strip())
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+    def __json__(self) -> Dict[str, str]:
+        return dict(self)
+
+class AggregatedRecord:
+    """
+    Row of View All Market Results and /api/data: identity fields plus a 36-slot values tuple
+    (LYA, CYA, CYT x 12 months). Reads like the display dict it replaces (item.batchId,
+    item['batchId'], item.lastYearActual['Jan']); month views are built only when accessed.
+    """
+    __slots__ = ('batchId', 'userId', 'uploadTime', 'market', 'dataMonth', 'unitName', 'metricName', 'values')
+    FIELDS = __slots__[:-1]
+
+    def __init__(self, batch_id, user_id, upload_time, market, data_month, unit_name, metric_name,
+                 values: Tuple[Optional[str], ...]):
+        self.batchId = batch_id
+        self.userId = user_id
+        self.uploadTime = upload_time
+        self.market = market
+        self.dataMonth = data_month
+        self.unitName = unit_name
+        self.metricName = metric_name
+        self.values = values
+
+    @property
+    def lastYearActual(self) -> MonthValues:
+        return MonthValues(self.values, 0)
+
+    @property
+    def currentYearActual(self) -> MonthValues:
+        return MonthValues(self.values, 12)
+
+    @property
+    def currentYearTarget(self) -> MonthValues:
+        return MonthValues(self.values, 24)
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self.FIELDS or key in CATEGORY_OFFSETS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.FIELDS or key in CATEGORY_OFFSETS
+
+    def __repr__(self) -> str:
+        return f"AggregatedRecord({self.batchId!r}, {self.unitName!r}, {self.metricName!r})"
+
+    def __json__(self) -> Dict[str, Any]:
+        values = self.values
+        record = {name: getattr(self, name) for name in self.FIELDS}
+        for category, offset in CATEGORY_OFFSETS.items():
+            record[category] = {month: value for month, value in zip(MONTHS, values[offset:offset + 12])
+                                if value and value.strip()}
+        return record
+
 class ExcelDataService:
     """Excel data management service"""
     
@@ -18,108 +157,272 @@ class ExcelDataService:
                        current_year_actual: Dict[str, List[str]], 
                        current_year_target: Dict[str, List[str]], 
                        data_period: str, batch_id: str, user_id: str, 
-                       worksheet_name: str, upload_timestamp: datetime) -> None:
-        """Save Excel data to database"""
-        try:
-            logger.info(f"Saving Excel data for market: {market} with batch: {batch_id}")
-            
-            months = ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
-                     "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
-            
-            # Save new data - one record per unit/metric combination
-            for i, unit in enumerate(units):
-                metric = metrics[i] if i < len(metrics) else ""
-                
-                # Create a single ExcelData record for this unit/metric
-                excel_data = ExcelData(
-                    market_name=market,
-                    unit_name=unit,
-                    metric_name=metric,
-                    data_month=data_period,
-                    batch_id=batch_id,
-                    user_id=user_id,
-                    worksheet_name=worksheet_name,
-                    upload_timestamp=upload_timestamp
-                )
-                
-                # Set monthly data for each type
-                for month in months:
-                    # Last Year Actual
-                    lya_key = f"{month}_LYA"
-                    if lya_key in last_year_actual and i < len(last_year_actual[lya_key]):
-                        excel_data.set_monthly_lya(month, last_year_actual[lya_key][i])
-                    
-                    # Current Year Actual
-                    cya_key = f"{month}_CYA"
-                    if cya_key in current_year_actual and i < len(current_year_actual[cya_key]):
-                        excel_data.set_monthly_cya(month, current_year_actual[cya_key][i])
-                    
-                    # Current Year Target
-                    cyt_key = f"{month}_CYT"
-                    if cyt_key in current_year_target and i < len(current_year_target[cyt_key]):
-                        excel_data.set_monthly_cyt(month, current_year_target[cyt_key][i])
-                
-                db.session.add(excel_data)
+                       worksheet_name: str, upload_timestamp: datetime,
+                       content_hash: Optional[str] = None, parse_seconds: Optional[float] = None) -> None:
+        """Save Excel data to database, with its batch manifest"""
+        # Rows, manifest and rollups go to the market's shard when sharding is on
+        with using_shard(market):
+            sharded = in_market_shard()
+            try:
+                self.stage_excel_data(market, units, metrics, last_year_actual, current_year_actual,
+                                      current_year_target, data_period, batch_id, user_id,
+                                      worksheet_name, upload_timestamp, content_hash, parse_seconds)
+                if not sharded:
+                    DataVersion.bump(DataVersion.EXCEL_DATA)
+                db.session.commit()
+                logger.info(f"Successfully saved {len(units)} records for market: {market}")
             
+            except Exception as e:
+                logger.error(f"Error saving Excel data for market: {market} with batch: {batch_id}", exc_info=True)
+                db.session.rollback()
+                raise RuntimeError(f"Failed to save Excel data: {str(e)}")
+
+        if sharded:
+            self.bump_version()
+
+    def bump_version(self) -> None:
+        """Bump the Excel data version in a main database transaction of its own, after a shard commit"""
+        try:
+            DataVersion.bump(DataVersion.EXCEL_DATA)
             db.session.commit()
-            logger.info(f"Successfully saved {len(units)} records for market: {market}")
-            
         except Exception as e:
-            logger.error(f"Error saving Excel data for market: {market} with batch: {batch_id}", exc_info=True)
+            logger.error(f"Failed to bump the Excel data version: {e}", exc_info=True)
             db.session.rollback()
-            raise RuntimeError(f"Failed to save Excel data: {str(e)}")
+
+    def stage_excel_data(self, market: str, units: List[str], metrics: List[str],
+                         last_year_actual: Dict[str, List[str]],
+                         current_year_actual: Dict[str, List[str]],
+                         current_year_target: Dict[str, List[str]],
+                         data_period: str, batch_id: str, user_id: str,
+                         worksheet_name: str, upload_timestamp: datetime,
+                         content_hash: Optional[str] = None, parse_seconds: Optional[float] = None) -> Batch:
+        """Add a batch's manifest, rows and rollups to the current transaction and flush; does not commit"""
+        logger.info(f"Saving Excel data for market: {market} with batch: {batch_id}")
+        started = time.perf_counter()
+
+        # Manifest first: the rows reference it by its integer key
+        manifest = Batch(batch_id, market, data_period, user_id,
+                         worksheet_name=worksheet_name, upload_time=upload_timestamp,
+                         row_count=len(units), content_hash=content_hash,
+                         parse_seconds=parse_seconds)
+        db.session.add(manifest)
+        db.session.flush()
+
+        months = ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
+                 "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+        # Save new data - one record per unit/metric combination
+        records = []
+        for i, unit in enumerate(units):
+            metric = metrics[i] if i < len(metrics) else ""
+
+            # Create a single ExcelData record for this unit/metric
+            excel_data = ExcelData(
+                market_name=market,
+                unit_name=unit,
+                metric_name=metric,
+                data_month=data_period,
+                batch_id=batch_id,
+                user_id=user_id,
+                worksheet_name=worksheet_name,
+                upload_timestamp=upload_timestamp,
+                batch_ref=manifest.id
+            )
+
+            # Set monthly data for each type
+            for month in months:
+                # Last Year Actual
+                lya_key = f"{month}_LYA"
+                if lya_key in last_year_actual and i < len(last_year_actual[lya_key]):
+                    excel_data.set_monthly_lya(month, last_year_actual[lya_key][i])
+
+                # Current Year Actual
+                cya_key = f"{month}_CYA"
+                if cya_key in current_year_actual and i < len(current_year_actual[cya_key]):
+                    excel_data.set_monthly_cya(month, current_year_actual[cya_key][i])
+
+                # Current Year Target
+                cyt_key = f"{month}_CYT"
+                if cyt_key in current_year_target and i < len(current_year_target[cyt_key]):
+                    excel_data.set_monthly_cyt(month, current_year_target[cyt_key][i])
+
+            db.session.add(excel_data)
+            records.append(excel_data)
+
+        # Rollups change in the same transaction, so they always match the committed rows
+        rollup_service.add_records(records)
+        db.session.flush()
+        manifest.insert_seconds = time.perf_counter() - started
+        return manifest
     
     def get_data_by_filters(self, market_name: Optional[str] = None,
                            data_month: Optional[str] = None,
                            batch_id: Optional[str] = None,
-                           user_id: Optional[str] = None) -> List[ExcelData]:
+                           user_id: Optional[str] = None,
+                           period_from: Optional[int] = None,
+                           period_to: Optional[int] = None) -> List[ExcelData]:
         """Get data by filters with SQL injection protection"""
         try:
-            # Validate and sanitize inputs
-            if market_name and (len(market_name) > 255 or not market_name.replace('-', '').replace('_', '').isalnum()):
-                logger.warning(f"Invalid market_name parameter: {market_name}")
+            query = self.filtered_query(market_name, data_month, batch_id, user_id, period_from, period_to)
+            if query is None:
                 return []
 
-            if data_month and (len(data_month) > 255 or not self._is_valid_data_month(data_month)):
-                logger.warning(f"Invalid data_month parameter: {data_month}")
-                return []
+            statement = query.statement
+            parts = read_shards(market_name, lambda: db.session.execute(statement).scalars().all())
+            result = self._merge_ordered(parts, attrgetter('batch_id'), attrgetter('unit_name', 'metric_name'))
 
-            if batch_id and len(batch_id) > 255:
-                logger.warning(f"Invalid batch_id parameter length: {len(batch_id)}")
-                return []
+            logger.info(f"Found {len(result)} records matching filters")
+            return result
+
+        except Exception as e:
+            logger.error(f"Failed to get data by filters: {e}", exc_info=True)
+            return []
 
-            if user_id and (len(user_id) > 255 or not user_id.replace('_', '').isalnum()):
-                logger.warning(f"Invalid user_id parameter: {user_id}")
+    def get_projection(self, projection: Union[str, Projection, Sequence[str]]) -> Projection:
+        """Projection by name, or an ad-hoc one over the given ExcelData column names"""
+        if isinstance(projection, Projection):
+            return projection
+        if isinstance(projection, str):
+            if projection not in PROJECTIONS:
+                raise ValueError(f"Unknown projection: {projection}")
+            return PROJECTIONS[projection]
+        for field in projection:
+            if field not in ExcelData.__table__.columns:
+                raise ValueError(f"Unknown ExcelData column: {field}")
+        return Projection('_'.join(['custom'] + list(projection)), projection)
+
+    def get_projected_data_by_filters(self, projection: Union[str, Projection, Sequence[str]],
+                                      market_name: Optional[str] = None,
+                                      data_month: Optional[str] = None,
+                                      batch_id: Optional[str] = None,
+                                      user_id: Optional[str] = None,
+                                      period_from: Optional[int] = None,
+                                      period_to: Optional[int] = None,
+                                      as_tuples: bool = False) -> List[Any]:
+        """
+        Only the projected columns of the rows matching the filters, as __slots__ records
+        (or plain tuples with as_tuples). Runs as a Core statement: no ORM objects, no identity map.
+        """
+        projection = self.get_projection(projection)
+        try:
+            query = self.filtered_query(market_name, data_month, batch_id, user_id, period_from, period_to)
+            if query is None:
                 return []
 
-            logger.info(f"Querying data with filters - MarketName: {market_name}, "
-                       f"DataMonth: {data_month}, BatchId: {batch_id}, UserId: {user_id}")
+            statement = query.with_entities(*projection.columns).statement
+            record = projection.record
 
-            query = ExcelData.query
+            def read():
+                rows = self._execute_core(statement)
+                return [tuple(row) for row in rows] if as_tuples else [record(*row) for row in rows]
 
-            # Use parameterized queries (SQLAlchemy ORM automatically handles this)
-            if market_name:
-                query = query.filter(ExcelData.market_name == market_name)
-            if data_month:
-                query = query.filter(ExcelData.data_month == data_month)
-            if batch_id:
-                # Use exact match instead of LIKE for better security
-                query = query.filter(ExcelData.batch_id.contains(batch_id))
-            if user_id:
-                # Use exact match instead of LIKE for better security
-                query = query.filter(ExcelData.user_id.contains(user_id))
-
-            result = query.order_by(ExcelData.batch_id.desc(),
-                                   ExcelData.unit_name,
-                                   ExcelData.metric_name).all()
+            parts = read_shards(market_name, read)
+            if {'batch_id', 'unit_name', 'metric_name'} <= set(projection.fields):
+                getter = ((lambda *names: itemgetter(*[projection.fields.index(name) for name in names]))
+                          if as_tuples else attrgetter)
+                result = self._merge_ordered(parts, getter('batch_id'), getter('unit_name', 'metric_name'))
+            else:
+                result = [row for part in parts for row in part]
 
-            logger.info(f"Found {len(result)} records matching filters")
+            logger.info(f"Found {len(result)} {projection.name} records matching filters")
             return result
 
         except Exception as e:
-            logger.error(f"Failed to get data by filters: {e}", exc_info=True)
+            logger.error(f"Failed to get {projection.name} data by filters: {e}", exc_info=True)
             return []
 
+    def iter_data_by_filters(self, columns: Sequence[Any], market_name: Optional[str] = None,
+                             data_month: Optional[str] = None, batch_id: Optional[str] = None,
+                             user_id: Optional[str] = None, period_from: Optional[int] = None,
+                             period_to: Optional[int] = None, batch_size: int = 1000) -> Iterator[List[Row]]:
+        """
+        Stream the selected columns of the rows matching the filters, batch_size rows at a time.
+        Rows are fetched with yield_per, so memory use does not grow with the result size.
+        Without a market filter, shards are streamed one after another.
+        """
+        query = self.filtered_query(market_name, data_month, batch_id, user_id, period_from, period_to)
+        if query is None:
+            return
+
+        statement = query.with_entities(*columns).statement.execution_options(yield_per=batch_size)
+        for shard in ([market_name] if market_name else shard_keys()):
+            with using_shard(shard):
+                result = db.session.execute(statement)
+            yield from result.partitions()
+
+    def _execute_core(self, statement):
+        """Execute on the connection of the statement's database: plain rows, no ORM processing"""
+        return db.session.connection(bind_arguments={'clause': statement}).execute(statement)
+
+    def _merge_ordered(self, parts: List[List[Any]], batch_key: Callable[[Any], Any],
+                       name_key: Callable[[Any], Any]) -> List[Any]:
+        """Per-shard results in the filtered_query order: batch ID descending, then unit and metric"""
+        if len(parts) == 1:
+            return parts[0]
+        rows = [row for part in parts for row in part]
+        rows.sort(key=name_key)
+        rows.sort(key=batch_key, reverse=True)  # stable: keeps the unit/metric order within a batch
+        return rows
+
+    def filtered_query(self, market_name: Optional[str] = None,
+                       data_month: Optional[str] = None,
+                       batch_id: Optional[str] = None,
+                       user_id: Optional[str] = None,
+                       period_from: Optional[int] = None,
+                       period_to: Optional[int] = None) -> Optional[Query]:
+        """
+        Ordered ExcelData query for validated filters, or None if a filter is invalid.
+        period_from/period_to bound the yyyymm period key (inclusive), e.g. 202404..202503.
+        """
+        # Validate and sanitize inputs
+        if market_name and (len(market_name) > 255 or not market_name.replace('-', '').replace('_', '').isalnum()):
+            logger.warning(f"Invalid market_name parameter: {market_name}")
+            return None
+
+        if data_month and (len(data_month) > 255 or not self._is_valid_data_month(data_month)):
+            logger.warning(f"Invalid data_month parameter: {data_month}")
+            return None
+
+        if batch_id and len(batch_id) > 255:
+            logger.warning(f"Invalid batch_id parameter length: {len(batch_id)}")
+            return None
+
+        if user_id and (len(user_id) > 255 or not user_id.replace('_', '').isalnum()):
+            logger.warning(f"Invalid user_id parameter: {user_id}")
+            return None
+
+        for bound in (period_from, period_to):
+            if bound is not None and not is_period_key(bound):
+                logger.warning(f"Invalid period key parameter: {bound}")
+                return None
+
+        logger.info(f"Querying data with filters - MarketName: {market_name}, "
+                   f"DataMonth: {data_month}, BatchId: {batch_id}, UserId: {user_id}, "
+                   f"Periods: {period_from}-{period_to}")
+
+        query = ExcelData.query
+
+        # Use parameterized queries (SQLAlchemy ORM automatically handles this)
+        if market_name:
+            query = query.filter(ExcelData.market_name == market_name)
+        if data_month:
+            query = query.filter(ExcelData.data_month == data_month)
+        if period_from is not None:
+            query = query.filter(ExcelData.period_key >= period_from)
+        if period_to is not None:
+            query = query.filter(ExcelData.period_key <= period_to)
+        # Batch and user are matched on the manifest, then rows are found through its key
+        if batch_id:
+            query = query.filter(ExcelData.batch_ref.in_(
+                select(Batch.id).where(Batch.batch_id.contains(batch_id))))
+        if user_id:
+            query = query.filter(ExcelData.batch_ref.in_(
+                select(Batch.id).where(Batch.user_id.contains(user_id))))
+
+        return query.order_by(ExcelData.batch_id.desc(),
+                              ExcelData.unit_name,
+                              ExcelData.metric_name)
+
     def _is_valid_data_month(self, data_month: str) -> bool:
         """Validate data month format (e.g., 2025-Apr)"""
         import re
@@ -127,40 +430,43 @@ class ExcelDataService:
         return bool(re.match(pattern, data_month))
     
     def get_available_markets(self) -> List[str]:
-        """Get available markets from database"""
+        """Get markets with data, from the batch manifest"""
         try:
-            markets = db.session.query(ExcelData.market_name).distinct().order_by(ExcelData.market_name).all()
-            return [market[0] for market in markets]
+            parts = fan_out(lambda: db.session.execute(select(Batch.market_name).distinct()).scalars().all())
+            return sorted({market for part in parts for market in part})
         except Exception as e:
             logger.warning(f"Failed to get available markets, returning empty list: {e}")
             return []
     
     def get_available_data_months(self, market_name: Optional[str] = None) -> List[str]:
-        """Get available data months"""
+        """Get data months with data, newest first, from the batch manifest"""
         try:
-            query = db.session.query(ExcelData.data_month).distinct()
+            statement = select(Batch.data_month, Batch.period_key).distinct()
             if market_name:
-                query = query.filter(ExcelData.market_name == market_name)
-            months = query.order_by(ExcelData.data_month.desc()).all()
+                statement = statement.where(Batch.market_name == market_name)
+            parts = read_shards(market_name, lambda: [tuple(row) for row in db.session.execute(statement)])
+            # Chronological: the text form sorts Sep before Oct
+            months = sorted({month for part in parts for month in part},
+                            key=lambda month: (month[1] or 0, month[0]), reverse=True)
             return [month[0] for month in months]
         except Exception as e:
             logger.warning(f"Failed to get available data months, returning empty list: {e}")
             return []
     
     def get_available_batch_ids(self) -> List[str]:
-        """Get available batch IDs"""
+        """Get available batch IDs from the batch manifest"""
         try:
-            batch_ids = db.session.query(ExcelData.batch_id).distinct().order_by(ExcelData.batch_id.desc()).all()
-            return [batch_id[0] for batch_id in batch_ids]
+            parts = fan_out(lambda: db.session.execute(select(Batch.batch_id)).scalars().all())
+            return sorted((batch_id for part in parts for batch_id in part), reverse=True)
         except Exception as e:
             logger.warning(f"Failed to get available batch IDs, returning empty list: {e}")
             return []
     
     def get_available_user_ids(self) -> List[str]:
-        """Get available user IDs"""
+        """Get available user IDs from the batch manifest"""
         try:
-            user_ids = db.session.query(ExcelData.user_id).distinct().order_by(ExcelData.user_id).all()
-            return [user_id[0] for user_id in user_ids]
+            parts = fan_out(lambda: db.session.execute(select(Batch.user_id).distinct()).scalars().all())
+            return sorted({user_id for part in parts for user_id in part})
         except Exception as e:
             logger.warning(f"Failed to get available user IDs, returning empty list: {e}")
             return []
@@ -168,7 +474,7 @@ class ExcelDataService:
     def get_all_data(self) -> List[ExcelData]:
         """Get all data from database"""
         try:
-            all_data = ExcelData.query.all()
+            all_data = [row for part in fan_out(lambda: ExcelData.query.all()) for row in part]
             logger.info(f"Total records in database: {len(all_data)}")
             return all_data
         except Exception as e:
@@ -178,56 +484,67 @@ class ExcelDataService:
     def get_aggregated_data_by_filters(self, market_name: Optional[str] = None, 
                                      data_month: Optional[str] = None, 
                                      batch_id: Optional[str] = None, 
-                                     user_id: Optional[str] = None) -> List[Dict[str, Any]]:
-        """Get aggregated data by filters for display"""
+                                     user_id: Optional[str] = None,
+                                     period_from: Optional[int] = None,
+                                     period_to: Optional[int] = None) -> List[AggregatedRecord]:
+        """Get aggregated data by filters for display, as compact records read through Core"""
         try:
-            raw_data = self.get_data_by_filters(market_name, data_month, batch_id, user_id)
-            result_list = []
-            
-            # Convert each ExcelData record to display format
-            for data in raw_data:
-                record = {
-                    'batchId': data.batch_id,
-                    'userId': data.user_id,
-                    'uploadTime': data.upload_timestamp,
-                    'market': data.market_name,
-                    'dataMonth': data.data_month,
-                    'unitName': data.unit_name,
-                    'metricName': data.metric_name
-                }
-                
-                # Create monthly data mappings
-                lya = {}
-                cya = {}
-                cyt = {}
-                
-                months = ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
-                         "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
-                
-                for month_name in months:
-                    lya_value = data.get_monthly_lya(month_name)
-                    cya_value = data.get_monthly_cya(month_name)
-                    cyt_value = data.get_monthly_cyt(month_name)
-                    
-                    if lya_value and lya_value.strip():
-                        lya[month_name] = lya_value
-                    if cya_value and cya_value.strip():
-                        cya[month_name] = cya_value
-                    if cyt_value and cyt_value.strip():
-                        cyt[month_name] = cyt_value
-                
-                record['lastYearActual'] = lya
-                record['currentYearActual'] = cya
-                record['currentYearTarget'] = cyt
-                
-                result_list.append(record)
-            
+            query = self.filtered_query(market_name, data_month, batch_id, user_id, period_from, period_to)
+            if query is None:
+                return []
+
+            statement = query.with_entities(
+                ExcelData.batch_id, ExcelData.user_id, ExcelData.upload_timestamp, ExcelData.market_name,
+                ExcelData.data_month, ExcelData.unit_name, ExcelData.metric_name,
+                *AGGREGATED_VALUE_COLUMNS).statement
+
+            # One record and one values tuple per row; month dicts are never materialized here.
+            # Repeated cell strings (blanks, common counts) share one object through the pool.
+            shared = {}.setdefault
+
+            def read():
+                return [AggregatedRecord(*row[:7], tuple(map(shared, row[7:], row[7:])))
+                        for row in self._execute_core(statement)]
+
+            result_list = self._merge_ordered(read_shards(market_name, read), attrgetter('batchId'),
+                                              attrgetter('unitName', 'metricName'))
+            logger.info(f"Found {len(result_list)} records matching filters")
             return result_list
             
         except Exception as e:
             logger.error(f"Failed to get aggregated data by filters: {e}", exc_info=True)
             return []
 
+    def get_statistics(self, aggregated_data: List[AggregatedRecord]) -> Dict[str, Any]:
+        """Record counts and per-month filled-value counts of aggregated data"""
+        # Filled-value counts per values slot (LYA, CYA, CYT x 12 months), one column at a time:
+        # only the distinct values of a column are checked for blanks
+        counts = [0] * len(AGGREGATED_VALUE_COLUMNS)
+        for index, column in enumerate(zip(*(item.values for item in aggregated_data))):
+            blanks = sum(column.count(value) for value in set(column) if not (value and value.strip()))
+            counts[index] = len(column) - blanks
+
+        monthly_stats = {
+            category: {month: count for month, count in zip(MONTHS, counts[offset:offset + 12]) if count}
+            for category, offset in CATEGORY_OFFSETS.items()
+        }
+
+        return {
+            'totalRecords': len(aggregated_data),
+            'uniqueBatches': len(set(item.batchId for item in aggregated_data)),
+            'uniqueUsers': len(set(item.userId for item in aggregated_data)),
+            'uniqueMarkets': len(set(item.market for item in aggregated_data)),
+            'monthlyStats': monthly_stats
+        }
+
+    def get_data_version(self) -> int:
+        """Counter bumped by every commit of new Excel data"""
+        try:
+            return DataVersion.current(DataVersion.EXCEL_DATA)
+        except Exception as e:
+            logger.warning(f"Failed to read data version: {e}")
+            return 0
+
 
 # Global instance
 excel_data_service = ExcelDataService()
@@ -7,10 +7,13 @@ import tempfile
 import logging
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, TYPE_CHECKING
 from werkzeug.datastructures import FileStorage
 from .market_config_loader import MarketConfigLoader, MarketConfig
 
+if TYPE_CHECKING:
+    from .parse_cache import ParseResultCache
+
 logger = logging.getLogger(__name__)
 
 class ValidationResult:
@@ -43,41 +46,61 @@ class ExcelService:
             temp_file_path = temp_file.name
 
         try:
-            config = self.market_config_loader.get_config(market)
-            if not config:
-                raise ValueError(f"Configuration not found for market: {market}")
+            return self.process_excel_path(temp_file_path, market)
+
+        finally:
+            # Clean up temporary file
+            try:
+                os.unlink(temp_file_path)
+            except OSError:
+                pass
 
-            result = {}
-            validation_results = []
+    def process_excel_path(self, file_path: str, market: str, content_hash: Optional[str] = None,
+                           result_cache: Optional['ParseResultCache'] = None) -> Dict[str, Any]:
+        """
+        Process an Excel file that is already on disk.
+        When the file's content hash and a result cache are given, the extraction
+        result is looked up by (hash, market, config version) before parsing.
+        """
+        config = self.market_config_loader.get_config(market)
+        if not config:
+            raise ValueError(f"Configuration not found for market: {market}")
 
-            # Get worksheet name from config
-            worksheet_name = config.get_worksheet_name()
+        result = {}
+        validation_results = []
 
-            # Load Excel file with pandas
-            try:
-                # Read all sheets to check if target sheet exists
-                excel_file = pd.ExcelFile(temp_file_path)
+        use_cache = bool(content_hash and result_cache and config.version)
+        if use_cache:
+            cached = result_cache.get(content_hash, market, config.version)
+            if cached is not None:
+                result['data'] = cached
+                result['validationResults'] = validation_results
+                return result
+
+        # Get worksheet name from config
+        worksheet_name = config.get_worksheet_name()
+
+        # Load Excel file with pandas
+        try:
+            # Open the workbook once to check the target sheet and read it
+            with pd.ExcelFile(file_path) as excel_file:
                 if worksheet_name not in excel_file.sheet_names:
                     raise ValueError(f"Worksheet not found: {worksheet_name}")
 
                 # Read the specific worksheet
-                df = pd.read_excel(temp_file_path, sheet_name=worksheet_name, header=None)
+                df = pd.read_excel(excel_file, sheet_name=worksheet_name, header=None)
 
-            except Exception as e:
-                raise ValueError(f"Failed to read Excel file: {str(e)}")
+        except Exception as e:
+            raise ValueError(f"Failed to read Excel file: {str(e)}")
 
-            # Extract data using pandas DataFrame
-            result['data'] = self._extract_data_pandas(df, config, worksheet_name)
-            result['validationResults'] = validation_results
+        # Extract data using pandas DataFrame
+        result['data'] = self._extract_data_pandas(df, config, worksheet_name)
+        result['validationResults'] = validation_results
 
-            return result
+        if use_cache:
+            result_cache.put(content_hash, market, config.version, result['data'])
 
-        finally:
-            # Clean up temporary file
-            try:
-                os.unlink(temp_file_path)
-            except OSError:
-                pass
+        return result
     
     def _extract_data_pandas(self, df: pd.DataFrame, config: MarketConfig, worksheet_name: str) -> Dict[str, Any]:
         """Extract data from pandas DataFrame based on configuration"""
@@ -0,0 +1,153 @@
+"""
+Export Service - streaming CSV/XLSX/Parquet extracts of ExcelData
+
+Rows are read in yield_per batches and written out batch by batch, so an
+extract of every market for a full year never sits in memory at once.
+CSV is streamed directly; XLSX and Parquet are zip/columnar containers that
+can only be finished at the end, so they are spooled through a temporary
+file (openpyxl write-only mode, one Parquet row group per batch) and then
+streamed from disk.
+"""
+
+import csv
+import io
+import logging
+import os
+import tempfile
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from app.models import ExcelData
+from app.services.excel_data_service import excel_data_service
+
+logger = logging.getLogger(__name__)
+
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
+          "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+CHUNK_SIZE = 1024 * 1024
+
+
+class ExportFormat:
+    """Output format of an export"""
+    def __init__(self, extension: str, mimetype: str, writer: Callable[..., Iterator[bytes]]):
+        self.extension = extension
+        self.mimetype = mimetype
+        self.writer = writer
+
+
+class ExportService:
+    """Streaming export of filtered ExcelData"""
+
+    def __init__(self):
+        self.columns = [
+            ('Batch ID', ExcelData.batch_id),
+            ('User ID', ExcelData.user_id),
+            ('Upload Time', ExcelData.upload_timestamp),
+            ('Market', ExcelData.market_name),
+            ('Data Month', ExcelData.data_month),
+            ('Worksheet', ExcelData.worksheet_name),
+            ('Unit', ExcelData.unit_name),
+            ('Metric', ExcelData.metric_name),
+        ]
+        for suffix, label in (('lya', 'LYA'), ('cya', 'CYA'), ('cyt', 'CYT')):
+            for month in MONTHS:
+                self.columns.append((f'{month} {label}', getattr(ExcelData, f'{month.lower()}_{suffix}')))
+
+        self.formats: Dict[str, ExportFormat] = {
+            'csv': ExportFormat('csv', 'text/csv', self._write_csv),
+            'xlsx': ExportFormat('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+                                 self._write_xlsx),
+            'parquet': ExportFormat('parquet', 'application/vnd.apache.parquet', self._write_parquet),
+        }
+
+    @property
+    def headers(self) -> List[str]:
+        return [header for header, _ in self.columns]
+
+    def get_format(self, name: str) -> Optional[ExportFormat]:
+        """Export format by name; Parquet is only offered when pyarrow is installed"""
+        if name == 'parquet' and not self.parquet_available():
+            return None
+        return self.formats.get(name)
+
+    def available_formats(self) -> List[str]:
+        return [name for name in self.formats if self.get_format(name)]
+
+    def parquet_available(self) -> bool:
+        try:
+            import pyarrow  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def stream(self, export_format: ExportFormat, batch_size: int = 1000, **filters: Any) -> Iterator[bytes]:
+        """Encoded export content for the rows matching the filters"""
+        batches = excel_data_service.iter_data_by_filters(
+            [column for _, column in self.columns], batch_size=batch_size, **filters)
+        yield from export_format.writer(self._counted(batches, export_format, filters))
+
+    def _counted(self, batches: Iterator[List[Any]], export_format: ExportFormat,
+                 filters: Dict[str, Any]) -> Iterator[List[Any]]:
+        total = 0
+        for batch in batches:
+            total += len(batch)
+            yield batch
+        logger.info(f"Exported {total} rows as {export_format.extension} with filters {filters}")
+
+    def _write_csv(self, batches: Iterator[List[Any]]) -> Iterator[bytes]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(self.headers)
+        for batch in batches:
+            writer.writerows(batch)
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode('utf-8')
+
+    def _write_xlsx(self, batches: Iterator[List[Any]]) -> Iterator[bytes]:
+        from openpyxl import Workbook
+
+        def write(path):
+            workbook = Workbook(write_only=True)
+            worksheet = workbook.create_sheet('Export')
+            worksheet.append(self.headers)
+            for batch in batches:
+                for row in batch:
+                    worksheet.append(list(row))
+            workbook.save(path)
+
+        return self._spooled(write, '.xlsx')
+
+    def _write_parquet(self, batches: Iterator[List[Any]]) -> Iterator[bytes]:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.schema([
+            (header, pa.timestamp('us') if column is ExcelData.upload_timestamp else pa.string())
+            for header, column in self.columns
+        ])
+
+        def write(path):
+            with pq.ParquetWriter(path, schema) as writer:
+                for batch in batches:
+                    columns = list(zip(*batch))
+                    writer.write_table(pa.Table.from_arrays(
+                        [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                        schema=schema))
+
+        return self._spooled(write, '.parquet')
+
+    def _spooled(self, write: Callable[[str], None], suffix: str) -> Iterator[bytes]:
+        """Write a container format to a temporary file, then stream it back and delete it"""
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        os.close(fd)
+        try:
+            write(path)
+            with open(path, 'rb') as f:
+                yield from iter(lambda: f.read(CHUNK_SIZE), b'')
+        finally:
+            os.unlink(path)
+
+
+# Global instance
+export_service = ExportService()
@@ -0,0 +1,73 @@
+"""
+File Delivery - conditional, range-capable download responses for stored uploads
+
+Raw files are sent by path, so the WSGI server's file wrapper can stream them
+with os.sendfile (gunicorn does) instead of copying them through Python.
+With DOWNLOAD_OFFLOAD set, the response only carries an X-Accel-Redirect
+(nginx) or X-Sendfile (Apache, lighttpd) header and the proxy sends the
+bytes, including Range requests. Archived uploads are decompressed while
+they are streamed.
+"""
+
+import logging
+import os
+from urllib.parse import quote
+from flask import current_app, request
+from werkzeug.utils import send_file
+from werkzeug.wrappers import Response
+from app.models import UploadedFile
+from app.services.upload_store import UploadStore
+
+logger = logging.getLogger(__name__)
+
+OFFLOAD_X_ACCEL_REDIRECT = 'x-accel-redirect'
+OFFLOAD_X_SENDFILE = 'x-sendfile'
+
+
+def offload_header(upload_store: UploadStore, path: str, offload: str):
+    """Header name and value that hand a raw file over to the reverse proxy"""
+    if offload == OFFLOAD_X_ACCEL_REDIRECT:
+        prefix = current_app.config.get('DOWNLOAD_OFFLOAD_PREFIX', '/protected-uploads').rstrip('/')
+        relative_path = os.path.relpath(path, upload_store.upload_folder).replace(os.sep, '/')
+        return 'X-Accel-Redirect', f"{prefix}/{quote(relative_path)}"
+    return 'X-Sendfile', path
+
+
+def send_stored_file(upload_store: UploadStore, record: UploadedFile) -> Response:
+    """
+    Send a cataloged upload as an attachment. The content hash is the strong
+    ETag, so If-None-Match revalidation answers 304 without any file I/O.
+    """
+    offload = (current_app.config.get('DOWNLOAD_OFFLOAD') or '').lower()
+    if offload not in ('', OFFLOAD_X_ACCEL_REDIRECT, OFFLOAD_X_SENDFILE):
+        logger.warning(f"Unknown DOWNLOAD_OFFLOAD '{offload}', serving files directly")
+        offload = ''
+
+    raw_path = upload_store.raw_path(record.stored_path, record.content_hash)
+    offloaded = bool(offload and raw_path)
+
+    response = send_file(
+        raw_path or upload_store.open(record.stored_path, record.content_hash),
+        request.environ,
+        as_attachment=True,
+        download_name=record.original_filename,
+        use_x_sendfile=offloaded,
+        response_class=current_app.response_class,
+        conditional=False,
+        etag=record.content_hash,
+        last_modified=record.upload_time,
+    )
+    response.content_length = record.file_size
+
+    if offloaded:
+        header, value = offload_header(upload_store, raw_path, offload)
+        response.headers.pop('X-Sendfile', None)
+        response.headers[header] = value
+        # The proxy serves Range requests itself
+        response.make_conditional(request.environ)
+        if response.status_code == 304:
+            response.headers.pop(header, None)
+    else:
+        response.make_conditional(request.environ, accept_ranges=True, complete_length=record.file_size)
+
+    return response
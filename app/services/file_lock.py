@@ -0,0 +1,62 @@
+"""
+File Lock - cross-process guard for background maintenance tasks and blob updates
+"""
+
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+class FileLock:
+    """
+    Exclusive lock backed by a file created with O_EXCL.
+    The holder refreshes the file's mtime while working; a lock that has not
+    been refreshed for stale_seconds is assumed to belong to a dead process.
+    """
+
+    def __init__(self, path: str, stale_seconds: int = 600):
+        self.path = path
+        self.stale_seconds = stale_seconds
+
+    def acquire(self, timeout: float = 0) -> bool:
+        """Take the lock, waiting up to timeout seconds; returns False if another live holder keeps it"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        deadline = time.monotonic() + timeout
+        while True:
+            if self._try_acquire():
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+
+    def _try_acquire(self) -> bool:
+        for _ in range(2):
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(fd, str(os.getpid()).encode())
+                os.close(fd)
+                return True
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.path) < self.stale_seconds:
+                        return False
+                    logger.warning(f"Removing stale lock {self.path}")
+                    os.unlink(self.path)
+                except FileNotFoundError:
+                    pass
+        return False
+
+    def refresh(self) -> None:
+        """Mark the lock as still in use"""
+        try:
+            os.utime(self.path)
+        except OSError:
+            pass
+
+    def release(self) -> None:
+        """Give the lock up"""
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
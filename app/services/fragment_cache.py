@@ -0,0 +1,168 @@
+"""
+Fragment Cache - cached rendering of per-batch template sections
+
+A batch's rows never change after ingestion, so the HTML of its table
+sections can be rendered once and reused. Fragments are keyed by fragment
+template, template version (digest of the template source) and a caller
+key such as the batch ID. Entries live in a bounded in-memory LRU, with an
+optional on-disk tier shared by all worker processes.
+
+Templates render a fragment with:
+    {{ cached_fragment('excel/_result_preview.html', batchId, data=data) }}
+
+Time spent rendering fragments on a request is reported in a Server-Timing
+response header.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from flask import current_app, g, render_template
+from markupsafe import Markup
+
+logger = logging.getLogger(__name__)
+
+
+class FragmentCache:
+    """Two-tier (memory LRU, optional disk) cache of rendered template fragments"""
+
+    def __init__(self, max_entries: int, max_bytes: int, folder: Optional[str] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.folder = folder
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._size = 0
+        self._versions: Dict[str, Tuple[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'render_seconds': 0.0}
+
+    def template_version(self, template_name: str) -> str:
+        """Digest of a template's source, recomputed when the file changes"""
+        cached = self._versions.get(template_name)
+        if cached and (cached[1] is None or cached[1]()):
+            return cached[0]
+
+        env = current_app.jinja_env
+        source, _, uptodate = env.loader.get_source(env, template_name)
+        version = hashlib.sha256(source.encode('utf-8')).hexdigest()[:12]
+        self._versions[template_name] = (version, uptodate)
+        return version
+
+    def render(self, template_name: str, key: Any, **context: Any) -> Markup:
+        """Rendered fragment for key, from cache when possible"""
+        started = time.perf_counter()
+        cache_key = f"{template_name}:{self.template_version(template_name)}:{key}"
+
+        html = self._get(cache_key)
+        if html is None:
+            html = render_template(template_name, **context)
+            self._put(cache_key, html)
+            self._count('misses')
+
+        self._record_time(time.perf_counter() - started)
+        return Markup(html)
+
+    def clear(self) -> None:
+        """Drop all in-memory entries (the disk tier is left to its own files)"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _get(self, cache_key: str) -> Optional[str]:
+        with self._lock:
+            html = self._entries.get(cache_key)
+            if html is not None:
+                self._entries.move_to_end(cache_key)
+                self.stats['hits'] += 1
+                return html
+
+        html = self._read_disk(cache_key)
+        if html is not None:
+            self._put_memory(cache_key, html)
+            self._count('disk_hits')
+        return html
+
+    def _put(self, cache_key: str, html: str) -> None:
+        self._put_memory(cache_key, html)
+        self._write_disk(cache_key, html)
+
+    def _put_memory(self, cache_key: str, html: str) -> None:
+        size = len(html)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(cache_key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[cache_key] = html
+            self._size += size
+            while self._entries and (len(self._entries) > self.max_entries or self._size > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def _disk_path(self, cache_key: str) -> str:
+        return os.path.join(self.folder, f"{hashlib.sha256(cache_key.encode('utf-8')).hexdigest()}.html")
+
+    def _read_disk(self, cache_key: str) -> Optional[str]:
+        if not self.folder:
+            return None
+        try:
+            with open(self._disk_path(cache_key), 'r', encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f"Failed to read fragment cache entry: {e}")
+            return None
+
+    def _write_disk(self, cache_key: str, html: str) -> None:
+        if not self.folder:
+            return
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.folder, suffix='.part')
+            with os.fdopen(fd, 'w', encoding='utf-8') as temp_file:
+                temp_file.write(html)
+            os.replace(temp_path, self._disk_path(cache_key))
+        except OSError as e:
+            logger.warning(f"Failed to write fragment cache entry: {e}")
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+    def _record_time(self, seconds: float) -> None:
+        with self._lock:
+            self.stats['render_seconds'] += seconds
+        g.fragment_render_seconds = g.get('fragment_render_seconds', 0.0) + seconds
+        g.fragment_count = g.get('fragment_count', 0) + 1
+
+
+def init_fragment_cache(app) -> None:
+    """Attach the fragment cache to the app and expose cached_fragment() to templates"""
+    cache = FragmentCache(
+        app.config.get('FRAGMENT_CACHE_MAX_ENTRIES', 512),
+        app.config.get('FRAGMENT_CACHE_MAX_BYTES', 64 * 1024 * 1024),
+        app.config.get('FRAGMENT_CACHE_FOLDER')
+    )
+    app.extensions['fragment_cache'] = cache
+
+    def cached_fragment(template_name: str, key: Any, **context: Any) -> Markup:
+        if not current_app.config.get('FRAGMENT_CACHE_ENABLED', True):
+            return Markup(render_template(template_name, **context))
+        return cache.render(template_name, key, **context)
+
+    app.jinja_env.globals['cached_fragment'] = cached_fragment
+
+    @app.after_request
+    def add_fragment_timing(response):
+        """Report fragment render time as a Server-Timing metric"""
+        if 'fragment_render_seconds' in g:
+            response.headers.add('Server-Timing',
+                                 f'fragments;dur={g.fragment_render_seconds * 1000:.1f};desc="{g.fragment_count} fragments"')
+        return response
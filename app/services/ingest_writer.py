@@ -0,0 +1,220 @@
+"""
+Ingest Writer - group commit of uploaded batches through one writer thread
+
+On SQLite every upload that commits on its own request thread competes for
+the database write lock, and concurrent uploads spend their time in the
+busy handler instead of writing. With INGEST_WRITER_ENABLED, upload
+requests hand their parsed batch to a queue instead and wait on a future.
+A writer thread per database (the main one, plus one per market shard)
+takes the first waiting batch, collects whatever else arrives within
+INGEST_MAX_DELAY_MS (up to INGEST_MAX_ROWS rows), and saves them all in one
+transaction: one lock acquisition and one commit for the group.
+
+Every batch is staged under its own savepoint, so a batch that fails only
+fails its own future; if the commit itself fails, every batch of the group
+fails with that error. A batch still waiting when its submitter gives up
+(INGEST_TIMEOUT) is cancelled and never committed.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+from typing import Any, Dict, List, Optional
+from flask import current_app
+from app.database import IMMEDIATE_TRANSACTION
+from app.models import db, DataVersion, ExcelData
+from app.services.excel_data_service import excel_data_service
+from app.sharding import MAIN, get_shard_router, using_shard
+
+logger = logging.getLogger(__name__)
+
+class IngestJob:
+    """One batch waiting for the writer, with the future its submitter waits on"""
+    __slots__ = ('market', 'batch_id', 'rows', 'arguments', 'future', 'submitted')
+
+    def __init__(self, arguments: Dict[str, Any]):
+        self.market = arguments['market']
+        self.batch_id = arguments['batch_id']
+        self.rows = len(arguments['units'])
+        self.arguments = arguments
+        self.future: Future = Future()
+        self.submitted = time.perf_counter()
+
+class IngestWriter:
+    """Queues of pending batches and the writer threads that commit them in groups"""
+
+    def __init__(self, app, max_delay: float = 0.02, max_rows: int = 2000, timeout: Optional[float] = 300):
+        self.app = app
+        self.max_delay = max_delay
+        self.max_rows = max_rows
+        self.timeout = timeout
+        self.stats = {'batches': 0, 'transactions': 0, 'failed': 0, 'queue_seconds': 0.0}
+        self._queues: Dict[Optional[str], queue.Queue] = {}
+        self._threads: Dict[Optional[str], threading.Thread] = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def submit(self, **arguments: Any) -> Future:
+        """Queue a batch (the arguments of ExcelDataService.save_excel_data); the future resolves once it is committed"""
+        job = IngestJob(arguments)
+        router = get_shard_router()
+        self._queue_for(router.shard_for(job.market) if router else None).put(job)
+        return job.future
+
+    def save_excel_data(self, **arguments: Any) -> None:
+        """Queue a batch and wait until it is committed; raises what the save raised, or TimeoutError"""
+        future = self.submit(**arguments)
+        try:
+            future.result(timeout=self.timeout)
+        except TimeoutError:
+            # Still waiting for the writer: cancel it, so it is not committed after the upload failed
+            if future.cancel():
+                raise
+            # Its group is already being committed: the outcome is on its way
+            future.result()
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Let the writer threads finish the queued batches and stop"""
+        with self._lock:
+            threads = list(self._threads.values())
+            for jobs in self._queues.values():
+                jobs.put(None)
+            self._queues.clear()
+            self._threads.clear()
+        for thread in threads:
+            thread.join(timeout)
+
+    def _queue_for(self, shard: Optional[str]) -> queue.Queue:
+        with self._lock:
+            if self._pid != os.getpid():
+                # Threads do not survive a fork: a worker process starts its own writers
+                self._queues.clear()
+                self._threads.clear()
+                self._pid = os.getpid()
+
+            jobs = self._queues.get(shard)
+            if jobs is None:
+                jobs = self._queues[shard] = queue.Queue()
+                thread = threading.Thread(target=self._run, args=(shard, jobs),
+                                          name=f"ingest-writer-{shard or 'main'}", daemon=True)
+                self._threads[shard] = thread
+                thread.start()
+            return jobs
+
+    def _run(self, shard: Optional[str], jobs: queue.Queue) -> None:
+        while True:
+            group = self._collect(jobs)
+            if not group:
+                return
+            self._commit_group(shard, group)
+            if group[-1] is None:
+                return
+
+    def _collect(self, jobs: queue.Queue) -> List[Optional[IngestJob]]:
+        """The next group: the first waiting batch plus those arriving within max_delay, up to max_rows"""
+        first = jobs.get()
+        if first is None:
+            return []
+        group: List[Optional[IngestJob]] = [first]
+        rows = first.rows
+        deadline = time.perf_counter() + self.max_delay
+        while rows < self.max_rows:
+            remaining = deadline - time.perf_counter()
+            try:
+                job = jobs.get(timeout=remaining) if remaining > 0 else jobs.get_nowait()
+            except queue.Empty:
+                break
+            group.append(job)
+            if job is None:
+                # Closing: commit what was collected, then stop
+                break
+            rows += job.rows
+        return group
+
+    def _commit_group(self, shard: Optional[str], group: List[Optional[IngestJob]]) -> None:
+        """Stage each batch under a savepoint and commit the group in one transaction"""
+        # Batches whose submitter stopped waiting were cancelled; the rest can no longer be
+        jobs = [job for job in group if job is not None and job.future.set_running_or_notify_cancel()]
+        if not jobs:
+            return
+        started = time.perf_counter()
+        staged: List[IngestJob] = []
+        with self.app.app_context(), using_shard(shard):
+            try:
+                # BEGIN IMMEDIATE on the database the batches go to: the group waits for the write
+                # lock once, before staging anything, and its savepoints stay inside the transaction
+                db.session.connection(bind_arguments={'mapper': ExcelData}, execution_options=IMMEDIATE_TRANSACTION)
+            except Exception as e:
+                logger.error(f"Error starting a transaction for {len(jobs)} batches", exc_info=True)
+                db.session.rollback()
+                for job in jobs:
+                    self._fail(job, e)
+                return
+
+            for job in jobs:
+                try:
+                    with db.session.begin_nested():
+                        excel_data_service.stage_excel_data(**job.arguments)
+                    staged.append(job)
+                except Exception as e:
+                    logger.error(f"Error saving Excel data for market: {job.market} with batch: {job.batch_id}",
+                                 exc_info=True)
+                    self._fail(job, e)
+
+            if not staged:
+                db.session.rollback()
+                return
+
+            try:
+                if shard is MAIN:
+                    DataVersion.bump(DataVersion.EXCEL_DATA)
+                db.session.commit()
+            except Exception as e:
+                logger.error(f"Error committing {len(staged)} batches", exc_info=True)
+                db.session.rollback()
+                for job in staged:
+                    self._fail(job, e)
+                return
+
+            if shard is not MAIN:
+                # The version counter lives in the main database: bumped after the shard commit, so
+                # writers of different shards never wait for each other on the main write lock
+                excel_data_service.bump_version()
+
+        with self._lock:
+            self.stats['transactions'] += 1
+            self.stats['batches'] += len(staged)
+            self.stats['queue_seconds'] += sum(started - job.submitted for job in staged)
+        for job in staged:
+            job.future.set_result(None)
+        logger.info(f"Committed {len(staged)} batches ({sum(job.rows for job in staged)} rows) in one transaction")
+
+    def _fail(self, job: IngestJob, error: Exception) -> None:
+        with self._lock:
+            self.stats['failed'] += 1
+        job.future.set_exception(RuntimeError(f"Failed to save Excel data: {str(error)}"))
+
+
+def init_ingest_writer(app) -> None:
+    """Attach the group-commit writer when INGEST_WRITER_ENABLED is on"""
+    from app.database import is_memory_sqlite
+
+    # An in-memory database is one shared connection: there is no lock to queue for
+    if not app.config.get('INGEST_WRITER_ENABLED') or is_memory_sqlite(app.config['SQLALCHEMY_DATABASE_URI']):
+        return
+
+    writer = IngestWriter(app,
+                          max_delay=app.config.get('INGEST_MAX_DELAY_MS', 20) / 1000,
+                          max_rows=app.config.get('INGEST_MAX_ROWS', 2000),
+                          timeout=app.config.get('INGEST_TIMEOUT'))
+    app.extensions['ingest_writer'] = writer
+    atexit.register(writer.close)
+
+
+def get_ingest_writer() -> Optional[IngestWriter]:
+    """Group-commit writer of the current app, or None when uploads commit on their own thread"""
+    return current_app.extensions.get('ingest_writer')
@@ -4,6 +4,7 @@ Market Configuration Loader - Python equivalent of Java MarketConfigLoader
 
 import yaml
 import os
+import hashlib
 import logging
 from typing import Dict, List, Optional, Any
 
@@ -12,8 +13,9 @@ logger = logging.getLogger(__name__)
 class MarketConfig:
     """Market configuration data structure"""
     
-    def __init__(self, config_data: Dict[str, Any]):
+    def __init__(self, config_data: Dict[str, Any], version: str = ''):
         self.data = config_data
+        self.version = version  # digest of the YAML source; changes whenever the file changes
         self.require_bu_prefix = config_data.get('requireBuPrefix', False)
         self.require_xlsx_suffix = config_data.get('requireXlsxSuffix', True)
         self.file_encoding = config_data.get('fileEncoding', 'UTF-8')
@@ -64,6 +66,7 @@ class MarketConfigLoader:
     def __init__(self, config_path: str = 'config/market'):
         self.config_path = config_path
         self.market_configs: Dict[str, MarketConfig] = {}
+        self.config_mtimes: Dict[str, float] = {}
         self.available_markets: List[str] = []
         self._load_available_markets()
         self._load_market_configs()
@@ -90,14 +93,20 @@ class MarketConfigLoader:
             if config:
                 self.market_configs[market] = config
     
+    def _config_file(self, market: str) -> str:
+        """Path of the configuration file for a market"""
+        return os.path.join(self.config_path, f"{market}.config.yml")
+
     def _load_config(self, market: str) -> Optional[MarketConfig]:
         """Load configuration for a specific market"""
         try:
-            config_file = os.path.join(self.config_path, f"{market}.config.yml")
+            config_file = self._config_file(market)
             if os.path.exists(config_file):
-                with open(config_file, 'r', encoding='utf-8') as f:
-                    config_data = yaml.safe_load(f)
-                    return MarketConfig(config_data)
+                with open(config_file, 'rb') as f:
+                    raw = f.read()
+                self.config_mtimes[market] = os.path.getmtime(config_file)
+                config_data = yaml.safe_load(raw.decode('utf-8'))
+                return MarketConfig(config_data, version=hashlib.sha256(raw).hexdigest()[:16])
             else:
                 logger.warning(f"Configuration file not found for market: {market}")
                 return None
@@ -105,13 +114,20 @@ class MarketConfigLoader:
             logger.error(f"Failed to load configuration for market {market}: {e}")
             return None
     
+    def _is_stale(self, market: str) -> bool:
+        """Check if a market's YAML file changed since it was loaded"""
+        try:
+            return os.path.getmtime(self._config_file(market)) != self.config_mtimes.get(market)
+        except OSError:
+            return False
+    
     def get_available_markets(self) -> List[str]:
         """Get list of available markets"""
         return self.available_markets.copy()
     
     def get_config(self, market: str) -> Optional[MarketConfig]:
         """Get configuration for a specific market"""
-        if market not in self.market_configs:
+        if market not in self.market_configs or self._is_stale(market):
             config = self._load_config(market)
             if config:
                 self.market_configs[market] = config
@@ -124,7 +140,7 @@ class MarketConfigLoader:
     def get_config_content(self, market: str) -> str:
         """Get raw configuration content for a market"""
         try:
-            config_file = os.path.join(self.config_path, f"{market}.config.yml")
+            config_file = self._config_file(market)
             if os.path.exists(config_file):
                 with open(config_file, 'r', encoding='utf-8') as f:
                     return f.read()
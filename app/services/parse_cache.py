@@ -0,0 +1,140 @@
+"""
+Parse Result Cache - on-disk cache of workbook extraction results
+
+Entries are keyed by (file content hash, market, market config version) and
+stored as compressed NumPy archives of string arrays, loaded with
+allow_pickle=False. Total size is bounded by evicting the least recently
+used entries; a hit refreshes the entry's modification time.
+"""
+
+import logging
+import os
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Column blocks of an extraction result, in the order ExcelService produces them
+BLOCKS = ('lastYearActual', 'currentYearActual', 'currentYearTarget')
+
+
+class ParseResultCache:
+    """LRU-bounded cache of ExcelService extraction results"""
+
+    def __init__(self, folder: str, max_bytes: int):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _entry_path(self, content_hash: str, market: str, config_version: str) -> str:
+        return os.path.join(self.folder, f"{market}_{config_version}_{content_hash}.npz")
+
+    def get(self, content_hash: str, market: str, config_version: str) -> Optional[Dict[str, Any]]:
+        """Return the cached extraction result, or None on a miss"""
+        path = self._entry_path(content_hash, market, config_version)
+        try:
+            with np.load(path, allow_pickle=False) as archive:
+                data = self._decode(archive)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Discarding unreadable parse cache entry {path}: {e}")
+            self._remove(path)
+            return None
+
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        logger.info(f"Parse cache hit for {market} {content_hash[:12]}")
+        return data
+
+    def put(self, content_hash: str, market: str, config_version: str, data: Dict[str, Any]) -> None:
+        """Store an extraction result, dropping entries built from older versions of the market config"""
+        os.makedirs(self.folder, exist_ok=True)
+        path = self._entry_path(content_hash, market, config_version)
+
+        fd, temp_path = tempfile.mkstemp(dir=self.folder, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                np.savez_compressed(temp_file, **self._encode(data))
+            os.replace(temp_path, path)
+        except Exception as e:
+            logger.warning(f"Failed to write parse cache entry for {market} {content_hash[:12]}: {e}")
+            self._remove(temp_path)
+            return
+
+        with self._lock:
+            self._purge_stale_versions(market, config_version)
+            self._evict()
+
+    def _encode(self, data: Dict[str, Any]) -> Dict[str, np.ndarray]:
+        arrays = {
+            'worksheetName': np.array(data.get('worksheetName', '')),
+            'units': np.array(data.get('units', []), dtype=str),
+            'metrics': np.array(data.get('metrics', []), dtype=str),
+        }
+        for block in BLOCKS:
+            columns = data.get(block, {})
+            arrays[f'{block}.columns'] = np.array(list(columns), dtype=str)
+            for i, values in enumerate(columns.values()):
+                arrays[f'{block}.{i}'] = np.array(values, dtype=str)
+        return arrays
+
+    def _decode(self, archive) -> Dict[str, Any]:
+        data: Dict[str, Any] = {
+            'worksheetName': str(archive['worksheetName']),
+            'units': archive['units'].tolist(),
+            'metrics': archive['metrics'].tolist(),
+        }
+        for block in BLOCKS:
+            columns: List[str] = archive[f'{block}.columns'].tolist()
+            data[block] = {name: archive[f'{block}.{i}'].tolist() for i, name in enumerate(columns)}
+        return data
+
+    def _entries(self):
+        try:
+            with os.scandir(self.folder) as it:
+                return [entry for entry in it if entry.name.endswith('.npz')]
+        except FileNotFoundError:
+            return []
+
+    def _purge_stale_versions(self, market: str, config_version: str) -> None:
+        prefix = f"{market}_"
+        current = f"{market}_{config_version}_"
+        for entry in self._entries():
+            if entry.name.startswith(prefix) and not entry.name.startswith(current):
+                self._remove(entry.path)
+
+    def _evict(self) -> None:
+        entries = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def _remove(self, path: str) -> None:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def init_parse_cache(app) -> None:
+    """Attach a parse result cache to the app when enabled in config"""
+    if app.config.get('PARSE_CACHE_ENABLED', True):
+        app.extensions['parse_cache'] = ParseResultCache(
+            app.config.get('PARSE_CACHE_FOLDER', 'cache/parsed'),
+            app.config.get('PARSE_CACHE_MAX_BYTES', 256 * 1024 * 1024)
+        )
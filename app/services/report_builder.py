@@ -0,0 +1,213 @@
+"""
+Report Builder - regenerates market template workbooks from stored batches
+
+A batch is written back in its market's worksheet layout (units/metrics
+columns and the LYA/CYA/CYT blocks from MarketConfig), so the result can be
+re-uploaded or compared with the original file. Workbooks are written with
+openpyxl's write-only mode, one row at a time, and cached on disk by batch
+and market config version; a consolidated workbook has one sheet per market
+with the latest batch of each for a data month.
+"""
+
+import hashlib
+import logging
+import math
+import os
+import tempfile
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from openpyxl import Workbook
+from app.models import db, ExcelData
+from app.services.market_config_loader import MarketConfig, MarketConfigLoader
+from app.sharding import using_batch_shard, using_shard
+
+logger = logging.getLogger(__name__)
+
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
+          "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+# Config block and ExcelData column suffix of each month block
+BLOCKS = (('lastYearActual', 'lya'), ('currentYearActual', 'cya'), ('currentYearTarget', 'cyt'))
+
+
+class ReportBuilder:
+    """Template-layout workbook generation with an on-disk cache"""
+
+    def __init__(self, folder: str, max_bytes: int, config_loader: MarketConfigLoader):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.config_loader = config_loader
+        self._lock = threading.Lock()
+
+    def batch_workbook(self, batch_id: str) -> Optional[str]:
+        """Path of the workbook for one batch, or None if the batch or its market config is unknown"""
+        batch = self._batch_info(batch_id)
+        if not batch:
+            return None
+        market, _ = batch
+        config = self.config_loader.get_config(market)
+        if not config:
+            return None
+
+        path = os.path.join(self.folder, f"{batch_id}_{config.version}.xlsx")
+        return self._cached(path, lambda workbook: self._write_sheet(
+            workbook, config.get_worksheet_name(), config, batch_id))
+
+    def consolidated_workbook(self, data_month: str, markets: List[str]) -> Optional[str]:
+        """
+        Path of a workbook with one sheet per market holding that market's latest
+        batch for the data month, or None if no market has data for it.
+        """
+        sheets: List[Tuple[str, MarketConfig, str]] = []
+        for market in markets:
+            config = self.config_loader.get_config(market)
+            batch_id = self._latest_batch(market, data_month)
+            if config and batch_id:
+                sheets.append((market, config, batch_id))
+        if not sheets:
+            return None
+
+        key = '|'.join(f"{market}:{batch_id}:{config.version}" for market, config, batch_id in sheets)
+        path = os.path.join(self.folder, f"consolidated_{data_month}_{hashlib.sha256(key.encode()).hexdigest()[:16]}.xlsx")
+
+        def write(workbook):
+            for market, config, batch_id in sheets:
+                self._write_sheet(workbook, market, config, batch_id)
+
+        return self._cached(path, write)
+
+    def _batch_info(self, batch_id: str) -> Optional[Tuple[str, str]]:
+        """(market, data month) of a batch"""
+        with using_batch_shard(batch_id):
+            return db.session.query(ExcelData.market_name, ExcelData.data_month) \
+                .filter(ExcelData.batch_id == batch_id).first()
+
+    def _latest_batch(self, market: str, data_month: str) -> Optional[str]:
+        with using_shard(market):
+            row = db.session.query(ExcelData.batch_id) \
+                .filter(ExcelData.market_name == market, ExcelData.data_month == data_month) \
+                .order_by(ExcelData.upload_timestamp.desc(), ExcelData.id.desc()).first()
+        return row[0] if row else None
+
+    def _cached(self, path: str, write) -> str:
+        """Return the cached workbook at path, writing it first on a miss"""
+        if os.path.exists(path):
+            try:
+                os.utime(path)  # mark as recently used
+            except OSError:
+                pass
+            logger.info(f"Report cache hit: {os.path.basename(path)}")
+            return path
+
+        os.makedirs(self.folder, exist_ok=True)
+        workbook = Workbook(write_only=True)
+        write(workbook)
+
+        fd, temp_path = tempfile.mkstemp(dir=self.folder, suffix='.part')
+        os.close(fd)
+        try:
+            workbook.save(temp_path)
+            os.replace(temp_path, path)
+        except Exception:
+            self._remove(temp_path)
+            raise
+        logger.info(f"Generated report {os.path.basename(path)}")
+
+        with self._lock:
+            self._evict(keep=path)
+        return path
+
+    def _write_sheet(self, workbook: Workbook, title: str, config: MarketConfig, batch_id: str) -> None:
+        """Append one worksheet laid out as the market's template"""
+        sheet = workbook.create_sheet(title)
+        row_range = config.get_data_row_range()
+        start_row = row_range.get('startRow', 2)
+        header_row = min(row_range.get('headerRow', start_row - 1), start_row - 1)
+        unit_column = config.get_units_config().get('columnNum', 1)
+        metric_column = config.get_metrics_config().get('columnNum', 3)
+        width = max([config.get_data_column_range().get('endColumn', 1), unit_column, metric_column] +
+                    [config.worksheet.get(block, {}).get('endColumn', 0) for block, _ in BLOCKS])
+
+        for row_number in range(1, start_row):
+            row: List[Any] = [None] * width
+            if row_number == header_row:
+                row[unit_column - 1] = 'Unit'
+                row[metric_column - 1] = 'Metric'
+                for block, _ in BLOCKS:
+                    block_config = config.worksheet.get(block, {})
+                    for i, column in enumerate(block_config.get('columns', [])):
+                        row[block_config['startColumn'] - 1 + i] = column.get('name')
+            sheet.append(row)
+
+        for record in self._batch_rows(batch_id):
+            row = [None] * width
+            row[unit_column - 1] = record['unit_name']
+            row[metric_column - 1] = record['metric_name']
+            for block, suffix in BLOCKS:
+                block_config = config.worksheet.get(block, {})
+                for i, column in enumerate(block_config.get('columns', [])):
+                    month = column.get('name', '')[:3].lower()
+                    row[block_config['startColumn'] - 1 + i] = self._cell_value(record.get(f'{month}_{suffix}'))
+            sheet.append(row)
+
+    def _batch_rows(self, batch_id: str, batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """Rows of a batch in upload order, fetched in batches"""
+        columns = [ExcelData.unit_name, ExcelData.metric_name] + [
+            getattr(ExcelData, f'{month.lower()}_{suffix}') for _, suffix in BLOCKS for month in MONTHS]
+        statement = db.select(*columns).where(ExcelData.batch_id == batch_id) \
+            .order_by(ExcelData.id).execution_options(yield_per=batch_size)
+        with using_batch_shard(batch_id):
+            result = db.session.execute(statement)
+        for row in result:
+            yield row._mapping
+
+    def _cell_value(self, value: Optional[str]) -> Any:
+        """
+        Write values stored from numeric cells back as numbers of the same kind, and any other
+        text as it was stored. Parsing stores a numeric cell as str() of its int or float, so only
+        that exact form is converted: '100.0' stays a float, and '007' or '1,000' stay text.
+        """
+        if value is None or value == '':
+            return None
+        for kind in (int, float):
+            try:
+                number = kind(value)
+            except ValueError:
+                continue
+            if str(number) == value and math.isfinite(number):
+                return number
+        return value
+
+    def _evict(self, keep: str) -> None:
+        entries = []
+        try:
+            with os.scandir(self.folder) as it:
+                for entry in it:
+                    if entry.name.endswith('.xlsx') and entry.path != keep:
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except FileNotFoundError:
+            return
+
+        total = sum(size for _, size, _ in entries) + os.path.getsize(keep)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def _remove(self, path: str) -> None:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def init_report_builder(app) -> None:
+    """Attach the report builder to the app"""
+    from app.services.market_config_loader import market_config_loader
+
+    app.extensions['report_builder'] = ReportBuilder(
+        app.config.get('REPORT_CACHE_FOLDER', 'cache/reports'),
+        app.config.get('REPORT_CACHE_MAX_BYTES', 256 * 1024 * 1024),
+        market_config_loader
+    )
@@ -0,0 +1,258 @@
+"""
+Rollup Service - pre-aggregated totals maintained when Excel data is saved
+
+metric_rollup holds, per market, data month, unit, metric and category
+(LYA/CYA/CYT), the sum of the numeric values and the number of non-blank
+values of each month. It is updated by save_excel_data in the same
+transaction as the rows themselves; together with the batch manifest
+(row counts and uploaders), dashboard statistics and cross-market totals
+cost a scan of markets x metrics instead of every raw row.
+
+After loading data by other means, rebuild them with:
+    flask --app app rebuild-rollups
+"""
+
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from app.models import db, Batch, ExcelData, DataVersion, MetricRollup, is_period_key
+from app.sharding import each_shard, read_shards, shard_keys, using_shard
+
+logger = logging.getLogger(__name__)
+
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
+          "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+# Rollup category -> ExcelData column suffix and display key
+CATEGORIES = {
+    MetricRollup.LYA: ('lya', 'lastYearActual'),
+    MetricRollup.CYA: ('cya', 'currentYearActual'),
+    MetricRollup.CYT: ('cyt', 'currentYearTarget'),
+}
+
+# INSERT ... ON CONFLICT DO UPDATE by dialect; others update or insert row by row
+UPSERTS = {'sqlite': sqlite_insert, 'postgresql': postgresql_insert}
+
+SUM_COLUMNS = [month.lower() for month in MONTHS]
+COUNT_COLUMNS = [f"{month.lower()}_count" for month in MONTHS]
+
+def to_number(value: Optional[str]) -> Optional[float]:
+    """Numeric value of a cell as stored (e.g. '1,234.5'), or None if it is not a number"""
+    try:
+        return float(value.replace(',', '').strip())
+    except (AttributeError, ValueError):
+        return None
+
+class RollupService:
+    """Maintenance and queries of the rollup tables"""
+
+    def add_records(self, records: Iterable[ExcelData]) -> None:
+        """Add Excel data rows to the rollups; runs inside the caller's transaction and does not commit"""
+        metrics: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+
+        for record in records:
+            for category, (suffix, _) in CATEGORIES.items():
+                key = (record.market_name, record.data_month, record.unit_name, record.metric_name, category)
+                totals = metrics.get(key)
+                if totals is None:
+                    totals = metrics[key] = dict.fromkeys(SUM_COLUMNS + COUNT_COLUMNS + ['row_count'], 0)
+                    totals['period_key'] = record.period_key
+                totals['row_count'] += 1
+
+                for month in SUM_COLUMNS:
+                    value = getattr(record, f"{month}_{suffix}")
+                    if value and value.strip():
+                        totals[f"{month}_count"] += 1
+                        number = to_number(value)
+                        if number is not None:
+                            totals[month] += number
+
+        metric_rows = [dict(zip(('market_name', 'data_month', 'unit_name', 'metric_name', 'category'), key), **totals)
+                       for key, totals in metrics.items()]
+        self._add(MetricRollup, ['market_name', 'data_month', 'unit_name', 'metric_name', 'category'],
+                  SUM_COLUMNS + COUNT_COLUMNS + ['row_count'], metric_rows)
+
+    def _add(self, model, key_columns: List[str], additive_columns: List[str], rows: List[Dict[str, Any]]) -> None:
+        """Insert new rollup rows and add the totals of existing ones"""
+        if not rows:
+            return
+
+        upsert = UPSERTS.get(db.session.get_bind(mapper=model).dialect.name)
+        if upsert is None:
+            for row in rows:
+                self._add_row(model, key_columns, additive_columns, row)
+            return
+
+        # One upsert: rows inserted meanwhile by another process are added to, not lost
+        statement = upsert(model)
+        columns = model.__table__.c
+        statement = statement.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={name: columns[name] + statement.excluded[name] for name in additive_columns}
+        )
+        db.session.execute(statement, rows)
+
+    def _add_row(self, model, key_columns: List[str], additive_columns: List[str], row: Dict[str, Any]) -> None:
+        """Add one row's totals on a database without upsert: update, else insert, else update after all"""
+        key = [getattr(model, name) == row[name] for name in key_columns]
+        values = {name: getattr(model, name) + row[name] for name in additive_columns}
+        update_row = update(model).where(*key).values(**values).execution_options(synchronize_session=False)
+        if db.session.execute(update_row).rowcount:
+            return
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(model), [row])
+        except IntegrityError:
+            # Inserted concurrently by another process
+            db.session.execute(update_row)
+
+    def rebuild(self, batch_size: int = 1000) -> int:
+        """Recompute the rollup table of every shard from its excel_data; returns the number of rows read"""
+        total = sum(each_shard(lambda: self._rebuild(batch_size)))
+        logger.info(f"Rebuilt rollups from {total} Excel data rows")
+        return total
+
+    def _rebuild(self, batch_size: int) -> int:
+        try:
+            total = 0
+            db.session.execute(delete(MetricRollup))
+            statement = select(ExcelData).execution_options(yield_per=batch_size)
+            for partition in db.session.execute(statement).scalars().partitions():
+                self.add_records(partition)
+                total += len(partition)
+
+            DataVersion.bump(DataVersion.EXCEL_DATA)
+            db.session.commit()
+            return total
+
+        except Exception as e:
+            logger.error(f"Failed to rebuild rollups: {e}", exc_info=True)
+            db.session.rollback()
+            raise
+
+    def is_missing(self) -> bool:
+        """Check whether Excel data exists that the rollups have never seen (e.g. saved before they existed)"""
+        for shard in shard_keys():
+            with using_shard(shard):
+                if (db.session.query(MetricRollup.market_name).first() is None
+                        and db.session.query(ExcelData.id).first() is not None):
+                    return True
+        return False
+
+    def covers(self, batch_id: Optional[str] = None, user_id: Optional[str] = None) -> bool:
+        """Check whether statistics for these filters can be answered from the rollups"""
+        return not batch_id and not user_id
+
+    def get_statistics(self, market_name: Optional[str] = None, data_month: Optional[str] = None,
+                       period_from: Optional[int] = None, period_to: Optional[int] = None) -> Dict[str, Any]:
+        """Dashboard statistics (same shape as ExcelDataService.get_statistics) read from the rollups"""
+        monthly_stats = {display: {} for _, display in CATEGORIES.values()}
+        empty = {'totalRecords': 0, 'uniqueBatches': 0, 'uniqueUsers': 0, 'uniqueMarkets': 0,
+                 'monthlyStats': monthly_stats}
+        if not self._valid_periods(period_from, period_to):
+            return empty
+
+        batch_filters = self._filters(Batch, market_name, data_month, period_from, period_to)
+        metric_filters = self._filters(MetricRollup, market_name, data_month, period_from, period_to)
+
+        def read():
+            total_records, unique_batches = db.session.execute(
+                select(func.coalesce(func.sum(Batch.row_count), 0), func.count(Batch.id)).where(*batch_filters)
+            ).one()
+            # Users and markets are returned, not counted: shards are merged by set union
+            users = db.session.execute(select(Batch.user_id).where(*batch_filters).distinct()).scalars().all()
+            markets = db.session.execute(select(Batch.market_name).where(*batch_filters).distinct()).scalars().all()
+            counts = db.session.execute(
+                select(MetricRollup.category, *[func.sum(getattr(MetricRollup, name)) for name in COUNT_COLUMNS])
+                .where(*metric_filters)
+                .group_by(MetricRollup.category)
+            ).all()
+            return total_records, unique_batches, users, markets, counts
+
+        try:
+            parts = read_shards(market_name, read)
+            totals = {category: [0] * 12 for category in CATEGORIES}
+            for _, _, _, _, counts in parts:
+                for category, *values in counts:
+                    totals[category] = [total + (value or 0) for total, value in zip(totals[category], values)]
+            for category, values in totals.items():
+                monthly_stats[CATEGORIES[category][1]] = {month: count for month, count in zip(MONTHS, values) if count}
+
+            return {
+                'totalRecords': sum(part[0] for part in parts),
+                'uniqueBatches': sum(part[1] for part in parts),
+                'uniqueUsers': len({user for part in parts for user in part[2]}),
+                'uniqueMarkets': len({market for part in parts for market in part[3]}),
+                'monthlyStats': monthly_stats
+            }
+
+        except Exception as e:
+            logger.error(f"Failed to read rollup statistics: {e}", exc_info=True)
+            return empty
+
+    def get_totals(self, market_name: Optional[str] = None, data_month: Optional[str] = None,
+                   metric_name: Optional[str] = None, period_from: Optional[int] = None,
+                   period_to: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Monthly totals per market, data month and metric (summed over units), by category"""
+        if not self._valid_periods(period_from, period_to):
+            return []
+
+        try:
+            filters = self._filters(MetricRollup, market_name, data_month, period_from, period_to)
+            if metric_name:
+                filters.append(MetricRollup.metric_name == metric_name)
+
+            statement = (
+                select(MetricRollup.market_name, MetricRollup.data_month, MetricRollup.metric_name,
+                       MetricRollup.category,
+                       *[func.sum(getattr(MetricRollup, name)) for name in SUM_COLUMNS + COUNT_COLUMNS])
+                .where(*filters)
+                .group_by(MetricRollup.market_name, MetricRollup.period_key, MetricRollup.data_month,
+                          MetricRollup.metric_name, MetricRollup.category)
+                .order_by(MetricRollup.market_name, MetricRollup.period_key.desc(), MetricRollup.metric_name)
+            )
+            parts = read_shards(market_name, lambda: db.session.execute(statement).all())
+            # A market lives in one database, so ordering the shards by market keeps the query order
+            rows = sorted((row for part in parts for row in part), key=lambda row: row[0])
+
+            totals: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+            for market, month_name, metric, category, *values in rows:
+                record = totals.setdefault((market, month_name, metric), {
+                    'market': market, 'dataMonth': month_name, 'metricName': metric,
+                    **{display: {} for _, display in CATEGORIES.values()}
+                })
+                sums, counts = values[:12], values[12:]
+                record[CATEGORIES[category][1]] = {month: total for month, total, count
+                                                   in zip(MONTHS, sums, counts) if count}
+            return list(totals.values())
+
+        except Exception as e:
+            logger.error(f"Failed to read rollup totals: {e}", exc_info=True)
+            return []
+
+    def _valid_periods(self, period_from: Optional[int], period_to: Optional[int]) -> bool:
+        for bound in (period_from, period_to):
+            if bound is not None and not is_period_key(bound):
+                logger.warning(f"Invalid period key parameter: {bound}")
+                return False
+        return True
+
+    def _filters(self, model, market_name: Optional[str], data_month: Optional[str],
+                 period_from: Optional[int], period_to: Optional[int]) -> List[Any]:
+        filters = []
+        if market_name:
+            filters.append(model.market_name == market_name)
+        if data_month:
+            filters.append(model.data_month == data_month)
+        if period_from is not None:
+            filters.append(model.period_key >= period_from)
+        if period_to is not None:
+            filters.append(model.period_key <= period_to)
+        return filters
+
+
+# Global instance
+rollup_service = RollupService()
@@ -0,0 +1,148 @@
+"""
+Upload Archiver - recompresses old uploads into the xz archive tier
+
+Content whose newest upload is older than ARCHIVE_AFTER_DAYS is compressed
+with xz; the raw blob and its per-batch links are then removed and
+UploadStore.open() decompresses the archive on the fly. Content that does
+not shrink enough is left raw and marked so it is not retried.
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, NamedTuple, Optional
+from sqlalchemy import func
+from app.models import db, UploadedFile
+from app.services.file_lock import FileLock
+from app.services.upload_store import UploadStore
+
+logger = logging.getLogger(__name__)
+
+
+class ArchiveReport(NamedTuple):
+    """Outcome of one archive run"""
+    files: int  # distinct contents compressed
+    skipped: int  # contents left raw because compression did not pay off
+    bytes_before: int
+    bytes_after: int
+    seconds: float
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_before - self.bytes_after
+
+    def __str__(self):
+        ratio = (self.bytes_saved / self.bytes_before * 100) if self.bytes_before else 0.0
+        return (f"archived {self.files} files ({self.skipped} left raw): "
+                f"{self.bytes_before} -> {self.bytes_after} bytes, saved {self.bytes_saved} bytes "
+                f"({ratio:.1f}%) in {self.seconds:.2f}s")
+
+
+class UploadArchiver:
+    """Compression of aged uploads"""
+
+    LOCK_NAME = '.archive.lock'
+    MIN_SAVING = 0.05  # keep content raw unless xz saves at least 5%
+
+    def __init__(self, app, upload_store: UploadStore, after_days: int, preset: int = 6):
+        self.app = app
+        self.upload_store = upload_store
+        self.after_days = after_days
+        self.preset = preset
+        self.lock = FileLock(os.path.join(upload_store.upload_folder, self.LOCK_NAME))
+
+    def candidates(self) -> Dict[str, int]:
+        """Content hashes (with raw size) whose every upload is older than the cutoff and not yet archived"""
+        cutoff = datetime.now() - timedelta(days=self.after_days)
+        rows = db.session.query(UploadedFile.content_hash, func.max(UploadedFile.file_size)) \
+            .group_by(UploadedFile.content_hash) \
+            .having(func.max(UploadedFile.upload_time) < cutoff) \
+            .having(func.count(UploadedFile.compression) < func.count(UploadedFile.id)) \
+            .all()
+        return dict(rows)
+
+    def run(self) -> Optional[ArchiveReport]:
+        """Archive all candidates; returns None if another process is already archiving"""
+        if not self.lock.acquire():
+            logger.info("Upload archiving already running elsewhere, skipping")
+            return None
+
+        started = time.perf_counter()
+        files = skipped = bytes_before = bytes_after = 0
+        try:
+            with self.app.app_context():
+                for content_hash, raw_size in self.candidates().items():
+                    try:
+                        compression, stored_size = self.archive_content(content_hash)
+                    except Exception as e:
+                        db.session.rollback()
+                        logger.error(f"Failed to archive upload content {content_hash}: {e}", exc_info=True)
+                        continue
+                    finally:
+                        self.lock.refresh()
+
+                    if compression == UploadedFile.COMPRESSION_XZ:
+                        files += 1
+                        bytes_before += raw_size
+                        bytes_after += stored_size
+                    else:
+                        skipped += 1
+        finally:
+            self.lock.release()
+
+        report = ArchiveReport(files, skipped, bytes_before, bytes_after, time.perf_counter() - started)
+        logger.info(f"Upload archive run: {report}")
+        return report
+
+    def archive_content(self, content_hash: str):
+        """Compress one content blob and update its catalog records; returns (compression, stored size)"""
+        records = UploadedFile.query.filter(UploadedFile.content_hash == content_hash).all()
+        raw_path = self.upload_store.blob_path(content_hash)
+
+        if not os.path.isfile(raw_path):
+            if not os.path.isfile(self.upload_store.compressed_blob_path(content_hash)):
+                raise FileNotFoundError(f"No stored content for {content_hash}")
+            # Already archived by an earlier run that stopped before updating the catalog
+            compression = UploadedFile.COMPRESSION_XZ
+            stored_size = os.path.getsize(self.upload_store.compressed_blob_path(content_hash))
+        else:
+            raw_size = os.path.getsize(raw_path)
+            stored_size = self.upload_store.compress_blob(content_hash, self.preset)
+            if stored_size <= raw_size * (1 - self.MIN_SAVING):
+                compression = UploadedFile.COMPRESSION_XZ
+                self.upload_store.archive(content_hash, [record.stored_path for record in records])
+            else:
+                compression = UploadedFile.COMPRESSION_NONE
+                self.upload_store.discard_archive(content_hash)
+                stored_size = raw_size
+
+        for record in records:
+            record.compression = compression
+        db.session.commit()
+        return compression, stored_size
+
+    def start(self, interval_seconds: int) -> threading.Thread:
+        """Run the archiver periodically in a daemon thread"""
+        def loop():
+            while True:
+                try:
+                    self.run()
+                except Exception as e:
+                    logger.error(f"Upload archive run failed: {e}", exc_info=True)
+                time.sleep(interval_seconds)
+
+        thread = threading.Thread(target=loop, name='upload-archiver', daemon=True)
+        thread.start()
+        return thread
+
+
+def start_upload_archiving(app) -> Optional[threading.Thread]:
+    """Start periodic archiving of old uploads if enabled"""
+    after_days = app.config.get('ARCHIVE_AFTER_DAYS', 0)
+    if not after_days:
+        return None
+    archiver = UploadArchiver(app, app.extensions['upload_store'], after_days,
+                              app.config.get('ARCHIVE_COMPRESSION_PRESET', 6))
+    return archiver.start(app.config.get('ARCHIVE_INTERVAL_HOURS', 24) * 3600)
@@ -0,0 +1,138 @@
+"""
+Upload Migrator - moves flat {batch_id}_{filename} uploads into the sharded storage layout
+
+Each file is moved and cataloged on its own, so an interrupted run simply
+continues where it stopped the next time. A lock file in the storage root
+keeps concurrent workers from migrating at the same time.
+"""
+
+import logging
+import os
+import threading
+from typing import Iterator, List, Optional, Tuple
+from app.models import db, ExcelData, UploadedFile
+from app.sharding import using_batch_shard
+from app.services.file_lock import FileLock
+from app.services.upload_store import UploadStore
+from app.services.uploaded_file_service import uploaded_file_service
+
+logger = logging.getLogger(__name__)
+
+class UploadMigrator:
+    """Background migration of legacy uploads into an UploadStore"""
+
+    LOCK_NAME = '.migration.lock'
+    STALE_LOCK_SECONDS = 600  # a lock not refreshed for this long belongs to a dead run
+
+    def __init__(self, app, upload_store: UploadStore, source_folders: List[str]):
+        self.app = app
+        self.upload_store = upload_store
+        self.source_folders = list(dict.fromkeys(os.path.abspath(folder) for folder in source_folders))
+        self.lock = FileLock(os.path.join(upload_store.upload_folder, self.LOCK_NAME), self.STALE_LOCK_SECONDS)
+
+    def pending_files(self) -> Iterator[Tuple[str, str]]:
+        """Yield (folder, filename) for every flat upload still waiting to be migrated"""
+        for folder in self.source_folders:
+            if not os.path.isdir(folder):
+                continue
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if entry.is_file() and not entry.name.startswith('.') and self._parse_name(entry.name):
+                        yield folder, entry.name
+
+    def run(self) -> int:
+        """Migrate all pending files; returns the number moved (0 if another run holds the lock)"""
+        if not self.lock.acquire():
+            logger.info("Upload migration already running elsewhere, skipping")
+            return 0
+
+        migrated = 0
+        try:
+            with self.app.app_context():
+                for folder, filename in list(self.pending_files()):
+                    try:
+                        self.migrate_file(folder, filename)
+                        migrated += 1
+                    except Exception as e:
+                        db.session.rollback()
+                        logger.error(f"Failed to migrate upload {filename}: {e}", exc_info=True)
+                    self.lock.refresh()
+
+            self._remove_orphaned_legacy_blobs()
+            logger.info(f"Upload migration finished: {migrated} files moved")
+            return migrated
+        finally:
+            self.lock.release()
+
+    def start(self) -> threading.Thread:
+        """Run the migration in a daemon thread"""
+        thread = threading.Thread(target=self.run, name='upload-migrator', daemon=True)
+        thread.start()
+        return thread
+
+    def migrate_file(self, folder: str, filename: str) -> str:
+        """Move one flat upload into the sharded layout and point its catalog record at it"""
+        batch_id, original_filename = self._parse_name(filename)
+        source = os.path.join(folder, filename)
+
+        with open(source, 'rb') as f:
+            blob = self.upload_store.put(f)
+
+        record = UploadedFile.query.filter(UploadedFile.batch_id == batch_id).first()
+        market, data_month = (record.market_name, record.data_month) if record else batch_id.split('_')[:2]
+        stored_path = self.upload_store.batch_path(market, data_month, batch_id, original_filename)
+        self.upload_store.link(blob, stored_path)
+
+        if record:
+            record.stored_path = stored_path
+            db.session.commit()
+        else:
+            with using_batch_shard(batch_id):
+                sample = ExcelData.query.filter(ExcelData.batch_id == batch_id).first()
+            uploaded_file_service.record_upload(
+                batch_id=batch_id,
+                market_name=market,
+                data_month=data_month,
+                original_filename=original_filename,
+                stored_path=stored_path,
+                content_hash=blob.content_hash,
+                file_size=blob.size,
+                user_id=sample.user_id if sample else 'unknown',
+                status=UploadedFile.STATUS_PROCESSED if sample else UploadedFile.STATUS_FAILED,
+                upload_time=sample.upload_timestamp if sample else None
+            )
+
+        os.unlink(source)
+        logger.info(f"Migrated upload {filename} -> {stored_path}")
+        return stored_path
+
+    def _parse_name(self, filename: str) -> Optional[Tuple[str, str]]:
+        """Split {market}_{data_month}_{yyyymmdd}_{hhmmss}_{uuid8}_{filename} into batch ID and filename"""
+        parts = filename.split('_')
+        if len(parts) < 6 or not (parts[2].isdigit() and parts[3].isdigit()):
+            return None
+        return '_'.join(parts[:5]), '_'.join(parts[5:])
+
+    def _remove_orphaned_legacy_blobs(self) -> None:
+        """Drop blobs in legacy folders that no batch file links to any more"""
+        for folder in self.source_folders:
+            blob_folder = os.path.join(folder, 'blobs')
+            if folder == self.upload_store.upload_folder or not os.path.isdir(blob_folder):
+                continue
+            for root, _, files in os.walk(blob_folder):
+                for name in files:
+                    path = os.path.join(root, name)
+                    if os.stat(path).st_nlink <= 1:
+                        os.unlink(path)
+
+
+def start_upload_migration(app) -> Optional[threading.Thread]:
+    """Start migrating legacy uploads in the background if there is anything to move"""
+    migrator = UploadMigrator(
+        app,
+        app.extensions['upload_store'],
+        [app.config.get('LEGACY_UPLOAD_FOLDER', 'app/static/uploads'), app.config['UPLOAD_FOLDER']]
+    )
+    if next(migrator.pending_files(), None) is None:
+        return None
+    return migrator.start()
@@ -0,0 +1,210 @@
+"""
+Upload Store - storage backend for uploaded workbooks
+
+Layout under the storage root (UPLOAD_FOLDER, outside the static folder):
+    blobs/ab/abcdef...                 content, kept once per distinct SHA-256
+    blobs/ab/abcdef....xz              archived content, replacing the raw blob and its links
+    SG/2025-04/{batch_id}_{filename}   per-batch file, a hard link to its blob
+"""
+
+import hashlib
+import logging
+import lzma
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+from typing import BinaryIO, Iterator, NamedTuple, Optional
+from flask import current_app
+from werkzeug.utils import secure_filename
+from app.services.file_lock import FileLock
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+BLOB_LOCK_TIMEOUT = 30  # seconds to wait for a blob another process is linking or archiving
+
+
+class StoredBlob(NamedTuple):
+    """A file kept in the upload store"""
+    content_hash: str
+    path: str
+    size: int
+    created: bool  # False when identical content was already stored
+
+
+class UploadStore:
+    """Content-addressed, market/month sharded upload storage"""
+
+    def __init__(self, upload_folder: str):
+        self.upload_folder = os.path.abspath(upload_folder)
+        self.blob_folder = os.path.join(self.upload_folder, 'blobs')
+
+    def blob_path(self, content_hash: str) -> str:
+        """Path of the blob for a content hash (fanned out by the first two hex digits)"""
+        return os.path.join(self.blob_folder, content_hash[:2], content_hash)
+
+    def put(self, stream: BinaryIO) -> StoredBlob:
+        """Store a stream, hashing it while it is written; identical content is kept only once"""
+        os.makedirs(self.blob_folder, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+
+        fd, temp_path = tempfile.mkstemp(dir=self.blob_folder, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                    digest.update(chunk)
+                    temp_file.write(chunk)
+                    size += len(chunk)
+
+            content_hash = digest.hexdigest()
+            path = self.blob_path(content_hash)
+            if os.path.exists(path):
+                os.unlink(temp_path)
+                logger.info(f"Upload content already stored: {content_hash}")
+                return StoredBlob(content_hash, path, size, False)
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(temp_path, path)
+            logger.info(f"Stored new upload blob {content_hash} ({size} bytes)")
+            return StoredBlob(content_hash, path, size, True)
+
+        except Exception:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+    def batch_path(self, market: str, data_month: str, batch_id: str, filename: str) -> str:
+        """Storage path of a batch's file, relative to the storage root: {market}/{yyyy-mm}/{batch_id}_{filename}"""
+        try:
+            month_folder = datetime.strptime(data_month, '%Y-%b').strftime('%Y-%m')
+        except ValueError:
+            month_folder = secure_filename(data_month) or 'unknown'
+        return '/'.join([secure_filename(market) or 'unknown', month_folder, f"{batch_id}_{filename}"])
+
+    def resolve(self, stored_path: str) -> str:
+        """Absolute path of a stored file; refuses paths outside the storage root"""
+        path = os.path.abspath(os.path.join(self.upload_folder, *stored_path.split('/')))
+        if os.path.commonpath([self.upload_folder, path]) != self.upload_folder:
+            raise ValueError(f"Path outside upload storage: {stored_path}")
+        return path
+
+    def exists(self, stored_path: str) -> bool:
+        """Check if a stored file exists"""
+        try:
+            return os.path.isfile(self.resolve(stored_path))
+        except ValueError:
+            return False
+
+    @contextmanager
+    def locked(self, content_hash: str) -> Iterator[None]:
+        """Hold the lock of a content's blob: linking to it and archiving it away exclude each other"""
+        lock = FileLock(f"{self.blob_path(content_hash)}.lock", stale_seconds=BLOB_LOCK_TIMEOUT * 2)
+        if not lock.acquire(timeout=BLOB_LOCK_TIMEOUT):
+            raise TimeoutError(f"Upload blob {content_hash} is locked")
+        try:
+            yield
+        finally:
+            lock.release()
+
+    def link(self, blob: StoredBlob, stored_path: str) -> str:
+        """
+        Expose a blob under a per-batch storage path.
+        A hard link costs no extra disk space; filesystems without hard links get a copy.
+        """
+        link_path = self.resolve(stored_path)
+        os.makedirs(os.path.dirname(link_path), exist_ok=True)
+        with self.locked(blob.content_hash):
+            if os.path.exists(link_path):
+                return link_path
+            if not os.path.isfile(blob.path):
+                # Archived since put() found it: the batch gets a decompressed copy
+                with lzma.open(self.compressed_blob_path(blob.content_hash), 'rb') as source, \
+                        open(link_path, 'wb') as target:
+                    shutil.copyfileobj(source, target, CHUNK_SIZE)
+                return link_path
+            try:
+                os.link(blob.path, link_path)
+            except OSError:
+                shutil.copyfile(blob.path, link_path)
+        return link_path
+
+    def compressed_blob_path(self, content_hash: str) -> str:
+        """Path of the archived (xz) blob for a content hash"""
+        return f"{self.blob_path(content_hash)}.xz"
+
+    def raw_path(self, stored_path: str, content_hash: str) -> Optional[str]:
+        """Absolute path of an uncompressed copy of a stored file, or None if it is only archived"""
+        for path in (self.resolve(stored_path), self.blob_path(content_hash)):
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def open(self, stored_path: str, content_hash: str) -> BinaryIO:
+        """Open a stored file for reading, decompressing archived content on the fly"""
+        path = self.raw_path(stored_path, content_hash)
+        if path:
+            return open(path, 'rb')
+        return lzma.open(self.compressed_blob_path(content_hash), 'rb')
+
+    def is_available(self, stored_path: str, content_hash: str) -> bool:
+        """Check if a stored file can be read, raw or archived"""
+        return (self.exists(stored_path)
+                or os.path.isfile(self.blob_path(content_hash))
+                or os.path.isfile(self.compressed_blob_path(content_hash)))
+
+    def compress_blob(self, content_hash: str, preset: int = 6) -> int:
+        """
+        Write the xz archive of a raw blob (if not already there) and return its size.
+        The raw blob and its links are left in place; see archive().
+        """
+        target = self.compressed_blob_path(content_hash)
+        if os.path.isfile(target):
+            return os.path.getsize(target)
+
+        temp_path = f"{target}.part"
+        try:
+            with open(self.blob_path(content_hash), 'rb') as source, \
+                    lzma.open(temp_path, 'wb', preset=preset) as compressed:
+                shutil.copyfileobj(source, compressed, CHUNK_SIZE)
+            os.replace(temp_path, target)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        return os.path.getsize(target)
+
+    def archive(self, content_hash: str, stored_paths) -> None:
+        """Drop the raw blob and the given per-batch links once the xz archive exists"""
+        # Under the blob's lock, so an upload that found the raw blob in put() is not left without it
+        with self.locked(content_hash):
+            if not os.path.isfile(self.compressed_blob_path(content_hash)):
+                raise FileNotFoundError(f"No archive for {content_hash}")
+            for stored_path in stored_paths:
+                try:
+                    os.unlink(self.resolve(stored_path))
+                except FileNotFoundError:
+                    pass
+            try:
+                os.unlink(self.blob_path(content_hash))
+            except FileNotFoundError:
+                pass
+
+    def discard_archive(self, content_hash: str) -> None:
+        """Remove an xz archive that turned out not to save space"""
+        try:
+            os.unlink(self.compressed_blob_path(content_hash))
+        except FileNotFoundError:
+            pass
+
+
+def init_upload_store(app) -> None:
+    """Attach the upload storage backend to the app"""
+    app.extensions['upload_store'] = UploadStore(app.config['UPLOAD_FOLDER'])
+
+
+def get_upload_store() -> UploadStore:
+    """Upload storage backend of the current app"""
+    return current_app.extensions['upload_store']
@@ -0,0 +1,98 @@
+"""
+Uploaded File Service - upload catalog and duplicate detection
+"""
+
+import logging
+from datetime import datetime
+from typing import List, Optional, Tuple
+from app.models import db, UploadedFile
+
+logger = logging.getLogger(__name__)
+
+class UploadedFileService:
+    """Upload catalog management service"""
+
+    def find_duplicate(self, market_name: str, data_month: str, content_hash: str) -> Optional[UploadedFile]:
+        """Find the earliest processed batch built from identical content for the same market and month"""
+        try:
+            return UploadedFile.query.filter(
+                UploadedFile.content_hash == content_hash,
+                UploadedFile.market_name == market_name,
+                UploadedFile.data_month == data_month,
+                UploadedFile.status == UploadedFile.STATUS_PROCESSED
+            ).order_by(UploadedFile.upload_time).first()
+        except Exception as e:
+            logger.warning(f"Failed to look up duplicate upload {content_hash}: {e}")
+            return None
+
+    def record_upload(self, batch_id: str, market_name: str, data_month: str,
+                      original_filename: str, stored_path: str, content_hash: str,
+                      file_size: int, user_id: str, status: str = UploadedFile.STATUS_UPLOADED,
+                      upload_time: Optional[datetime] = None) -> UploadedFile:
+        """Add a stored upload to the catalog"""
+        try:
+            uploaded_file = UploadedFile(
+                batch_id=batch_id,
+                market_name=market_name,
+                data_month=data_month,
+                original_filename=original_filename,
+                stored_path=stored_path,
+                content_hash=content_hash,
+                file_size=file_size,
+                user_id=user_id,
+                status=status,
+                upload_time=upload_time
+            )
+            db.session.add(uploaded_file)
+            db.session.commit()
+
+            logger.info(f"Recorded upload {batch_id} -> {content_hash}")
+            return uploaded_file
+
+        except Exception as e:
+            logger.error(f"Failed to record upload {batch_id}: {e}", exc_info=True)
+            db.session.rollback()
+            raise
+
+    def update_status(self, batch_id: str, status: str) -> None:
+        """Update the processing status of a cataloged upload"""
+        try:
+            UploadedFile.query.filter(UploadedFile.batch_id == batch_id).update({'status': status})
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"Failed to update status of upload {batch_id}: {e}", exc_info=True)
+            db.session.rollback()
+
+    def get_by_batch_id(self, batch_id: str) -> Optional[UploadedFile]:
+        """Get the catalog record of a batch's upload"""
+        try:
+            return UploadedFile.query.filter(UploadedFile.batch_id == batch_id).first()
+        except Exception as e:
+            logger.warning(f"Failed to get upload for batch {batch_id}: {e}")
+            return None
+
+    def search(self, market_name: Optional[str] = None, data_month: Optional[str] = None,
+               batch_id: Optional[str] = None, page: int = 1,
+               per_page: int = 50) -> Tuple[List[UploadedFile], int]:
+        """Search the catalog, newest first; returns one page of records and the total match count"""
+        try:
+            query = UploadedFile.query
+            if market_name:
+                query = query.filter(UploadedFile.market_name == market_name)
+            if data_month:
+                query = query.filter(UploadedFile.data_month == data_month)
+            if batch_id:
+                query = query.filter(UploadedFile.batch_id.contains(batch_id))
+
+            total = query.count()
+            items = query.order_by(UploadedFile.upload_time.desc()) \
+                .offset((max(page, 1) - 1) * per_page).limit(per_page).all()
+            return items, total
+
+        except Exception as e:
+            logger.error(f"Failed to search upload catalog: {e}", exc_info=True)
+            return [], 0
+
+
+# Global instance
+uploaded_file_service = UploadedFileService()
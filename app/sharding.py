@@ -0,0 +1,272 @@
+"""
+Optional per-market database sharding for GCDM Auto application
+
+With DB_SHARDING on, every market in DB_SHARD_MARKETS (default: the
+configured markets) keeps its excel_data, batch and metric_rollup rows in a
+database of its own, so month-end uploads of different markets no longer
+queue on one SQLite writer lock. Each shard has its own engine (same pool
+settings and pragmas as the main one); DB_SHARD_URI (e.g.
+'sqlite:///data/gcdm_{market}.db') places them, by default next to the main
+database as gcdmauto_<market>.db. Data periods, uploaded files, version
+counters and rows of markets without a shard stay in the main database;
+a shard write bumps the Excel data version in a short main-database
+transaction of its own after the shard commit, so uploads of different
+markets never hold the main database's write lock during their own.
+
+Services choose a shard with `with using_shard(market):`, which
+ShardedSession.get_bind applies to the sharded tables. Cross-market reads
+call fan_out(), which runs a read once per database in parallel threads
+and returns the per-database results for the caller to merge
+(DB_SHARD_WORKERS = 0 runs them in turn on the calling thread); maintenance
+that loads rows of every shard uses each_shard(). Either way every database
+is read in an app context and session of its own: shards number their rows
+independently, so objects of two shards must never share an identity map.
+With sharding off, all of them simply use the main database.
+
+Existing rows are moved from the main database into the shards with:
+    flask --app app shard-data
+"""
+
+import atexit
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar
+import sqlalchemy as sa
+from flask import current_app, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql.util import find_tables
+from app.read_only import get_read_only_engine, is_read_only
+
+logger = logging.getLogger(__name__)
+
+# Market-partitioned tables, in foreign key order
+SHARDED_TABLES = ('batch', 'excel_data', 'metric_rollup')
+
+# Shard key of the main database
+MAIN = None
+
+T = TypeVar('T')
+
+_current_shard: ContextVar[Optional[str]] = ContextVar('current_shard', default=MAIN)
+
+
+def shard_uri(config, market: str) -> str:
+    """Database URI of a market's shard"""
+    template = config.get('DB_SHARD_URI')
+    if template:
+        return template.format(market=market, market_lower=market.lower())
+
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        raise ValueError("DB_SHARD_URI must be set to shard a database that is not a SQLite file")
+    stem, extension = os.path.splitext(url.database)
+    return url.set(database=f"{stem}_{market.lower()}{extension}").render_as_string(hide_password=False)
+
+
+class ShardedSession(Session):
+    """Session that sends statements on the sharded tables to the shard chosen with using_shard(),
+    and the SELECTs of read-only routes to the read-only engines"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            shard = _current_shard.get()
+            if shard is not MAIN and not _touches_sharded_table(mapper, clause):
+                shard = MAIN
+            # SELECTs of read-only routes go to the database's read-only engine, if it has one
+            if is_read_only() and getattr(clause, 'is_select', False):
+                engine = get_read_only_engine(shard)
+                if engine is not None:
+                    return engine
+            if shard is not MAIN:
+                return get_shard_router().engines[shard]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _touches_sharded_table(mapper, clause) -> bool:
+    if mapper is not None:
+        return sa.inspect(mapper).local_table.name in SHARDED_TABLES
+    if clause is not None:
+        return any(getattr(table, 'name', None) in SHARDED_TABLES
+                   for table in find_tables(clause, include_crud=True))
+    return False
+
+
+class ShardRouter:
+    """Shard resolution, table setup and parallel fan-out over the shard databases"""
+
+    def __init__(self, app, engines: Dict[str, sa.engine.Engine], workers: int):
+        self.app = app
+        self.engines = engines
+        self.markets: Tuple[str, ...] = tuple(engines)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='shard') if workers else None
+
+    def shard_for(self, market: Optional[str]) -> Optional[str]:
+        """Shard key of a market: the market itself when it has a shard, else MAIN"""
+        return market if market in self.markets else MAIN
+
+    def shard_for_batch(self, batch_id: Optional[str]) -> Optional[str]:
+        """Shard key of a batch; batch IDs start with their market (SG_2025-Apr_...)"""
+        return self.shard_for(batch_id.split('_', 1)[0]) if batch_id else MAIN
+
+    def shards(self) -> Tuple[Optional[str], ...]:
+        return (MAIN,) + self.markets
+
+    def engine(self, shard: Optional[str]) -> sa.engine.Engine:
+        from app.models import db
+        return db.engine if shard is MAIN else self.engines[shard]
+
+    def create_tables(self) -> None:
+        """Create the sharded tables in every shard database"""
+        from app.models import db
+        tables = [db.metadata.tables[name] for name in SHARDED_TABLES]
+        for market in self.markets:
+            db.metadata.create_all(self.engine(market), tables=tables)
+
+    def fan_out(self, read: Callable[[], T]) -> List[T]:
+        """Results of read() run against every database, main database first: in parallel, or in turn without workers"""
+        if self.executor is None:
+            return self.in_turn(read)
+
+        # Each task runs in a copy of the caller's context, so read-only routing carries over
+        futures = [self.executor.submit(copy_context().run, self._run_in, shard, read) for shard in self.shards()]
+        return [future.result() for future in futures]
+
+    def in_turn(self, work: Callable[[], T]) -> List[T]:
+        """Results of work() run against every database in turn on the calling thread, main database first"""
+        return [self._run_in(shard, work) for shard in self.shards()]
+
+    def close(self) -> None:
+        """Stop the fan-out threads and close the shard databases' pooled connections"""
+        if self.executor is not None:
+            self.executor.shutdown()
+        for engine in self.engines.values():
+            engine.dispose()
+
+    def _run_in(self, shard: Optional[str], read: Callable[[], T]) -> T:
+        # Own app context, so own session: shards number their rows independently, and
+        # objects of different shards must not share one identity map
+        with self.app.app_context():
+            token = _current_shard.set(shard)
+            try:
+                return read()
+            finally:
+                _current_shard.reset(token)
+
+    def move_to_shards(self, batch_size: int = 1000) -> Dict[str, int]:
+        """
+        Move the Excel data and batch manifests of sharded markets from the main database into
+        their shards, with new keys; returns the rows moved per market. The moved markets' rollup
+        rows are dropped: rebuild the rollups afterwards.
+        """
+        from app.models import db
+        batch, excel_data, metric_rollup = (db.metadata.tables[name] for name in SHARDED_TABLES)
+        moved: Dict[str, int] = {}
+        for market in self.markets:
+            count = 0
+            with self.engine(MAIN).begin() as source, self.engine(market).begin() as target:
+                # Manifests get new IDs in the shard; rows follow through the old -> new mapping
+                batch_refs: Dict[int, int] = {}
+                for row in source.execute(sa.select(batch).where(batch.c.market_name == market)).mappings():
+                    values = {key: value for key, value in row.items() if key != 'id'}
+                    batch_refs[row['id']] = target.execute(sa.insert(batch), values).inserted_primary_key[0]
+
+                result = source.execute(sa.select(excel_data).where(excel_data.c.market_name == market)
+                                        .execution_options(yield_per=batch_size))
+                for rows in result.mappings().partitions():
+                    target.execute(sa.insert(excel_data), [
+                        {**{key: value for key, value in row.items() if key != 'id'},
+                         'batch_ref': batch_refs.get(row['batch_ref'])} for row in rows])
+                    count += len(rows)
+
+                # Children before the manifests they reference
+                for table in (metric_rollup, excel_data, batch):
+                    source.execute(sa.delete(table).where(table.c.market_name == market))
+            moved[market] = count
+            logger.info(f"Moved {count} rows of {market} into its shard")
+        return moved
+
+
+def get_shard_router() -> Optional[ShardRouter]:
+    """The app's shard router, or None when sharding is off"""
+    return current_app.extensions.get('shard_router') if has_app_context() else None
+
+
+@contextmanager
+def using_shard(market: Optional[str]) -> Iterator[None]:
+    """Route the sharded tables to the shard of a market (the main database when it has none)"""
+    router = get_shard_router()
+    token = _current_shard.set(router.shard_for(market) if router else MAIN)
+    try:
+        yield
+    finally:
+        _current_shard.reset(token)
+
+
+def in_market_shard() -> bool:
+    """Check whether the sharded tables of the current block go to a market shard rather than the main database"""
+    return _current_shard.get() is not MAIN
+
+
+@contextmanager
+def using_batch_shard(batch_id: Optional[str]) -> Iterator[None]:
+    """Route the sharded tables to the shard holding a batch"""
+    router = get_shard_router()
+    token = _current_shard.set(router.shard_for_batch(batch_id) if router else MAIN)
+    try:
+        yield
+    finally:
+        _current_shard.reset(token)
+
+
+def shard_keys() -> Tuple[Optional[str], ...]:
+    """Keys of all databases holding sharded tables, main database first"""
+    router = get_shard_router()
+    return router.shards() if router else (MAIN,)
+
+
+def fan_out(read: Callable[[], T]) -> List[T]:
+    """Per-database results of read(): one per shard in parallel, or just the main database's"""
+    router = get_shard_router()
+    return router.fan_out(read) if router else [read()]
+
+
+def each_shard(work: Callable[[], T]) -> List[T]:
+    """Per-database results of work(), run in turn, each database in a session of its own"""
+    router = get_shard_router()
+    return router.in_turn(work) if router else [work()]
+
+
+def read_shards(market: Optional[str], read: Callable[[], T]) -> List[T]:
+    """Per-database results of read(): from the market's shard, or from all of them without a market"""
+    if market:
+        with using_shard(market):
+            return [read()]
+    return fan_out(read)
+
+
+def init_sharding(app) -> None:
+    """Create an engine per market shard when DB_SHARDING is on"""
+    if not app.config.get('DB_SHARDING'):
+        return
+
+    from app.database import build_engine_options, register_sqlite_pragmas
+    from app.services.market_config_loader import market_config_loader
+
+    markets = app.config.get('DB_SHARD_MARKETS') or market_config_loader.get_available_markets()
+    engines = {}
+    for market in markets:
+        uri = shard_uri(app.config, market)
+        options = build_engine_options({**app.config, 'SQLALCHEMY_DATABASE_URI': uri,
+                                        'SQLALCHEMY_ENGINE_OPTIONS': None})
+        engines[market] = sa.create_engine(uri, **options)
+        register_sqlite_pragmas(engines[market], app.config.get('SQLITE_PRAGMAS', {}))
+
+    workers = app.config.get('DB_SHARD_WORKERS')
+    workers = len(markets) + 1 if workers is None else workers
+    router = app.extensions['shard_router'] = ShardRouter(app, engines, workers)
+    atexit.register(router.close)
+    logger.info(f"Sharding {', '.join(SHARDED_TABLES)} across {len(markets)} market databases")
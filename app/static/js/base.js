@@ -0,0 +1,53 @@
+// Highlight active menu item based on current URL
+document.addEventListener('DOMContentLoaded', function() {
+    const currentPath = window.location.pathname;
+    const navLinks = document.querySelectorAll('.nav-link-custom');
+    const dropdownItems = document.querySelectorAll('.dropdown-item');
+
+    // Handle main navigation links
+    navLinks.forEach(link => {
+        if (!link.classList.contains('dropdown-toggle')) {
+            const linkPath = new URL(link.href).pathname;
+
+            // Check if current path matches or starts with the link path
+            if (currentPath === linkPath ||
+                (linkPath !== '/' && currentPath.startsWith(linkPath))) {
+                link.classList.add('active');
+            }
+
+            // Special handling for root path
+            if (currentPath === '/' && linkPath.includes('/excel/upload')) {
+                link.classList.add('active');
+            }
+        }
+    });
+
+    // Handle dropdown items
+    dropdownItems.forEach(item => {
+        const itemPath = new URL(item.href).pathname;
+
+        if (currentPath === itemPath ||
+            (itemPath !== '/' && currentPath.startsWith(itemPath))) {
+            item.classList.add('active');
+            // Also highlight the parent dropdown
+            const dropdown = item.closest('.dropdown');
+            if (dropdown) {
+                const dropdownToggle = dropdown.querySelector('.dropdown-toggle');
+                if (dropdownToggle) {
+                    dropdownToggle.classList.add('active');
+                }
+            }
+        }
+    });
+});
+
+// Add smooth scrolling and visual feedback
+document.querySelectorAll('.nav-link-custom').forEach(link => {
+    link.addEventListener('click', function(e) {
+        // Add a subtle loading effect
+        this.style.transform = 'scale(0.95)';
+        setTimeout(() => {
+            this.style.transform = '';
+        }, 150);
+    });
+});
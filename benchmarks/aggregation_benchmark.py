@@ -0,0 +1,112 @@
+"""
+Aggregation benchmark: display dicts vs. compact records for View All Market Results
+
+Inserts --rows rows, then reads them for the dashboard and /api/data the
+previous way (ORM objects turned into a dict with three nested month dicts
+per row) and through get_aggregated_data_by_filters (one __slots__ record
+with a 36-slot values tuple per row). Each path is timed for the dashboard
+(read and statistics) and for /api/data (plus JSON encoding), and its peak
+memory is traced with tracemalloc.
+
+Usage:
+    python -m benchmarks.aggregation_benchmark [--rows 50000] [--repeat 3]
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+
+from flask import current_app
+from sqlalchemy import insert
+
+from app.models import db, ExcelData
+from app.services.excel_data_service import excel_data_service, MONTHS
+from benchmarks.common import create_benchmark_app
+from benchmarks.projection_benchmark import table_rows
+
+
+def dict_records(**filters):
+    """The display dicts get_aggregated_data_by_filters used to build from ORM objects"""
+    records = []
+    for data in excel_data_service.get_data_by_filters(**filters):
+        record = {
+            'batchId': data.batch_id, 'userId': data.user_id, 'uploadTime': data.upload_timestamp,
+            'market': data.market_name, 'dataMonth': data.data_month,
+            'unitName': data.unit_name, 'metricName': data.metric_name,
+        }
+        lya, cya, cyt = {}, {}, {}
+        for month in MONTHS:
+            for target, value in ((lya, data.get_monthly_lya(month)), (cya, data.get_monthly_cya(month)),
+                                  (cyt, data.get_monthly_cyt(month))):
+                if value and value.strip():
+                    target[month] = value
+        record['lastYearActual'] = lya
+        record['currentYearActual'] = cya
+        record['currentYearTarget'] = cyt
+        records.append(record)
+    return records
+
+
+def dict_statistics(records):
+    monthly_stats = {'lastYearActual': {}, 'currentYearActual': {}, 'currentYearTarget': {}}
+    for item in records:
+        for category, stats in monthly_stats.items():
+            for month in item[category]:
+                stats[month] = stats.get(month, 0) + 1
+    return monthly_stats
+
+
+def measure(run, repeat: int):
+    """Best time of repeat runs and the peak traced memory of one run"""
+    best = float('inf')
+    for _ in range(repeat):
+        db.session.expunge_all()
+        started = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - started)
+
+    db.session.expunge_all()
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    app = create_benchmark_app()
+    with app.app_context():
+        db.session.execute(insert(ExcelData), table_rows(args.rows, random.Random(1)))
+        db.session.commit()
+        filters = {'market_name': 'SG', 'data_month': '2025-Apr'}
+        dumps = current_app.json.dumps
+
+        def previous(encode: bool):
+            records = dict_records(**filters)
+            dict_statistics(records)
+            return len(dumps(records)) if encode else len(records)
+
+        def compact(encode: bool):
+            records = excel_data_service.get_aggregated_data_by_filters(**filters)
+            excel_data_service.get_statistics(records)
+            return len(dumps(records)) if encode else len(records)
+
+        assert previous(True) == compact(True)
+        print(f"Rows: {args.rows}")
+        for label, encode in (('Dashboard (read + statistics)', False), ('/api/data (read + statistics + JSON)', True)):
+            print(label)
+            baseline = None
+            for name, run in (('Display dicts', previous), ('Compact records', compact)):
+                seconds, peak = measure(lambda: run(encode), args.repeat)
+                baseline = baseline or (seconds, peak)
+                print(f"  {name:<16} {seconds * 1000:8.1f} ms ({baseline[0] / seconds:4.1f}x)  "
+                      f"peak {peak / 2**20:6.1f} MiB ({baseline[1] / peak:4.1f}x)")
+
+if __name__ == '__main__':
+    main()
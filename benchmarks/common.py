@@ -0,0 +1,85 @@
+"""
+Shared helpers for GCDM Auto benchmarks
+"""
+
+import io
+import os
+import random
+import tempfile
+from typing import Any, Dict, Optional
+from openpyxl import Workbook
+from werkzeug.datastructures import FileStorage
+
+from app import create_app
+from app.models import db
+from app.sharding import get_shard_router
+from app.services.market_config_loader import MarketConfig
+
+UNITS = ["Acquisition", "Engagement", "Repurchase"]
+METRICS = ["# of Leads", "# of Mature Leads", "# of Leads Assigned", "# of Leads Act on",
+           "# of Leads Conversion", "ANP from mature leads", "VONB from mature leads"]
+
+
+def build_market_workbook(config: MarketConfig, rows: int = 21, seed: Optional[int] = None) -> bytes:
+    """Build an .xlsx workbook laid out the way a market configuration expects"""
+    rng = random.Random(seed)
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = config.get_worksheet_name()
+
+    start_row = config.get_data_row_range().get('startRow', 2)
+    unit_column = config.get_units_config().get('columnNum', 1)
+    metric_column = config.get_metrics_config().get('columnNum', 3)
+    blocks = [config.get_last_year_actual_config(),
+              config.get_current_year_actual_config(),
+              config.get_current_year_target_config()]
+
+    for block in blocks:
+        for i, column_info in enumerate(block.get('columns', [])):
+            sheet.cell(row=max(start_row - 1, 1), column=block['startColumn'] + i, value=column_info['name'])
+
+    for offset in range(rows):
+        row = start_row + offset
+        sheet.cell(row=row, column=unit_column, value=UNITS[offset % len(UNITS)])
+        sheet.cell(row=row, column=metric_column, value=METRICS[offset % len(METRICS)])
+        for block in blocks:
+            for i in range(len(block.get('columns', []))):
+                sheet.cell(row=row, column=block['startColumn'] + i, value=rng.randint(0, 100000))
+
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def as_file_storage(content: bytes, filename: str = 'benchmark.xlsx') -> FileStorage:
+    """Wrap workbook bytes the way Flask hands uploads to the controllers"""
+    return FileStorage(stream=io.BytesIO(content), filename=filename)
+
+
+def create_benchmark_app(config: Optional[Dict[str, Any]] = None, directory: Optional[str] = None):
+    """Create an app on a fresh file-backed SQLite database"""
+    directory = directory or tempfile.mkdtemp(prefix='gcdm-bench-')
+    settings = {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(directory, 'bench.db')}",
+        'UPLOAD_FOLDER': os.path.join(directory, 'uploads'),
+        'TESTING': True,
+    }
+    settings.update(config or {})
+    os.makedirs(settings['UPLOAD_FOLDER'], exist_ok=True)
+
+    app = create_app(settings)
+    with app.app_context():
+        db.create_all()
+        router = get_shard_router()
+        if router:
+            router.create_tables()
+    return app
+
+
+def percentile(values, fraction: float) -> float:
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
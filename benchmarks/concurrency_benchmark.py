@@ -0,0 +1,126 @@
+"""
+Concurrency benchmark: parallel uploads and dashboard reads against SQLite
+
+Runs the same mixed workload without any connection pragmas (rollback
+journal, default synchronous), with the configured SQLITE_PRAGMAS, with the
+pragmas plus reads on the read-only engines (DB_READ_ONLY_ENABLED), and with
+the pragmas plus per-market shard databases (DB_SHARDING), and reports
+throughput, latency and lock errors. Reads run the way @read_only routes do;
+without read-only engines they fall back to the primary one.
+
+Usage:
+    python -m benchmarks.concurrency_benchmark [--uploads 24] [--reads 96] [--threads 8]
+"""
+
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from app.config import Config
+from app.read_only import using_read_only
+from app.services.excel_service import ExcelService
+from app.services.excel_data_service import excel_data_service
+from app.services.market_config_loader import market_config_loader
+from benchmarks.common import as_file_storage, build_market_workbook, create_benchmark_app, percentile
+
+
+def run_workload(app, workbooks, uploads: int, reads: int, threads: int):
+    """Run uploads and reads interleaved on a thread pool"""
+    excel_service = ExcelService(market_config_loader)
+    markets = list(workbooks)
+    timings = {'upload': [], 'read': []}
+    errors = []
+    lock = threading.Lock()
+
+    def upload(n):
+        market = markets[n % len(markets)]
+        with app.app_context():
+            started = time.perf_counter()
+            try:
+                result = excel_service.process_excel_file(as_file_storage(workbooks[market]), market)
+                data = result['data']
+                excel_data_service.save_excel_data(
+                    market=market,
+                    units=data['units'],
+                    metrics=data['metrics'],
+                    last_year_actual=data['lastYearActual'],
+                    current_year_actual=data['currentYearActual'],
+                    current_year_target=data['currentYearTarget'],
+                    data_period='2025-Apr',
+                    batch_id=f"{market}_2025-Apr_bench_{n:05d}",
+                    user_id='bench',
+                    worksheet_name=data['worksheetName'],
+                    upload_timestamp=datetime.now()
+                )
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+            with lock:
+                timings['upload'].append(time.perf_counter() - started)
+
+    def read(n):
+        with app.app_context(), using_read_only():
+            started = time.perf_counter()
+            excel_data_service.get_aggregated_data_by_filters(market_name=markets[n % len(markets)])
+            excel_data_service.get_available_batch_ids()
+            with lock:
+                timings['read'].append(time.perf_counter() - started)
+
+    jobs = [(upload, n) for n in range(uploads)] + [(read, n) for n in range(reads)]
+    # Interleave so reads overlap with uploads instead of running after them
+    jobs.sort(key=lambda job: job[1] / (uploads if job[0] is upload else reads))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for future in [pool.submit(func, n) for func, n in jobs]:
+            future.result()
+    elapsed = time.perf_counter() - started
+
+    return elapsed, timings, errors
+
+
+def report(label, elapsed, timings, errors):
+    """Print one result line per operation type"""
+    print(f"\n{label}: {elapsed:.2f}s wall, {len(errors)} failed uploads")
+    for operation, values in timings.items():
+        if values:
+            print(f"  {operation:6s} n={len(values):4d}  "
+                  f"p50={percentile(values, 0.5) * 1000:8.1f}ms  "
+                  f"p95={percentile(values, 0.95) * 1000:8.1f}ms  "
+                  f"max={max(values) * 1000:8.1f}ms")
+    for message in sorted(set(errors))[:3]:
+        print(f"  error: {message}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--uploads', type=int, default=24)
+    parser.add_argument('--reads', type=int, default=96)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--rows', type=int, default=150, help='data rows per workbook')
+    args = parser.parse_args()
+
+    workbooks = {
+        market: build_market_workbook(market_config_loader.get_config(market), rows=args.rows, seed=i)
+        for i, market in enumerate(market_config_loader.get_available_markets())
+    }
+
+    scenarios = [
+        ('default pragmas', {'SQLITE_PRAGMAS': {}, 'DB_READ_ONLY_ENABLED': False}),
+        ('tuned pragmas', {'SQLITE_PRAGMAS': Config.SQLITE_PRAGMAS, 'DB_READ_ONLY_ENABLED': False}),
+        ('tuned pragmas + read-only engine', {'SQLITE_PRAGMAS': Config.SQLITE_PRAGMAS}),
+        ('tuned pragmas + market shards',
+         {'SQLITE_PRAGMAS': Config.SQLITE_PRAGMAS, 'DB_SHARDING': True, 'DB_READ_ONLY_ENABLED': False}),
+        ('tuned pragmas + market shards, in-thread reads',
+         {'SQLITE_PRAGMAS': Config.SQLITE_PRAGMAS, 'DB_SHARDING': True, 'DB_SHARD_WORKERS': 0,
+          'DB_READ_ONLY_ENABLED': False}),
+    ]
+    for label, config in scenarios:
+        app = create_benchmark_app(config)
+        report(label, *run_workload(app, workbooks, args.uploads, args.reads, args.threads))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Batch diff benchmark: compare two large batches of the same market/month
+
+Inserts two batches of --rows rows each, where batch B changes a share of
+the cells of batch A and replaces a few rows, then times loading and
+comparing them and streaming the result as JSON and CSV, and reports the
+end-to-end time of a compare request in each format.
+
+Usage:
+    python -m benchmarks.diff_benchmark [--rows 10000] [--change-rate 0.05]
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from app.models import db, ExcelData
+from app.services.batch_diff_service import batch_diff_service, VALUE_COLUMNS
+from benchmarks.common import UNITS, METRICS, create_benchmark_app
+
+
+def batch_rows(batch_id: str, rows: int, rng: random.Random, change_rate: float, base=None):
+    """Rows of a batch; with base, a copy of it with some cells changed and some rows replaced"""
+    now = datetime.now()
+    records = []
+    for n in range(rows):
+        unit = f"{UNITS[n % len(UNITS)]} {n // len(METRICS)}"
+        metric = METRICS[n % len(METRICS)]
+        if base is not None and rng.random() < 0.01:
+            unit = f"New unit {n}"
+        record = {
+            'market_name': 'SG', 'unit_name': unit, 'metric_name': metric, 'data_month': '2025-Apr',
+            'period_key': 202504, 'batch_id': batch_id, 'user_id': 'bench', 'worksheet_name': 'Bench',
+            'upload_timestamp': now, 'created_time': now, 'updated_time': now,
+        }
+        for column in VALUE_COLUMNS:
+            if base is None:
+                value = str(rng.randint(0, 100000))
+            else:
+                value = base[n][column.key]
+                if rng.random() < change_rate:
+                    value = str(rng.randint(0, 100000))
+            record[column.key] = value
+        records.append(record)
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--change-rate', type=float, default=0.05)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    app = create_benchmark_app()
+    with app.app_context():
+        old = batch_rows('SG_bench_A', args.rows, rng, args.change_rate)
+        new = batch_rows('SG_bench_B', args.rows, rng, args.change_rate, base=old)
+        db.session.execute(insert(ExcelData), old)
+        db.session.execute(insert(ExcelData), new)
+        db.session.commit()
+
+        started = time.perf_counter()
+        diff = batch_diff_service.compare('SG_bench_A', 'SG_bench_B')
+        compared = time.perf_counter()
+        summary = diff.summary()
+        json_bytes = sum(len(chunk) for chunk in batch_diff_service.stream_json(diff))
+        streamed_json = time.perf_counter()
+        csv_bytes = sum(len(chunk) for chunk in batch_diff_service.stream_csv(diff))
+        streamed_csv = time.perf_counter()
+
+    print(f"Rows per batch:   {args.rows}")
+    print(f"Matched rows:     {summary['matchedRows']} ({summary['addedRows']} added, {summary['removedRows']} removed)")
+    print(f"Changed cells:    {summary['changedCells']} in {summary['changedRows']} rows")
+    print(f"Load + compare:   {(compared - started) * 1000:.1f} ms")
+    print(f"Stream JSON:      {(streamed_json - compared) * 1000:.1f} ms ({json_bytes / 1024:.0f} KiB)")
+    print(f"Stream CSV:       {(streamed_csv - streamed_json) * 1000:.1f} ms ({csv_bytes / 1024:.0f} KiB)")
+    # What one /excel/compare request costs: load and compare, then one of the formats
+    print(f"End to end JSON:  {(streamed_json - started) * 1000:.1f} ms")
+    print(f"End to end CSV:   {(streamed_csv - streamed_json + compared - started) * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""
+Ingest benchmark: simultaneous uploads committing on their own threads vs
+through the group-commit writer
+
+Starts all uploads at once (the workbooks are parsed beforehand, so only
+the database writes overlap) and reports latency, the time spent waiting
+for the SQLite write lock: the
+duration of each transaction's first write statement (BEGIN IMMEDIATE for
+the writer, the first INSERT/UPDATE/DELETE otherwise), which is where a
+writer blocks in the busy handler until the lock is free, and the number of
+write transactions the database actually committed. With the writer,
+uploads wait in its queue instead; that time is reported separately.
+
+Usage:
+    python -m benchmarks.ingest_benchmark [--uploads 20] [--rows 300]
+"""
+
+import argparse
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import event
+
+from app.config import Config
+from app.database import all_engines
+from app.models import db
+from app.services.excel_data_service import excel_data_service
+from app.services.excel_service import ExcelService
+from app.services.ingest_writer import get_ingest_writer
+from app.services.market_config_loader import market_config_loader
+from benchmarks.common import as_file_storage, build_market_workbook, create_benchmark_app, percentile
+
+WRITES = ('INSERT', 'UPDATE', 'DELETE', 'BEGIN IMMEDIATE')
+
+
+def track_lock_wait(engines):
+    """Record the duration of the first write statement of every transaction (or of its failure),
+    and count the transactions that committed writes"""
+    waits, commits = [], []
+    lock = threading.Lock()
+
+    for engine in engines:
+        @event.listens_for(engine, 'before_cursor_execute')
+        def before(conn, cursor, statement, parameters, context, executemany):
+            conn.info['statement_started'] = time.perf_counter()
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def after(conn, cursor, statement, parameters, context, executemany):
+            if not conn.info.get('writing') and statement.lstrip().upper().startswith(WRITES):
+                conn.info['writing'] = True
+                with lock:
+                    waits.append(time.perf_counter() - conn.info['statement_started'])
+
+        @event.listens_for(engine, 'handle_error')
+        def error(context):
+            conn = context.connection
+            if conn is not None and not conn.info.get('writing') and 'statement_started' in conn.info:
+                with lock:
+                    waits.append(time.perf_counter() - conn.info['statement_started'])
+
+        @event.listens_for(engine, 'commit')
+        def commit(conn):
+            if conn.info.pop('writing', None):
+                with lock:
+                    commits.append(conn.engine.url)
+
+        @event.listens_for(engine, 'rollback')
+        def rollback(conn):
+            conn.info.pop('writing', None)
+
+    return waits, commits
+
+
+def run_uploads(app, parsed, uploads: int):
+    """Save `uploads` batches from as many threads, released at the same moment"""
+    markets = list(parsed)
+    start = threading.Barrier(uploads)
+    latencies, errors = [], []
+    lock = threading.Lock()
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+
+    with app.app_context():
+        waits, commits = track_lock_wait(all_engines(db))
+
+    def upload(n):
+        market = markets[n % len(markets)]
+        data = parsed[market]
+        with app.app_context():
+            writer = get_ingest_writer()
+            save_excel_data = writer.save_excel_data if writer else excel_data_service.save_excel_data
+            start.wait()
+            started = time.perf_counter()
+            try:
+                save_excel_data(
+                    market=market,
+                    units=data['units'],
+                    metrics=data['metrics'],
+                    last_year_actual=data['lastYearActual'],
+                    current_year_actual=data['currentYearActual'],
+                    current_year_target=data['currentYearTarget'],
+                    data_period='2025-Apr',
+                    batch_id=f"{market}_2025-Apr_{stamp}_{n:05d}",
+                    user_id='bench',
+                    worksheet_name=data['worksheetName'],
+                    upload_timestamp=datetime.now()
+                )
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=upload, args=(n,)) for n in range(uploads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        writer = get_ingest_writer()
+        stats = dict(writer.stats) if writer else None
+        if writer:
+            writer.close()
+    return elapsed, latencies, list(waits), len(commits), stats, errors
+
+
+def report(label, elapsed, latencies, waits, commits, stats, errors):
+    """Print the results of one scenario"""
+    print(f"\n{label}: {elapsed:.2f}s wall, {commits} write commits, {len(errors)} failed uploads")
+    print(f"  upload     p50={percentile(latencies, 0.5) * 1000:8.1f}ms  "
+          f"p95={percentile(latencies, 0.95) * 1000:8.1f}ms  max={max(latencies) * 1000:8.1f}ms")
+    print(f"  lock wait  total={sum(waits) * 1000:8.1f}ms  max={max(waits, default=0) * 1000:8.1f}ms")
+    if stats:
+        print(f"  queue wait total={stats['queue_seconds'] * 1000:8.1f}ms")
+    for message in sorted(set(errors))[:3]:
+        print(f"  error: {message}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--uploads', type=int, default=20)
+    parser.add_argument('--rows', type=int, default=300, help='data rows per workbook')
+    args = parser.parse_args()
+
+    excel_service = ExcelService(market_config_loader)
+    parsed = {}
+    for i, market in enumerate(market_config_loader.get_available_markets()):
+        workbook = build_market_workbook(market_config_loader.get_config(market), rows=args.rows, seed=i)
+        parsed[market] = excel_service.process_excel_file(as_file_storage(workbook), market)['data']
+
+    scenarios = [
+        ('commit per upload', {'SQLITE_PRAGMAS': Config.SQLITE_PRAGMAS, 'INGEST_WRITER_ENABLED': False}),
+        ('group-commit writer', {'SQLITE_PRAGMAS': Config.SQLITE_PRAGMAS, 'INGEST_WRITER_ENABLED': True}),
+    ]
+    for label, config in scenarios:
+        app = create_benchmark_app(config)
+        report(label, *run_uploads(app, parsed, args.uploads))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Projection benchmark: ORM entities vs. Core projections for the listing pages
+
+Inserts --rows rows into one market/month, then times reading them the way
+the result and view pages need them (worksheet, unit and metric names) as
+full ExcelData ORM objects, as __slots__ projection records and as plain
+tuples, with the peak memory of each read.
+
+Usage:
+    python -m benchmarks.projection_benchmark [--rows 50000] [--repeat 3]
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from app.models import db, ExcelData
+from app.services.batch_diff_service import VALUE_COLUMNS
+from app.services.excel_data_service import excel_data_service
+from benchmarks.common import UNITS, METRICS, create_benchmark_app
+
+
+def table_rows(rows: int, rng: random.Random):
+    """Rows of one market and data month, spread over batches of 1000 rows"""
+    now = datetime.now()
+    records = []
+    for n in range(rows):
+        record = {
+            'market_name': 'SG', 'unit_name': f"{UNITS[n % len(UNITS)]} {n}", 'metric_name': METRICS[n % len(METRICS)],
+            'data_month': '2025-Apr', 'period_key': 202504, 'batch_id': f"SG_bench_{n // 1000:03d}",
+            'user_id': 'bench', 'worksheet_name': 'Bench', 'upload_timestamp': now,
+            'created_time': now, 'updated_time': now,
+        }
+        for column in VALUE_COLUMNS:
+            record[column.key] = str(rng.randint(0, 100000))
+        records.append(record)
+    return records
+
+
+def measure(read, repeat: int):
+    """Best time of repeat reads and the peak traced memory of one read"""
+    best = float('inf')
+    for _ in range(repeat):
+        db.session.expunge_all()
+        started = time.perf_counter()
+        result = read()
+        best = min(best, time.perf_counter() - started)
+        del result
+
+    db.session.expunge_all()
+    tracemalloc.start()
+    result = read()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, len(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    app = create_benchmark_app()
+    with app.app_context():
+        db.session.execute(insert(ExcelData), table_rows(args.rows, random.Random(1)))
+        db.session.commit()
+
+        filters = {'market_name': 'SG', 'data_month': '2025-Apr'}
+        readers = [
+            ('ORM entities', lambda: [(d.worksheet_name, d.unit_name, d.metric_name)
+                                      for d in excel_data_service.get_data_by_filters(**filters)]),
+            ('Slots records', lambda: excel_data_service.get_projected_data_by_filters('listing', **filters)),
+            ('Tuples', lambda: excel_data_service.get_projected_data_by_filters('listing', as_tuples=True,
+                                                                                **filters)),
+        ]
+
+        print(f"Rows: {args.rows}")
+        baseline = None
+        for name, read in readers:
+            seconds, peak, count = measure(read, args.repeat)
+            baseline = baseline or seconds
+            print(f"{name:<15} {seconds * 1000:8.1f} ms  ({baseline / seconds:4.1f}x)  "
+                  f"peak {peak / 2**20:6.1f} MiB  {count} rows")
+
+
+if __name__ == '__main__':
+    main()
@@ -85,11 +85,11 @@ if exist "requirements.txt" (
 
 REM Create necessary directories
 echo 📁 Creating necessary directories...
-if not exist "app\static\uploads" mkdir app\static\uploads
+if not exist "storage\uploads" mkdir storage\uploads
 if not exist "logs" mkdir logs
 
 REM Set permissions for upload directory (Windows equivalent)
-echo ✅ Upload directory created: app\static\uploads
+echo ✅ Upload directory created: storage\uploads
 
 echo.
 echo 🎉 Environment setup completed successfully!
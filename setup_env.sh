@@ -75,11 +75,11 @@ fi
 
 # Create necessary directories
 echo "Creating necessary directories..."
-mkdir -p app/static/uploads
+mkdir -p storage/uploads
 mkdir -p logs
 
 # Set permissions for upload directory
-chmod 755 app/static/uploads
+chmod 755 storage/uploads
 
 echo ""
 echo "Environment setup completed successfully!"
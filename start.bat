@@ -129,7 +129,7 @@ if not exist "app.py" (
 )
 
 REM Create upload directory if it doesn't exist
-if not exist "app\static\uploads" mkdir app\static\uploads
+if not exist "storage\uploads" mkdir storage\uploads
 
 REM Display startup information
 echo.
@@ -137,12 +137,16 @@ echo ✅ Environment Check: Passed
 for /f "tokens=*" %%i in ('python --version') do echo 🐍 Python Version: %%i
 echo 🚀 Flask Application: app.py
 echo 🌐 Server: http://localhost:8080 (localhost only)
-echo 📁 Upload Directory: app\static\uploads
+echo 📁 Upload Directory: storage\uploads
 echo.
 echo 🎯 Starting Flask application...
 echo 🛑 Press Ctrl+C to stop the application
 echo ========================================
 echo.
 
-REM Start the Flask application
-python app.py
+REM Start the Flask application (pass --production for the WSGI server)
+if /i "%~1"=="--production" (
+    python -m app.server
+) else (
+    python app.py
+)
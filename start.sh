@@ -1,6 +1,8 @@
 #!/bin/bash
 
 # GCDM Auto Flask Application Startup Script
+# Usage: ./start.sh [--production]
+#   --production  run under the production WSGI server instead of the Flask dev server
 
 echo "Starting GCDM Auto Flask Application..."
 echo "========================================"
@@ -97,19 +99,27 @@ if [ ! -f "app.py" ]; then
 fi
 
 # Create upload directory if it doesn't exist
-mkdir -p app/static/uploads
+mkdir -p storage/uploads
 
 # Display startup information
 echo ""
 echo "Environment Check: ✓ Passed"
 echo "Python Version: $(python --version)"
-echo "Flask Application: app.py"
+if [ "$1" == "--production" ]; then
+    echo "Flask Application: app.server (production WSGI server)"
+else
+    echo "Flask Application: app.py (development server)"
+fi
 echo "Server: http://localhost:8080 (localhost only)"
-echo "Upload Directory: app/static/uploads"
+echo "Upload Directory: storage/uploads"
 echo ""
 echo "Starting Flask application..."
 echo "Press Ctrl+C to stop the application"
 echo "========================================"
 
 # Start the Flask application
-python app.py
+if [ "$1" == "--production" ]; then
+    python -m app.server
+else
+    python app.py
+fi
@@ -3,30 +3,48 @@ Test configuration and fixtures
 """
 
 import pytest
-import tempfile
-import os
-from app import app
+from app import create_app
 from app.models import db
+from app.security import REQUEST_COUNTS, BLOCKED_IPS
 
 @pytest.fixture
-def client():
+def app(tmp_path):
+    """Create an application backed by an in-memory database"""
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+        'LEGACY_UPLOAD_FOLDER': str(tmp_path / 'legacy_uploads'),
+        'PARSE_CACHE_FOLDER': str(tmp_path / 'parse_cache'),
+        'REPORT_CACHE_FOLDER': str(tmp_path / 'report_cache'),
+        'TESTING': True,
+        'WTF_CSRF_ENABLED': False,
+    })
+    (tmp_path / 'uploads').mkdir()
+
+    # Rate limiting state is process-wide; start every test with a clean slate
+    REQUEST_COUNTS.clear()
+    BLOCKED_IPS.clear()
+
+    with app.app_context():
+        db.create_all()
+
+    yield app
+
+@pytest.fixture
+def client(app):
     """Create a test client"""
-    # Create a temporary database
-    db_fd, app.config['DATABASE'] = tempfile.mkstemp()
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-    app.config['TESTING'] = True
-    app.config['WTF_CSRF_ENABLED'] = False
-    
     with app.test_client() as client:
-        with app.app_context():
-            db.create_all()
         yield client
-    
-    os.close(db_fd)
-    os.unlink(app.config['DATABASE'])
 
 @pytest.fixture
-def app_context():
+def app_context(app):
     """Create an application context"""
     with app.app_context():
         yield app
+
+@pytest.fixture
+def sample_workbook():
+    """Workbook bytes in the SG market layout"""
+    from benchmarks.common import build_market_workbook
+    from app.services.market_config_loader import market_config_loader
+    return build_market_workbook(market_config_loader.get_config('SG'), rows=14, seed=1)
@@ -0,0 +1,295 @@
+"""
+Tests for the JSON data API
+"""
+
+from tests.test_controllers import upload_workbook
+
+def test_api_data_returns_records_and_stats(client, sample_workbook):
+    """Test the data endpoint returns filtered records with dashboard statistics"""
+    upload_workbook(client, sample_workbook)
+
+    response = client.get('/api/data?market=SG')
+    assert response.status_code == 200
+    payload = response.get_json()
+    assert payload['stats']['totalRecords'] == 14
+    assert payload['stats']['uniqueMarkets'] == 1
+    assert {record['market'] for record in payload['records']} == {'SG'}
+
+    response = client.get('/api/markets')
+    assert response.get_json()['markets'] == ['SG']
+
+def test_api_conditional_get_uses_data_version(client, sample_workbook):
+    """Test unchanged data answers 304 and new uploads change the ETag"""
+    upload_workbook(client, sample_workbook)
+
+    first = client.get('/api/stats')
+    etag = first.headers['ETag']
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+    assert 'Pragma' not in first.headers
+
+    unchanged = client.get('/api/stats', headers={'If-None-Match': etag})
+    assert unchanged.status_code == 304
+    assert unchanged.data == b''
+
+    other_filters = client.get('/api/stats?market=SG', headers={'If-None-Match': etag})
+    assert other_filters.status_code == 200
+
+    upload_workbook(client, sample_workbook, data_month='2025-May')
+    changed = client.get('/api/stats', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert changed.get_json()['totalRecords'] == 28
+
+def test_api_period_range_filter(client, sample_workbook):
+    """Test periodFrom/periodTo select data months chronologically, in either key form"""
+    upload_workbook(client, sample_workbook, data_month='2024-Sep')
+    upload_workbook(client, sample_workbook, data_month='2024-Oct')
+    upload_workbook(client, sample_workbook, data_month='2025-Jan')
+
+    assert client.get('/api/markets').get_json()['dataMonths'] == ['2025-Jan', '2024-Oct', '2024-Sep']
+
+    records = client.get('/api/data?periodFrom=2024-Oct&periodTo=202412').get_json()['records']
+    assert {record['dataMonth'] for record in records} == {'2024-Oct'}
+    assert client.get('/api/stats?periodFrom=bogus').get_json()['totalRecords'] == 0
+
+def test_rollups_match_raw_statistics_and_rebuild(client, app, sample_workbook):
+    """Test rollups maintained at upload give the row-based statistics and survive a rebuild"""
+    from app.models import db, MetricRollup
+    from app.services.excel_data_service import excel_data_service
+    from app.services.rollup_service import rollup_service
+
+    upload_workbook(client, sample_workbook)
+    upload_workbook(client, sample_workbook, data_month='2025-May')
+
+    with app.app_context():
+        records = excel_data_service.get_aggregated_data_by_filters(market_name='SG')
+        expected = excel_data_service.get_statistics(records)
+        assert rollup_service.get_statistics(market_name='SG') == expected
+
+        leads = rollup_service.get_totals(market_name='SG', data_month='2025-Apr')
+        assert leads and leads[0]['market'] == 'SG'
+
+        before = db.session.query(MetricRollup).count()
+        assert rollup_service.rebuild(batch_size=5) == 28
+        assert db.session.query(MetricRollup).count() == before
+        assert rollup_service.get_statistics() == excel_data_service.get_statistics(
+            excel_data_service.get_aggregated_data_by_filters())
+
+    totals = client.get('/api/rollups?market=SG&periodFrom=202505').get_json()['totals']
+    assert {record['dataMonth'] for record in totals} == {'2025-May'}
+
+def test_api_kpis_cached_per_batch(client, app, sample_workbook):
+    """Test market KPIs come from the latest batch of each market and month, also when uploaded in the same second"""
+    from datetime import datetime
+    from app.services.analytics_service import analytics_service
+    from app.services.excel_data_service import excel_data_service
+
+    analytics_service.clear()
+    upload_workbook(client, sample_workbook)
+
+    payload = client.get('/api/kpis?market=SG').get_json()['kpis']
+    assert len(payload) == 1
+    leads = payload[0]['metrics']['# of Leads']
+    assert len(leads['yoy']) == 12 and len(leads['ytd']['CYA']) == 12
+    assert '# of Leads Conversion' in payload[0]['funnel']['stepConversion']
+
+    first_id = payload[0]['batchId']
+    assert client.get(f'/api/kpis/{first_id}').get_json() == payload[0]
+    assert client.get('/api/kpis/unknown').status_code == 404
+
+    # A second upload of the same market and month, within the same second, whose ID sorts first
+    second_id = first_id.rsplit('_', 1)[0] + '_00000000'
+    with app.app_context():
+        excel_data_service.save_excel_data(
+            market='SG', units=['Unit A'], metrics=['# of Leads'], last_year_actual={'Jan_LYA': ['10']},
+            current_year_actual={'Jan_CYA': ['15']}, current_year_target={}, data_period='2025-Apr',
+            batch_id=second_id, user_id='user1', worksheet_name='Sheet', upload_timestamp=datetime.now())
+
+    latest = client.get('/api/kpis?market=SG&dataMonth=2025-Apr').get_json()['kpis']
+    assert [kpis['batchId'] for kpis in latest] == [second_id]
+    assert latest[0]['metrics']['# of Leads']['yoy'][0] == 0.5
+    assert client.get(f'/api/kpis/{first_id}').get_json() == payload[0]
+
+def test_batch_manifest_written_and_backfilled(client, app, sample_workbook):
+    """Test an upload writes its manifest and rows saved without one are backfilled"""
+    from app.models import db, Batch, ExcelData
+    from app.services.batch_service import batch_service
+
+    upload_workbook(client, sample_workbook)
+
+    manifests = client.get('/api/batches?market=SG').get_json()['batches']
+    assert len(manifests) == 1
+    manifest = manifests[0]
+    assert manifest['rowCount'] == 14 and manifest['status'] == Batch.STATUS_LOADED
+    assert manifest['contentHash'] and manifest['insertSeconds'] is not None
+
+    with app.app_context():
+        assert not batch_service.needs_backfill()
+        db.session.add(ExcelData('MY', 'Unit', 'Metric', '2025-Apr', 'MY_old', 'user2'))
+        db.session.commit()
+        assert batch_service.needs_backfill()
+        assert batch_service.backfill() == 1
+        backfilled = batch_service.get_batch('MY_old')
+        assert backfilled.row_count == 1 and backfilled.status == Batch.STATUS_BACKFILLED
+        assert ExcelData.query.filter_by(batch_id='MY_old').one().batch_ref == backfilled.id
+
+    payload = client.get('/api/markets').get_json()
+    assert 'MY' in payload['markets']
+
+def test_sharded_markets_route_writes_and_fan_out_reads(tmp_path):
+    """Test market shards hold their own rows and cross-market reads merge every shard"""
+    import os
+    import threading
+    from datetime import datetime
+    from sqlalchemy import func, insert, select
+    from app import create_app
+    from app.models import db, ExcelData
+    from app.services.batch_service import batch_service
+    from app.services.excel_data_service import excel_data_service
+    from app.services.market_config_loader import market_config_loader
+    from app.services.rollup_service import rollup_service
+    from app.sharding import get_shard_router
+    from benchmarks.common import build_market_workbook
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'gcdmauto.db'}",
+        'DB_SHARDING': True,
+        'DB_SHARD_MARKETS': ['SG', 'HK'],
+        'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+        'PARSE_CACHE_FOLDER': str(tmp_path / 'parse_cache'),
+        'TESTING': True,
+    })
+    os.makedirs(tmp_path / 'uploads')
+    with app.app_context():
+        db.create_all()
+        router = get_shard_router()
+        router.create_tables()
+
+    client = app.test_client()
+    for market in ('SG', 'HK'):
+        workbook = build_market_workbook(market_config_loader.get_config(market), rows=14, seed=1)
+        upload_workbook(client, workbook, market=market, filename=f'{market}_metrics.xlsx')
+    assert (tmp_path / 'gcdmauto_sg.db').exists() and (tmp_path / 'gcdmauto_hk.db').exists()
+
+    count = select(func.count()).select_from(ExcelData.__table__)
+    with app.app_context():
+        with router.engine('SG').connect() as connection:
+            assert connection.execute(count).scalar() == 14
+        with router.engine(None).connect() as connection:
+            assert connection.execute(count).scalar() == 0
+
+        assert excel_data_service.get_available_markets() == ['HK', 'SG']
+        records = excel_data_service.get_aggregated_data_by_filters()
+        assert len(records) == 28
+        assert [record.batchId for record in records] == sorted((r.batchId for r in records), reverse=True)
+        assert rollup_service.get_statistics() == excel_data_service.get_statistics(records)
+        assert {record.market for record in excel_data_service.get_aggregated_data_by_filters('HK')} == {'HK'}
+        assert batch_service.get_batch(records[0].batchId).row_count == 14
+
+        # Rows written to the main database before sharding are moved into their shard
+        row = {'market_name': 'SG', 'unit_name': 'Unit', 'metric_name': 'Metric', 'data_month': '2025-Mar',
+               'batch_id': 'SG_2025-Mar_old', 'user_id': 'user1', 'upload_timestamp': datetime.now(),
+               'created_time': datetime.now(), 'updated_time': datetime.now()}
+        with router.engine(None).begin() as connection:
+            connection.execute(insert(ExcelData.__table__), [row])
+        assert router.move_to_shards() == {'SG': 1, 'HK': 0}
+        assert len(excel_data_service.get_data_by_filters('SG')) == 15
+
+    stats = client.get('/api/stats').get_json()
+    assert stats['totalRecords'] == 28 and stats['uniqueMarkets'] == 2
+    kpis = client.get('/api/kpis').get_json()['kpis']
+    assert [(record['market'], record['dataMonth']) for record in kpis] == [('HK', '2025-Apr'), ('SG', '2025-Apr')]
+    router.close()
+    assert not [thread for thread in threading.enumerate() if thread.name.startswith('shard')]
+
+def test_in_thread_shard_reads_keep_rows_of_each_shard(tmp_path):
+    """Test reads in turn over shards (DB_SHARD_WORKERS = 0) do not mix up rows with equal keys"""
+    import os
+    from app import create_app
+    from app.models import db
+    from app.services.batch_service import batch_service
+    from app.services.excel_data_service import excel_data_service
+    from app.services.market_config_loader import market_config_loader
+    from app.services.rollup_service import rollup_service
+    from app.sharding import get_shard_router
+    from benchmarks.common import build_market_workbook
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'gcdmauto.db'}",
+        'DB_SHARDING': True,
+        'DB_SHARD_MARKETS': ['SG', 'HK'],
+        'DB_SHARD_WORKERS': 0,
+        'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+        'PARSE_CACHE_FOLDER': str(tmp_path / 'parse_cache'),
+        'TESTING': True,
+    })
+    os.makedirs(tmp_path / 'uploads')
+    with app.app_context():
+        db.create_all()
+        router = get_shard_router()
+        router.create_tables()
+
+    client = app.test_client()
+    for market in ('SG', 'HK'):
+        workbook = build_market_workbook(market_config_loader.get_config(market), rows=14, seed=1)
+        upload_workbook(client, workbook, market=market, filename=f'{market}_metrics.xlsx')
+
+    with app.app_context():
+        rows = excel_data_service.get_data_by_filters()
+        assert len(rows) == 28 and {row.market_name for row in rows} == {'SG', 'HK'}
+        assert {row.market_name for row in excel_data_service.get_all_data()} == {'SG', 'HK'}
+        assert {batch.market_name for batch in batch_service.get_batches()} == {'SG', 'HK'}
+
+        statistics = rollup_service.get_statistics()
+        assert rollup_service.rebuild() == 28
+        assert rollup_service.get_statistics() == statistics
+    router.close()
+
+def test_read_only_routes_read_through_mode_ro_engines(tmp_path, sample_workbook):
+    """Test reads of read-only routes use mode=ro engines per database while writes stay on the primary"""
+    import os
+    from datetime import datetime
+    import pytest
+    from sqlalchemy import insert, select
+    from sqlalchemy.exc import OperationalError
+    from app import create_app
+    from app.models import db, DataVersion, ExcelData
+    from app.read_only import get_read_only_engine, using_read_only
+    from app.sharding import get_shard_router, using_shard
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'gcdmauto.db'}",
+        'DB_SHARDING': True,
+        'DB_SHARD_MARKETS': ['SG'],
+        'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+        'PARSE_CACHE_FOLDER': str(tmp_path / 'parse_cache'),
+        'TESTING': True,
+    })
+    os.makedirs(tmp_path / 'uploads')
+    with app.app_context():
+        db.create_all()
+        router = get_shard_router()
+        router.create_tables()
+
+    client = app.test_client()
+    upload_workbook(client, sample_workbook)
+    assert client.get('/api/stats').get_json()['totalRecords'] == 14
+
+    with app.app_context():
+        sg_engine, main_engine = get_read_only_engine('SG'), get_read_only_engine(None)
+        assert sg_engine.url.query['mode'] == 'ro' and main_engine.url.query['mode'] == 'ro'
+        with using_read_only():
+            with using_shard('SG'):
+                assert db.session.get_bind(clause=select(ExcelData)) is sg_engine
+                assert db.session.get_bind(clause=insert(ExcelData)) is router.engines['SG']
+            assert db.session.get_bind(clause=select(DataVersion)) is main_engine
+            # Writes inside a read-only block still commit through the primary engine
+            DataVersion.bump(DataVersion.EXCEL_DATA)
+            db.session.commit()
+        assert db.session.get_bind(clause=select(ExcelData)) is db.engine
+
+        with pytest.raises(OperationalError, match='readonly'):
+            with main_engine.begin() as connection:
+                connection.execute(insert(DataVersion.__table__).values(name='probe', version=1,
+                                                                         update_time=datetime.now()))
+    router.close()
@@ -0,0 +1,46 @@
+"""
+Tests for the fingerprinted static asset pipeline
+"""
+
+import os
+import shutil
+from app.assets import build_assets
+
+def test_build_assets_writes_hashed_copies_and_manifest(tmp_path):
+    """Test assets are copied under content-hashed names and stale builds are removed"""
+    static = tmp_path / 'static'
+    (static / 'css').mkdir(parents=True)
+    (static / 'css' / 'site.css').write_text('body { color: red; }')
+
+    first = build_assets(str(static))
+    assert first['css/site.css'].startswith('dist/css/site.') and first['css/site.css'].endswith('.css')
+    assert (static / first['css/site.css']).read_text() == 'body { color: red; }'
+
+    (static / 'css' / 'site.css').write_text('body { color: blue; }')
+    second = build_assets(str(static))
+    assert second['css/site.css'] != first['css/site.css']
+    assert not (static / first['css/site.css']).exists()
+    assert (static / 'dist' / 'manifest.json').exists()
+
+def test_hashed_assets_are_served_immutable(client, app, tmp_path):
+    """Test templates reference hashed assets, which get a long-lived immutable Cache-Control"""
+    static = tmp_path / 'static'
+    shutil.copytree(app.static_folder, static, ignore=shutil.ignore_patterns('dist', 'uploads'))
+    app.static_folder = str(static)
+    app.extensions['asset_manifest'].path = os.path.join(str(static), 'dist', 'manifest.json')
+
+    page = client.get('/excel/upload').data.decode('utf-8')
+    assert '/static/css/base.css' in page  # not built yet: plain source file
+
+    manifest = build_assets(str(static))
+    page = client.get('/excel/upload').data.decode('utf-8')
+    assert f"/static/{manifest['css/base.css']}" in page
+
+    response = client.get(f"/static/{manifest['css/base.css']}")
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+    assert 'Pragma' not in response.headers
+
+    response = client.get('/static/css/base.css')
+    assert response.headers['Cache-Control'] == 'public, no-cache'
+    assert 'no-store' in client.get('/excel/upload').headers['Cache-Control']
@@ -0,0 +1,40 @@
+"""
+Tests for response compression
+"""
+
+import gzip
+from tests.test_controllers import upload_workbook
+
+def test_large_html_and_streamed_csv_are_gzipped(client, sample_workbook):
+    """Test large text responses, including streamed exports, are compressed"""
+    upload_workbook(client, sample_workbook)
+
+    plain = client.get('/excel/viewallmarketresults')
+    response = client.get('/excel/viewallmarketresults', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert int(response.headers['Content-Length']) < len(plain.data) / 3
+    assert b'row-number' in gzip.decompress(response.data)
+
+    response = client.get('/excel/export?format=csv', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    assert gzip.decompress(response.data).decode('utf-8').count('\n') == 15
+
+def test_compression_skips_binary_small_and_unaccepted_responses(client, app, sample_workbook):
+    """Test xlsx downloads, small bodies and clients without gzip get the body as is"""
+    from app.models import UploadedFile
+
+    upload_workbook(client, sample_workbook)
+    with app.app_context():
+        batch_id = UploadedFile.query.one().batch_id
+
+    response = client.get(f'/admin/download/file/{batch_id}', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.data == sample_workbook
+
+    response = client.get('/api/batches', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers  # below COMPRESS_MIN_SIZE
+
+    response = client.get('/excel/viewallmarketresults')
+    assert 'Content-Encoding' not in response.headers
@@ -54,3 +54,250 @@ def test_config_view_with_market(client):
     response = client.get('/config/view?market=SG')
     assert response.status_code == 200
     assert b'Configuration View' in response.data
+
+def upload_workbook(client, content, market='SG', data_month='2025-Apr', filename='SG_metrics.xlsx'):
+    """Post a workbook to the upload endpoint"""
+    import io
+    return client.post('/excel/upload', data={
+        'market': market,
+        'dataMonth': data_month,
+        'file': (io.BytesIO(content), filename),
+    }, content_type='multipart/form-data')
+
+def test_excel_upload_duplicate_reuses_batch(client, app, sample_workbook):
+    """Test re-uploading identical content for the same market/month reuses the first batch"""
+    import os
+    from app.models import ExcelData, UploadedFile
+
+    first = upload_workbook(client, sample_workbook)
+    second = upload_workbook(client, sample_workbook, filename='SG_metrics_again.xlsx')
+
+    assert first.status_code == 302 and second.status_code == 302
+    assert first.location == second.location
+
+    with app.app_context():
+        assert UploadedFile.query.count() == 1
+        assert ExcelData.query.count() == 14
+        record = UploadedFile.query.first()
+
+    blob_dir = os.path.join(app.config['UPLOAD_FOLDER'], 'blobs', record.content_hash[:2])
+    assert os.listdir(blob_dir) == [record.content_hash]
+    assert record.stored_path == f"SG/2025-04/{record.batch_id}_SG_metrics.xlsx"
+    assert os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], 'SG', '2025-04', f"{record.batch_id}_SG_metrics.xlsx"))
+
+    # Same content for another month is a new batch sharing the stored blob and parse result
+    upload_workbook(client, sample_workbook, data_month='2025-May')
+    with app.app_context():
+        assert UploadedFile.query.count() == 2
+        assert ExcelData.query.filter_by(data_month='2025-May').count() == 14
+    assert os.listdir(blob_dir) == [record.content_hash]
+    assert len(os.listdir(app.config['PARSE_CACHE_FOLDER'])) == 1
+
+def test_admin_download_search_uses_catalog(client, app, sample_workbook):
+    """Test the download search lists cataloged uploads with pagination"""
+    upload_workbook(client, sample_workbook, data_month='2025-Apr')
+    upload_workbook(client, sample_workbook, data_month='2025-May')
+    app.config['DOWNLOAD_PAGE_SIZE'] = 1
+
+    response = client.post('/admin/download', data={'market': 'SG'})
+    assert response.status_code == 200
+    assert b'Available Files (2 found)' in response.data
+    assert b'Page 1 of 2' in response.data
+    assert b'SG_2025-May_' in response.data  # newest first
+
+    response = client.post('/admin/download', data={'market': 'SG', 'dataMonth': '2025-Apr'})
+    assert b'Available Files (1 found)' in response.data
+
+    response = client.post('/admin/download', data={'market': 'HK'})
+    assert b'No files found' in response.data
+
+def test_admin_download_file_by_batch(client, app, sample_workbook):
+    """Test a cataloged upload downloads under its original name"""
+    from app.models import UploadedFile
+
+    upload_workbook(client, sample_workbook)
+    with app.app_context():
+        batch_id = UploadedFile.query.one().batch_id
+
+    response = client.get(f'/admin/download/file/{batch_id}')
+    assert response.status_code == 200
+    assert response.data == sample_workbook
+    assert 'SG_metrics.xlsx' in response.headers['Content-Disposition']
+
+    response = client.get('/admin/download/file/SG_2025-Apr_unknown')
+    assert response.status_code == 302
+
+def test_admin_download_file_conditional_and_range(client, app, sample_workbook, monkeypatch):
+    """Test downloads revalidate by content hash ETag, serve ranges and are cacheable"""
+    from app.models import UploadedFile
+    from app.services.security_audit_service import security_audit_service
+
+    downloads = []
+    monkeypatch.setattr(security_audit_service, 'log_file_download',
+                        lambda user_id, file_name, request_obj=None: downloads.append(file_name))
+    upload_workbook(client, sample_workbook)
+    with app.app_context():
+        record = UploadedFile.query.one()
+    url = f'/admin/download/file/{record.batch_id}'
+
+    response = client.get(url)
+    assert response.headers['ETag'] == f'"{record.content_hash}"'
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    assert 'immutable' in response.headers['Cache-Control']
+
+    response = client.get(url, headers={'If-None-Match': f'"{record.content_hash}"'})
+    assert response.status_code == 304 and response.data == b''
+
+    response = client.get(url, headers={'Range': 'bytes=10-19'})
+    assert response.status_code == 206
+    assert response.data == sample_workbook[10:20]
+
+    response = client.get(url, headers={'Range': f'bytes={len(sample_workbook)}-'})
+    assert response.status_code == 416
+    # Only the responses that sent content (200 and 206) are audited as downloads
+    assert downloads == [record.stored_path] * 2
+
+    response = client.get('/admin/download/file/SG_2025-Apr_unknown')
+    assert 'no-store' in response.headers['Cache-Control']
+
+def test_admin_download_file_proxy_offload(client, app, sample_workbook):
+    """Test downloads are handed to the reverse proxy when offloading is configured"""
+    from app.models import UploadedFile
+
+    upload_workbook(client, sample_workbook)
+    with app.app_context():
+        record = UploadedFile.query.one()
+    app.config['DOWNLOAD_OFFLOAD'] = 'x-accel-redirect'
+
+    response = client.get(f'/admin/download/file/{record.batch_id}')
+    assert response.status_code == 200
+    assert response.headers['X-Accel-Redirect'] == f'/protected-uploads/{record.stored_path}'
+    assert response.data == b''
+
+def test_excel_export_streams_filtered_rows(client, app, sample_workbook):
+    """Test exports stream the filtered rows in batches as CSV and XLSX"""
+    import csv
+    import io
+    from openpyxl import load_workbook
+
+    upload_workbook(client, sample_workbook)
+    app.config['EXPORT_BATCH_SIZE'] = 4
+
+    response = client.get('/excel/export?format=csv&selectedMarket=SG')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    rows = list(csv.reader(io.StringIO(response.data.decode('utf-8'))))
+    assert rows[0][:3] == ['Batch ID', 'User ID', 'Upload Time'] and len(rows[0]) == 44
+    assert len(rows) == 15 and {row[3] for row in rows[1:]} == {'SG'}
+
+    response = client.get('/excel/export?format=xlsx&selectedMarket=SG')
+    assert response.status_code == 200
+    worksheet = load_workbook(io.BytesIO(response.data), read_only=True)['Export']
+    assert len(list(worksheet.iter_rows(values_only=True))) == 15
+
+    response = client.get('/excel/export?format=csv&selectedMarket=HK')
+    assert len(response.data.decode('utf-8').splitlines()) == 1  # header only
+
+    response = client.get('/excel/export?format=pdf')
+    assert response.status_code == 302
+
+def test_batch_report_regenerates_template_workbook(client, app, sample_workbook, tmp_path):
+    """Test a batch is regenerated in its market layout, parses back identically and is cached"""
+    import io
+    import os
+    from openpyxl import load_workbook
+    from app.models import UploadedFile
+    from app.services.market_config_loader import market_config_loader
+    from app.controllers.excel_controller import excel_service
+
+    upload_workbook(client, sample_workbook)
+    with app.app_context():
+        batch_id = UploadedFile.query.one().batch_id
+
+    response = client.get(f'/excel/report/{batch_id}')
+    assert response.status_code == 200
+    assert load_workbook(io.BytesIO(response.data), read_only=True).sheetnames == ['Customer Metrics2']
+
+    original, regenerated = tmp_path / 'original.xlsx', tmp_path / 'regenerated.xlsx'
+    original.write_bytes(sample_workbook)
+    regenerated.write_bytes(response.data)
+    assert excel_service.process_excel_path(str(regenerated), 'SG')['data'] == \
+        excel_service.process_excel_path(str(original), 'SG')['data']
+
+    client.get(f'/excel/report/{batch_id}')
+    version = market_config_loader.get_config('SG').version
+    assert os.listdir(app.config['REPORT_CACHE_FOLDER']) == [f"{batch_id}_{version}.xlsx"]
+
+    assert client.get('/excel/report/SG_2025-Apr_unknown').status_code == 302
+
+def test_consolidated_report_has_a_sheet_per_market(client, app, sample_workbook):
+    """Test the consolidated workbook holds the latest batch of each market for the month"""
+    import io
+    from openpyxl import load_workbook
+    from benchmarks.common import build_market_workbook
+    from app.services.market_config_loader import market_config_loader
+
+    upload_workbook(client, sample_workbook)
+    hk_workbook = build_market_workbook(market_config_loader.get_config('HK'), rows=7, seed=2)
+    upload_workbook(client, hk_workbook, market='HK', filename='HK_metrics.xlsx')
+
+    response = client.get('/excel/report/consolidated?dataMonth=2025-Apr')
+    assert response.status_code == 200
+    workbook = load_workbook(io.BytesIO(response.data), read_only=True)
+    assert sorted(workbook.sheetnames) == ['HK', 'SG']
+
+    assert client.get('/excel/report/consolidated?dataMonth=2024-Jan').status_code == 302
+
+def test_batch_table_fragments_are_cached(client, app, sample_workbook, tmp_path):
+    """Test per-batch table sections are rendered once, then served from memory and disk"""
+    from app.models import UploadedFile
+
+    app.config['FRAGMENT_CACHE_FOLDER'] = str(tmp_path / 'fragments')
+    cache = app.extensions['fragment_cache']
+    cache.folder = app.config['FRAGMENT_CACHE_FOLDER']
+
+    upload_workbook(client, sample_workbook)
+    with app.app_context():
+        batch_id = UploadedFile.query.one().batch_id
+
+    first = client.get('/excel/viewallmarketresults')
+    assert first.status_code == 200
+    assert 'fragments;dur=' in first.headers['Server-Timing']
+    misses = cache.stats['misses']
+
+    second = client.get('/excel/viewallmarketresults')
+    assert second.data.count(b'class="row-number"') == first.data.count(b'class="row-number"') == 14
+    assert cache.stats['misses'] == misses and cache.stats['hits'] >= 1
+
+    cache.clear()
+    third = client.get(f'/excel/result?market=SG&dataMonth=2025-Apr&batchId={batch_id}')
+    assert b'Acquisition' in third.data
+    client.get('/excel/viewallmarketresults')
+    assert cache.stats['disk_hits'] >= 1
+
+def test_batch_compare_streams_changes(client, app):
+    """Test two batches are aligned on unit/metric and their changes streamed as JSON and CSV"""
+    from app.models import db, ExcelData
+
+    with app.app_context():
+        for batch_id, rows in (('SG_A', [('Acquisition', '# of Leads', '1,000'), ('Engagement', 'ANP', '5')]),
+                               ('SG_B', [('Acquisition', '# of Leads', '1,250'), ('Repurchase', 'ANP', '7')])):
+            for unit, metric, value in rows:
+                record = ExcelData('SG', unit, metric, '2025-Apr', batch_id, 'user1')
+                record.jan_cya = value
+                record.feb_cya = '3'
+                db.session.add(record)
+        db.session.commit()
+
+    payload = client.get('/excel/compare?batchA=SG_A&batchB=SG_B').get_json()
+    assert payload['summary']['changedCells'] == 1
+    assert payload['summary']['addedRows'] == 1 and payload['summary']['removedRows'] == 1
+    assert payload['changes'] == [{'unit': 'Acquisition', 'metric': '# of Leads', 'column': 'Jan_CYA',
+                                   'old': '1,000', 'new': '1,250', 'delta': 250.0}]
+    anp = next(item for item in payload['metricDeltas'] if item['metric'] == 'ANP')
+    assert anp['columns'] == {'Jan_CYA': {'old': 5.0, 'new': 7.0, 'delta': 2.0}}
+
+    response = client.get('/excel/compare?batchA=SG_A&batchB=SG_B&format=csv')
+    lines = response.data.decode('utf-8').splitlines()
+    assert lines[0].startswith('change,unit,metric') and len(lines) == 4
+    assert client.get('/excel/compare?batchA=SG_A&batchB=missing').status_code == 404
@@ -79,3 +79,67 @@ def test_data_period_activation(app_context):
     data_period.deactivate("admin")
     assert data_period.is_active == False
     assert data_period.update_by == "admin"
+
+def test_sqlite_pragmas_applied_on_connect(tmp_path):
+    """Test create_app applies the configured SQLite pragmas to new connections"""
+    from sqlalchemy import text
+    from app import create_app
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'pragmas.db'}",
+        'SQLITE_PRAGMAS': {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'busy_timeout': 2500},
+        'DB_POOL_SIZE': 3,
+    })
+
+    with app.app_context():
+        assert db.engine.pool.size() == 3
+        with db.engine.connect() as connection:
+            assert connection.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+            assert connection.execute(text('PRAGMA synchronous')).scalar() == 1  # NORMAL
+            assert connection.execute(text('PRAGMA busy_timeout')).scalar() == 2500
+
+def test_engine_options_skip_pool_for_memory_database():
+    """Test pool settings are only passed to file-backed engines"""
+    from app.database import build_engine_options
+
+    memory_options = build_engine_options({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'DB_POOL_SIZE': 5})
+    file_options = build_engine_options({'SQLALCHEMY_DATABASE_URI': 'sqlite:///gcdmauto.db', 'DB_POOL_SIZE': 5})
+
+    assert 'pool_size' not in memory_options
+    assert file_options['pool_size'] == 5
+    assert file_options['pool_pre_ping'] is True
+
+def test_add_missing_columns_upgrades_existing_table(app_context):
+    """Test nullable model columns are added to tables created before them"""
+    from sqlalchemy import inspect, text
+    from app.database import add_missing_columns
+
+    with db.engine.begin() as connection:
+        connection.execute(text('ALTER TABLE uploaded_file DROP COLUMN compression'))
+    add_missing_columns(db)
+
+    columns = {column['name'] for column in inspect(db.engine).get_columns('uploaded_file')}
+    assert 'compression' in columns
+
+def test_period_key_written_and_backfilled(app_context):
+    """Test period keys sort chronologically, are set on insert and backfilled with their index"""
+    from sqlalchemy import inspect, text
+    from app.database import add_missing_columns
+    from app.models import period_key, backfill_period_keys
+
+    assert period_key('2025-Sep') < period_key('2025-Oct') == 202510
+    assert period_key('2025-13') is None
+
+    db.session.add(ExcelData('SG', 'Unit', 'Metric', '2025-Oct', 'B1', 'user1'))
+    db.session.commit()
+    assert ExcelData.query.one().period_key == 202510
+
+    with db.engine.begin() as connection:
+        connection.execute(text('DROP INDEX ix_excel_data_period_key'))
+        connection.execute(text('UPDATE excel_data SET period_key = NULL'))
+    add_missing_columns(db)
+    assert backfill_period_keys(ExcelData) == 1
+
+    db.session.expire_all()
+    assert ExcelData.query.one().period_key == 202510
+    assert 'ix_excel_data_period_key' in {index['name'] for index in inspect(db.engine).get_indexes('excel_data')}
@@ -158,3 +158,18 @@ def test_unicode_inputs():
         result = validate_input(unicode_input)
         # Just ensure it doesn't crash
         assert isinstance(result, bool), f"Unicode input caused error: {unicode_input}"
+
+def test_production_server_binds_localhost_only():
+    """Test the production WSGI server settings keep the localhost-only binding"""
+    from app.server import gunicorn_options, waitress_options
+
+    config = {'SERVER_PORT': 9090, 'SERVER_WORKERS': 3, 'SERVER_THREADS': 2, 'SERVER_MAX_REQUESTS': 500}
+
+    options = gunicorn_options(config)
+    assert options['bind'] == '127.0.0.1:9090'
+    assert options['workers'] == 3
+    assert options['threads'] == 2
+    assert options['max_requests'] == 500
+
+    assert waitress_options(config)['host'] == '127.0.0.1'
+    assert waitress_options(config)['threads'] == 6
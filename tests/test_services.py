@@ -152,3 +152,416 @@ def test_excel_service_pandas_methods():
     assert 'Feb_LYA' in column_data
     assert '100' in column_data['Jan_LYA']
     assert '110' in column_data['Feb_LYA']
+
+def test_parse_result_cache_roundtrip_and_eviction(tmp_path):
+    """Test ParseResultCache stores results without pickle and stays within its size bound"""
+    import time
+    from app.services.parse_cache import ParseResultCache
+
+    data = {
+        'worksheetName': 'Customer Metrics2',
+        'units': ['Acquisition', 'Engagement'],
+        'metrics': ['# of Leads', 'ANP from mature leads'],
+        'lastYearActual': {'Jan_LYA': ['1', ''], 'Feb_LYA': ['2', '3']},
+        'currentYearActual': {'Jan_CYA': ['4', '5']},
+        'currentYearTarget': {},
+    }
+    cache = ParseResultCache(str(tmp_path), max_bytes=10 * 1024 * 1024)
+
+    assert cache.get('a' * 64, 'SG', 'v1') is None
+    cache.put('a' * 64, 'SG', 'v1', data)
+    assert cache.get('a' * 64, 'SG', 'v1') == data
+    assert cache.get('a' * 64, 'SG', 'v2') is None
+
+    # A new config version drops the market's older entries
+    cache.put('b' * 64, 'SG', 'v2', data)
+    assert cache.get('a' * 64, 'SG', 'v1') is None
+
+    # The least recently used entry goes first once the size bound is exceeded
+    entry_size = os.path.getsize(os.path.join(str(tmp_path), f"SG_v2_{'b' * 64}.npz"))
+    cache.max_bytes = entry_size * 2
+    cache.put('c' * 64, 'SG', 'v2', data)
+    time.sleep(0.01)
+    cache.get('b' * 64, 'SG', 'v2')
+    cache.put('d' * 64, 'SG', 'v2', data)
+    assert cache.get('c' * 64, 'SG', 'v2') is None
+    assert cache.get('b' * 64, 'SG', 'v2') == data
+
+def test_market_config_version_tracks_yaml_changes(tmp_path):
+    """Test editing a market's YAML reloads the config with a new version"""
+    config_file = tmp_path / "TEST.config.yml"
+    config_file.write_text("worksheet:\n  name: Sheet1\n")
+
+    loader = MarketConfigLoader(str(tmp_path))
+    first = loader.get_config("TEST")
+
+    config_file.write_text("worksheet:\n  name: Sheet2\n")
+    modified = os.path.getmtime(config_file) + 5
+    os.utime(config_file, (modified, modified))
+    second = loader.get_config("TEST")
+
+    assert first.version and second.version != first.version
+    assert second.get_worksheet_name() == "Sheet2"
+
+def test_upload_migration_moves_legacy_files(app):
+    """Test flat legacy uploads move into the sharded layout and the catalog, resumably"""
+    from app.models import UploadedFile
+    from app.services.upload_migrator import UploadMigrator
+
+    legacy_folder = app.config['LEGACY_UPLOAD_FOLDER']
+    os.makedirs(legacy_folder)
+    legacy_name = 'SG_2025-Apr_20250401_101500_abcd1234_metrics_april.xlsx'
+    with open(os.path.join(legacy_folder, legacy_name), 'wb') as f:
+        f.write(b'legacy workbook content')
+    with open(os.path.join(legacy_folder, 'notes.txt'), 'wb') as f:
+        f.write(b'not an upload')
+
+    migrator = UploadMigrator(app, app.extensions['upload_store'], [legacy_folder, app.config['UPLOAD_FOLDER']])
+    assert migrator.run() == 1
+    assert migrator.run() == 0  # nothing left to do
+
+    with app.app_context():
+        record = UploadedFile.query.one()
+        assert record.batch_id == 'SG_2025-Apr_20250401_101500_abcd1234'
+        assert record.original_filename == 'metrics_april.xlsx'
+        assert record.stored_path == 'SG/2025-04/SG_2025-Apr_20250401_101500_abcd1234_metrics_april.xlsx'
+        assert record.status == UploadedFile.STATUS_FAILED  # no data rows for this batch
+
+    assert sorted(os.listdir(legacy_folder)) == ['notes.txt']
+    with open(app.extensions['upload_store'].resolve(record.stored_path), 'rb') as f:
+        assert f.read() == b'legacy workbook content'
+    assert not os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], UploadMigrator.LOCK_NAME))
+
+def test_upload_archiver_compresses_old_uploads(app, client):
+    """Test old uploads are archived with xz and still download as the original bytes"""
+    import io
+    from datetime import datetime, timedelta
+    from app.models import UploadedFile
+    from app.services.upload_archiver import UploadArchiver
+    from app.services.uploaded_file_service import uploaded_file_service
+
+    upload_store = app.extensions['upload_store']
+    content = b'market,metric,value\n' * 5000
+    batch_id = 'SG_2025-Jan_20250105_090000_abcd1234'
+    blob = upload_store.put(io.BytesIO(content))
+    stored_path = upload_store.batch_path('SG', '2025-Jan', batch_id, 'old.xlsx')
+    upload_store.link(blob, stored_path)
+
+    with app.app_context():
+        uploaded_file_service.record_upload(batch_id, 'SG', '2025-Jan', 'old.xlsx', stored_path,
+                                            blob.content_hash, blob.size, 'tester',
+                                            UploadedFile.STATUS_PROCESSED, datetime.now() - timedelta(days=120))
+
+    assert UploadArchiver(app, upload_store, after_days=200).run().files == 0
+    report = UploadArchiver(app, upload_store, after_days=90).run()
+    assert report.files == 1 and report.bytes_before == len(content)
+    assert 0 < report.bytes_after < report.bytes_before and report.bytes_saved > 0
+
+    assert not os.path.exists(upload_store.blob_path(blob.content_hash))
+    assert not upload_store.exists(stored_path)
+    with app.app_context():
+        assert UploadedFile.query.one().compression == UploadedFile.COMPRESSION_XZ
+    assert UploadArchiver(app, upload_store, after_days=90).run().files == 0
+
+    # An upload that found the raw blob in put() before it was archived still gets its file
+    late_path = upload_store.batch_path('SG', '2025-Jan', 'SG_2025-Jan_20250105_090500_ef567890', 'old.xlsx')
+    upload_store.link(blob, late_path)
+    with open(upload_store.resolve(late_path), 'rb') as f:
+        assert f.read() == content
+    assert not os.path.exists(f"{upload_store.blob_path(blob.content_hash)}.lock")
+
+    response = client.get(f'/admin/download/file/{batch_id}')
+    assert response.status_code == 200
+    assert response.data == content
+
+def test_active_period_snapshot_follows_version_stamp(app):
+    """Active periods are cached until a write here or in another worker moves the stamp"""
+    from app.models import db, DataVersion
+    from app.services.data_period_service import data_period_service
+
+    with app.app_context():
+        period = data_period_service.create_data_period('SG', '2024-01')
+        snapshot = data_period_service.get_active_periods()
+        assert [p['data_month'] for p in snapshot.by_market['SG']] == ['2024-01']
+        assert '"data_month":"2024-01"' in snapshot.json
+        assert data_period_service.get_active_periods() is snapshot
+
+        data_period_service.update_data_period(period.id, 'N')
+        assert data_period_service.get_active_periods().periods == ()
+
+        # Another worker's write: only the shared stamp tells this process to reload
+        period = db.session.get(type(period), period.id)
+        period.active_idc = 'Y'
+        DataVersion.bump(DataVersion.DATA_PERIOD)
+        db.session.commit()
+        assert data_period_service.get_active_periods().by_market['SG'][0]['active_idc'] == 'Y'
+
+def test_compute_kpis_vectorized():
+    """Test YoY, attainment, YTD and funnel ratios over stacked batch arrays"""
+    import numpy as np
+    from app.services.analytics_service import compute_kpis, METRICS, FUNNEL
+
+    values = np.full((2, len(METRICS), 12, 3), np.nan)
+    values[:, :, :3, 0] = 100.0   # LYA
+    values[:, :, :3, 1] = 110.0   # CYA
+    values[:, :, :3, 2] = 200.0   # CYT
+    values[1, 1, :3, 1] = 55.0    # second batch: half the leads mature
+    values[0, 0, 0, 0] = 0.0      # zero denominator
+
+    kpis = compute_kpis(values)
+    assert np.isnan(kpis['yoy'][0, 0, 0])
+    assert np.isclose(kpis['yoy'][0, 0, 1], 0.1)
+    assert np.isclose(kpis['attainment'][0, 0, 2], 0.55)
+    assert np.allclose(kpis['ytd'][0, 2, :3, 1], [110, 220, 330])
+    assert np.isnan(kpis['ytd'][0, 2, 3, 1])
+    assert np.isclose(kpis['funnel'][1, 0, 0], 0.5)
+    assert kpis['funnel'].shape == (2, len(FUNNEL) - 1, 12)
+    assert np.isclose(kpis['valuePerMatureLead'][1, 0, 0], 2.0)
+
+def test_projected_data_returns_slots_records_and_tuples(app):
+    """Test projections read only their columns as __slots__ records or tuples, outside the identity map"""
+    from app.models import db, ExcelData
+    from app.services.excel_data_service import excel_data_service
+
+    with app.app_context():
+        db.session.add(ExcelData('SG', 'Unit', 'Metric', '2025-Apr', 'SG_B1', 'user1', worksheet_name='Sheet'))
+        db.session.commit()
+        db.session.expunge_all()
+
+        records = excel_data_service.get_projected_data_by_filters('listing', market_name='SG')
+        assert [record.asdict() for record in records] == [
+            {'batch_id': 'SG_B1', 'worksheet_name': 'Sheet', 'unit_name': 'Unit', 'metric_name': 'Metric'}]
+        assert not hasattr(records[0], '__dict__')
+        with pytest.raises(AttributeError):
+            records[0].unit_name = 'Other'
+        assert len(db.session.identity_map) == 0
+
+        assert excel_data_service.get_projected_data_by_filters(
+            ['unit_name', 'jan_lya'], market_name='SG', as_tuples=True) == [('Unit', None)]
+        assert excel_data_service.get_projected_data_by_filters('listing', market_name='S G') == []
+        with pytest.raises(ValueError):
+            excel_data_service.get_projected_data_by_filters(['password'])
+
+def test_aggregated_records_are_compact_and_read_like_dicts(app):
+    """Test aggregated records expose the display fields and month maps, and encode as the display dicts"""
+    from flask import json
+    from app.models import db, ExcelData
+    from app.services.excel_data_service import excel_data_service
+
+    with app.app_context():
+        for unit in ('Unit A', 'Unit B'):
+            record = ExcelData('SG', unit, 'Metric', '2025-Apr', 'SG_B1', 'user1')
+            record.jan_lya, record.feb_lya, record.mar_cyt = '100', '  ', '100'
+            db.session.add(record)
+        db.session.commit()
+
+        records = excel_data_service.get_aggregated_data_by_filters(market_name='SG')
+        item = records[0]
+        assert not hasattr(item, '__dict__') and len(item.values) == 36
+        assert item['batchId'] == item.batchId == 'SG_B1'
+        assert dict(item.lastYearActual) == {'Jan': '100'} and not item.currentYearActual
+        assert item.currentYearTarget.get('Mar') == '100' and item.lastYearActual.get('Feb') is None
+        # Equal cell strings are shared between records
+        assert records[0].values[0] is records[1].values[0] is records[0].values[26]
+
+        encoded = json.loads(json.dumps(records))
+        assert encoded[0]['lastYearActual'] == {'Jan': '100'}
+        assert encoded[0]['currentYearTarget'] == {'Mar': '100'}
+        assert encoded[0]['unitName'] == 'Unit A'
+
+        stats = excel_data_service.get_statistics(records)
+        assert stats['monthlyStats'] == {'lastYearActual': {'Jan': 2}, 'currentYearActual': {},
+                                         'currentYearTarget': {'Mar': 2}}
+        assert stats['totalRecords'] == 2 and stats['uniqueBatches'] == 1
+
+def test_ingest_writer_group_commits_and_fails_batches_separately(tmp_path):
+    """Test batches queued together commit in one transaction and a failing batch fails only its own future"""
+    from datetime import datetime
+    from app import create_app
+    from app.models import db, Batch, ExcelData
+    from app.services.ingest_writer import get_ingest_writer
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'gcdmauto.db'}",
+        'INGEST_MAX_DELAY_MS': 500,
+        'TESTING': True,
+    })
+    with app.app_context():
+        db.create_all()
+        writer = get_ingest_writer()
+
+        def batch(batch_id):
+            return dict(market='SG', units=['Unit A', 'Unit B'], metrics=['Metric', 'Metric'],
+                        last_year_actual={'Jan_LYA': ['1', '2']}, current_year_actual={},
+                        current_year_target={}, data_period='2025-Apr', batch_id=batch_id,
+                        user_id='user1', worksheet_name='Sheet', upload_timestamp=datetime.now())
+
+        futures = [writer.submit(**batch(batch_id)) for batch_id in ('SG_B1', 'SG_B2', 'SG_B1', 'SG_B3')]
+        assert futures[0].result(timeout=10) is None
+        with pytest.raises(RuntimeError, match='Failed to save Excel data'):
+            futures[2].result(timeout=10)
+        assert futures[3].result(timeout=10) is None
+        writer.close()
+
+        assert writer.stats['transactions'] == 1 and writer.stats['batches'] == 3
+        assert sorted(batch.batch_id for batch in Batch.query.all()) == ['SG_B1', 'SG_B2', 'SG_B3']
+        assert ExcelData.query.count() == 6
+
+def test_ingest_writer_failed_group_commit_leaves_no_rows(tmp_path, monkeypatch):
+    """Test a group whose commit fails fails every batch and persists none of their rows"""
+    from datetime import datetime
+    from app import create_app
+    from app.models import db, Batch, DataVersion, ExcelData
+    from app.services.ingest_writer import get_ingest_writer
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'gcdmauto.db'}",
+        'INGEST_MAX_DELAY_MS': 500,
+        'TESTING': True,
+    })
+
+    def fail_bump(name):
+        raise RuntimeError('version counter unavailable')
+
+    with app.app_context():
+        db.create_all()
+        writer = get_ingest_writer()
+        monkeypatch.setattr(DataVersion, 'bump', staticmethod(fail_bump))
+
+        futures = [writer.submit(market='SG', units=['Unit A'], metrics=['Metric'],
+                                 last_year_actual={'Jan_LYA': ['1']}, current_year_actual={},
+                                 current_year_target={}, data_period='2025-Apr', batch_id=batch_id,
+                                 user_id='user1', worksheet_name='Sheet', upload_timestamp=datetime.now())
+                   for batch_id in ('SG_B1', 'SG_B2')]
+        for future in futures:
+            with pytest.raises(RuntimeError, match='version counter unavailable'):
+                future.result(timeout=10)
+        writer.close()
+
+        assert writer.stats['transactions'] == 0 and writer.stats['failed'] == 2
+        assert Batch.query.count() == 0 and ExcelData.query.count() == 0
+
+@pytest.mark.parametrize('upserts', [None, {}])
+def test_rollup_add_keeps_totals_of_new_and_existing_keys(app, monkeypatch, upserts):
+    """Test adding to the rollups inserts new keys and adds to existing ones, with and without upsert"""
+    from sqlalchemy import insert
+    from app.models import db, ExcelData, MetricRollup
+    from app.services import rollup_service as rollup_module
+
+    if upserts is not None:
+        monkeypatch.setattr(rollup_module, 'UPSERTS', upserts)
+
+    with app.app_context():
+        # Stored by another process after this one would have looked for existing keys
+        db.session.execute(insert(MetricRollup), [{
+            'market_name': 'SG', 'data_month': '2025-Apr', 'unit_name': 'Unit A', 'metric_name': 'Metric',
+            'category': MetricRollup.LYA, 'period_key': 202504, 'row_count': 1, 'jan': 5.0, 'jan_count': 1}])
+        records = []
+        for unit in ('Unit A', 'Unit B'):
+            record = ExcelData('SG', unit, 'Metric', '2025-Apr', 'SG_B1', 'user1')
+            record.period_key, record.jan_lya = 202504, '10'
+            records.append(record)
+        rollup_module.rollup_service.add_records(records)
+        db.session.commit()
+
+        totals = {row.unit_name: (row.jan, row.jan_count, row.row_count) for row in
+                  MetricRollup.query.filter(MetricRollup.category == MetricRollup.LYA)}
+        assert totals == {'Unit A': (15.0, 2, 2), 'Unit B': (10.0, 1, 1)}
+
+def test_ingest_writer_timeout_cancels_queued_batch(tmp_path):
+    """Test a batch whose submitter times out while it is queued is never committed"""
+    from concurrent.futures import TimeoutError
+    from datetime import datetime
+    from app import create_app
+    from app.models import db, Batch, ExcelData
+    from app.services.ingest_writer import get_ingest_writer
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'gcdmauto.db'}",
+        'INGEST_MAX_DELAY_MS': 500,
+        'INGEST_TIMEOUT': 0.05,
+        'TESTING': True,
+    })
+    with app.app_context():
+        db.create_all()
+        writer = get_ingest_writer()
+
+        # The writer is still collecting its group when the submitter gives up
+        with pytest.raises(TimeoutError):
+            writer.save_excel_data(market='SG', units=['Unit A'], metrics=['Metric'],
+                                   last_year_actual={'Jan_LYA': ['1']}, current_year_actual={},
+                                   current_year_target={}, data_period='2025-Apr', batch_id='SG_B1',
+                                   user_id='user1', worksheet_name='Sheet', upload_timestamp=datetime.now())
+        writer.close()
+
+        assert writer.stats['transactions'] == 0 and writer.stats['batches'] == 0
+        assert Batch.query.count() == 0 and ExcelData.query.count() == 0
+
+def test_market_shards_commit_while_main_database_is_locked(tmp_path):
+    """Test uploads of two markets commit to their shards in parallel, without the main database's write lock"""
+    import threading
+    import time
+    from datetime import datetime
+    from sqlalchemy import select
+    from app import create_app
+    from app.database import IMMEDIATE_TRANSACTION
+    from app.models import db, Batch, DataVersion
+    from app.services.excel_data_service import excel_data_service
+    from app.services.ingest_writer import get_ingest_writer
+    from app.sharding import get_shard_router
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'gcdmauto.db'}",
+        'DB_SHARDING': True,
+        'DB_SHARD_MARKETS': ['SG', 'HK'],
+        'TESTING': True,
+    })
+    with app.app_context():
+        db.create_all()
+        router = get_shard_router()
+        router.create_tables()
+        writer = get_ingest_writer()
+
+    def upload(save_excel_data, market):
+        with app.app_context():
+            save_excel_data(market=market, units=['Unit A'], metrics=['Metric'],
+                            last_year_actual={'Jan_LYA': ['1']}, current_year_actual={},
+                            current_year_target={}, data_period='2025-Apr', batch_id=f'{market}_B1',
+                            user_id='user1', worksheet_name='Sheet', upload_timestamp=datetime.now())
+
+    # SG saves on its own thread, HK through the group-commit writer
+    threads = [threading.Thread(target=upload, args=(excel_data_service.save_excel_data, 'SG')),
+               threading.Thread(target=upload, args=(writer.save_excel_data, 'HK'))]
+    with app.app_context(), router.engine(None).connect().execution_options(**IMMEDIATE_TRANSACTION) as main, \
+            main.begin():
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + 4
+        committed = {}
+        while len(committed) < 2 and time.monotonic() < deadline:
+            for market in ('SG', 'HK'):
+                with router.engine(market).connect() as connection:
+                    if connection.execute(select(Batch.batch_id)).first():
+                        committed[market] = True
+            time.sleep(0.01)
+        # Both shard transactions committed while the main database stayed locked
+        assert sorted(committed) == ['HK', 'SG']
+
+    for thread in threads:
+        thread.join()
+    with app.app_context():
+        writer.close()
+        router.close()
+        assert DataVersion.current(DataVersion.EXCEL_DATA) == 2
+
+def test_report_builder_keeps_stored_text_of_non_numeric_cells(tmp_path):
+    """Test regenerated cells are numbers only where the stored text came from a numeric cell"""
+    from app.services.market_config_loader import market_config_loader
+    from app.services.report_builder import ReportBuilder
+
+    builder = ReportBuilder(str(tmp_path), 1024 * 1024, market_config_loader)
+    values = {value: builder._cell_value(value) for value in
+              ('100', '100.0', '12.5', '007', '1,000', ' 5', '1e3', 'nan', 'N/A', '')}
+    assert values == {'100': 100, '100.0': 100.0, '12.5': 12.5, '007': '007', '1,000': '1,000', ' 5': ' 5',
+                      '1e3': '1e3', 'nan': 'nan', 'N/A': 'N/A', '': None}
+    assert isinstance(values['100'], int) and isinstance(values['100.0'], float)